@@ -1,72 +1,182 @@
 import osmnx as ox
 import geopandas as gpd
 import pandapower as pp
+import argparse
+import glob
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from importlib import metadata
 from pathlib import Path
-from dave_core.create import create_grid
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-from dave_core import plot_grid_data
+from stage_profiler import stage, enable_profiling, save_profile
+from build_cache import stage_key, cached_value, cached_files, file_digest
+from fixture_store import FIXTURE_MODES, set_fixture_mode, cache_enabled, recorded_value, recorded_files
+from dave_supervisor import run_supervised
 
-def create_city_geojson(city_name, size_km=2):
+# Parameters of create_grid besides the area and the output folder; they are
+# part of the cache key of the DAVE dataset
+DAVE_GRID_PARAMETERS = {
+    # Geographic data
+    'geodata': ["roads"],
+    # Voltage levels (MV only)
+    'power_levels': ["mv"],
+    'gas_levels': [],
+    # Optional parameters
+    'combine_areas': [],
+    'convert_power': ['pandapower'],
+    # Network elements
+    'transformers': False,
+    'renewable_powerplants': False,
+    'conventional_powerplants': True,
+    'loads': False,
+    # Output settings
+    'output_format': "json",
+    'save_data': True
+}
+
+# Dataset written by create_grid in the output folder
+DAVE_DATASET_FILENAME = 'dave_dataset.json'
+
+# Run create_grid in a supervised worker process with the memory and time
+# limits of dave_supervisor.py (False: in this process)
+DAVE_ISOLATED = True
+
+# Batch runs: one subfolder per (city, size_km) job and a manifest of all jobs
+BATCH_DIRNAME = 'batch'
+BATCH_MANIFEST_FILENAME = 'manifest.json'
+# Maximum number of cities processed at the same time (None: one per CPU)
+BATCH_WORKERS = 4
+
+def dave_version():
+    try:
+        return metadata.version('dave_core')
+    except metadata.PackageNotFoundError:
+        return None
+
+def geocode_city(city_name, use_cache=True):
+    """Returns the (lat, lon) of a city, cached by the city name"""
+    return cached_value('geocode', stage_key('geocode', params=city_name),
+                        lambda: recorded_value('geocode', city_name, lambda: tuple(ox.geocode(city_name))),
+                        cache_enabled(use_cache))
+
+def bbox_geojson(name, bbox):
+    """
+    Creates a GeoJSON feature collection with the rectangle of a bounding box
+    
+    Args:
+        name: Name of the feature collection
+        bbox: Dictionary with min_lat, max_lat, min_lon, max_lon
+    """
+    return {
+        "type": "FeatureCollection",
+        "name": name,
+        "crs": {
+            "type": "name",
+            "properties": {
+                "name": "urn:ogc:def:crs:OGC:1.3:CRS84"
+            }
+        },
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {
+                    "id": 1
+                },
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[
+                        [bbox['max_lon'], bbox['max_lat']],
+                        [bbox['min_lon'], bbox['max_lat']],
+                        [bbox['min_lon'], bbox['min_lat']],
+                        [bbox['max_lon'], bbox['min_lat']],
+                        [bbox['max_lon'], bbox['max_lat']]
+                    ]]
+                }
+            }
+        ]
+    }
+
+def area_bbox(center_lat, center_lon, size_km):
+    """
+    Bounding box around a point, size_km from the point to each side.
+    Computed locally, nothing is downloaded.
+    
+    Returns:
+        Dictionary with min_lat, max_lat, min_lon, max_lon
+    """
+    north, south, east, west = ox.utils_geo.bbox_from_point((center_lat, center_lon), 
+                                                            dist=size_km*1000)
+    return {
+        'min_lat': south,
+        'max_lat': north,
+        'min_lon': west,
+        'max_lon': east
+    }
+
+def download_city_roads(bbox):
+    """
+    Downloads the OSM drive network of a bounding box. Only needed by stages
+    that use the roads themselves; the area GeoJSON only needs the bbox.
+    """
+    with stage('download_osm_roads', 'load'):
+        return recorded_value('osm_roads', bbox, lambda: ox.graph_from_bbox(
+            bbox['max_lat'], bbox['min_lat'], bbox['max_lon'], bbox['min_lon'], 
+            network_type='drive',  # walk, drive, bike, all, all_public, drive_service
+            simplify=True,  # Simplify graph
+            retain_all=False))  # Keep only connected elements
+
+def city_roads(city_name, size_km=2, use_cache=True):
+    """
+    Downloads the OSM drive network of the same area as create_city_geojson,
+    for stages that need the roads (DAVE downloads its own data)
+    """
+    location = geocode_city(city_name, use_cache)
+    print(f"Downloading data for {city_name}...")
+    return download_city_roads(area_bbox(location[0], location[1], size_km))
+
+def write_city_geojson(city_name, bbox, geojson_path):
+    """Writes the bounding box GeoJSON of the area"""
+    with open(geojson_path, 'w') as f:
+        json.dump(bbox_geojson(city_name, bbox), f)
+
+def create_city_geojson(city_name, size_km=2, use_cache=True, output_dir=None):
     """
     Creates a GeoJSON file for a city using data from OSM.
+    The geocode result and the GeoJSON are cached in DAVE/.cache, keyed by
+    the city name and size_km, so repeated runs skip the OSM requests.
+    
+    Args:
+        city_name: City name to geocode
+        size_km: Distance from the city center to each side of the area in km
+        use_cache: False to geocode and write the GeoJSON again
+        output_dir: Folder of the GeoJSON file, the DAVE folder by default
+    
+    Returns:
+        Path to the GeoJSON file, None on error
     """
     try:
         # Find city coordinates
         print(f"Finding coordinates for {city_name}...")
-        location = ox.geocode(city_name)
+        with stage('geocode', 'load'):
+            location = geocode_city(city_name, use_cache)
         center_lat = location[0]
         center_lon = location[1]
         
         # Create bounding box
-        bbox = ox.utils_geo.bbox_from_point((center_lat, center_lon), 
-                                          dist=size_km*1000)
+        bbox = area_bbox(center_lat, center_lon, size_km)
         
-        # Download OSM data
-        print(f"Downloading data for {city_name}...")
-        G = ox.graph_from_bbox(bbox[0], bbox[1], bbox[2], bbox[3], 
-                             network_type='drive',  # walk, drive, bike, all, all_public, drive_service
-                             simplify=True,  # Simplify graph
-                             retain_all=False)  # Keep only connected elements
+        geojson_dir = Path(output_dir) if output_dir else Path(__file__).parent
+        geojson_path = geojson_dir / f"{city_name}.geojson"
         
-        # Create GeoJSON
-        geojson = {
-            "type": "FeatureCollection",
-            "name": city_name,
-            "crs": {
-                "type": "name",
-                "properties": {
-                    "name": "urn:ogc:def:crs:OGC:1.3:CRS84"
-                }
-            },
-            "features": [
-                {
-                    "type": "Feature",
-                    "properties": {
-                        "id": 1
-                    },
-                    "geometry": {
-                        "type": "Polygon",
-                        "coordinates": [[
-                            [bbox[2], bbox[0]],
-                            [bbox[3], bbox[0]],
-                            [bbox[3], bbox[1]],
-                            [bbox[2], bbox[1]],
-                            [bbox[2], bbox[0]]
-                        ]]
-                    }
-                }
-            ]
-        }
-        
-        # Save GeoJSON
-        script_dir = Path(__file__).parent
-        geojson_path = script_dir / f"{city_name}.geojson"
-        with open(geojson_path, 'w') as f:
-            json.dump(geojson, f)
+        # The GeoJSON depends on the geocoded center, so a new geocode result also renews it
+        cached_files('city_geojson', stage_key('city_geojson', params=[city_name, list(location), size_km]),
+                     [str(geojson_path)],
+                     lambda: write_city_geojson(city_name, bbox, geojson_path),
+                     use_cache)
             
         print(f"GeoJSON file created successfully: {geojson_path}")
         return str(geojson_path)
@@ -75,9 +185,45 @@ def create_city_geojson(city_name, size_km=2):
         print(f"An error occurred: {str(e)}")
         return None
 
-def create_dave_network(geojson_path, output_folder=None):
+def run_create_grid(own_area, output_folder):
+    """Runs create_grid for an area, which saves the DAVE dataset in output_folder"""
+    # DAVE takes seconds to import, so it is only loaded when a grid is really created
+    from dave_core.create import create_grid
+    
+    with stage('create_grid', 'extract'):
+        grid_data, pp_net = create_grid(
+            own_area=own_area,
+            output_folder=str(output_folder.absolute()),
+            **DAVE_GRID_PARAMETERS
+        )
+    print("Network created successfully!")
+    return grid_data
+
+def plot_dave_network(grid_data):
+    from dave_core import plot_grid_data
+    
+    with stage('plot_grid_data', 'plot'):
+        plot_grid_data(grid_data)
+
+def build_dave_network(own_area, output_folder):
+    """Runs create_grid for an area and plots the grid data"""
+    plot_dave_network(run_create_grid(own_area, output_folder))
+
+def create_dave_network(geojson_path, output_folder=None, use_cache=True, isolated=DAVE_ISOLATED):
     """
     Creates an electricity network using DAVE.
+    The DAVE dataset is cached in DAVE/.cache, keyed by the content of the
+    GeoJSON, DAVE_GRID_PARAMETERS and the DAVE version, so only a changed
+    area or parameter runs create_grid again.
+    
+    Args:
+        geojson_path: GeoJSON file with the area
+        output_folder: Folder of the DAVE dataset, output/ next to the GeoJSON by default
+        use_cache: False to run DAVE again
+        isolated: Run DAVE in a supervised worker process (see dave_supervisor.py)
+    
+    Returns:
+        Path to the DAVE dataset, None if it could not be created
     """
     try:
         # Read GeoJSON file
@@ -91,39 +237,189 @@ def create_dave_network(geojson_path, output_folder=None):
         else:
             output_folder = Path(output_folder)
         
-        grid_data, pp_net = create_grid(
-            # Area definition
-            own_area=own_area,
-            # Geographic data
-            geodata=["roads"], 
-            # Voltage levels (MV only)
-            power_levels=["mv"],  
-            gas_levels=[],
-            # Optional parameters
-            combine_areas=[],
-            convert_power=['pandapower'],
-            # Network elements
-            transformers=False,  
-            renewable_powerplants=False,  
-            conventional_powerplants=True,  
-            loads=False,  
-            # Output settings
-            output_folder=str(output_folder.absolute()),
-            output_format="json",
-            save_data=True
-        )
-        print("Network created successfully!")
-        plot_grid_data(grid_data)
+        if isolated:
+            build = lambda: run_supervised(geojson_path, str(output_folder))
+        else:
+            build = lambda: build_dave_network(own_area, output_folder)
+        
+        # A cache hit restores the dataset without running create_grid (and its plot)
+        dave_key = stage_key('dave_grid', [geojson_path], params=[DAVE_GRID_PARAMETERS, dave_version()])
+        dataset_path = str(output_folder / DAVE_DATASET_FILENAME)
+        cached_files('dave_grid', dave_key, [dataset_path],
+                     lambda: recorded_files('create_grid', [file_digest(geojson_path), DAVE_GRID_PARAMETERS],
+                                            [dataset_path], build),
+                     cache_enabled(use_cache))
+        
+        return dataset_path if os.path.exists(dataset_path) else None
    
     except Exception as e:
         print(f"An error occurred during network creation: {str(e)}")
         return None
 
+def job_folder_name(city_name, size_km):
+    """Folder name of a batch job, e.g. berlin_2km"""
+    name = ''.join(c if c.isalnum() else '_' for c in city_name.lower()).strip('_')
+    return f"{name}_{size_km:g}km"
+
+def job_entry(city_name, size_km, job_dir, error=None, wall_time_s=None):
+    """Manifest entry of a batch job, failed until the job sets its outcome"""
+    return {
+        'city': city_name,
+        'size_km': size_km,
+        'folder': str(job_dir),
+        'status': 'failed',
+        'error': error,
+        'geojson': None,
+        'dataset': None,
+        'wall_time_s': wall_time_s
+    }
+
+def run_city_job(city_name, size_km, job_dir, use_cache=True):
+    """
+    Creates the GeoJSON and the DAVE network of one batch job in its own folder
+    
+    Returns:
+        Manifest entry with the outcome and the wall time of the job
+    """
+    start = time.perf_counter()
+    entry = job_entry(city_name, size_km, job_dir)
+    try:
+        os.makedirs(job_dir, exist_ok=True)
+        entry['geojson'] = create_city_geojson(city_name, size_km, use_cache, output_dir=job_dir)
+        if entry['geojson'] is None:
+            entry['error'] = 'GeoJSON could not be created'
+        else:
+            create_dave_network(entry['geojson'], job_dir, use_cache)
+            datasets = sorted(glob.glob(os.path.join(job_dir, '*dave_dataset*.json')))
+            if datasets:
+                entry['dataset'] = datasets[0]
+                entry['status'] = 'ok'
+            else:
+                entry['error'] = 'No DAVE dataset was created'
+    except Exception as e:
+        entry['error'] = f"{type(e).__name__}: {e}"
+    
+    entry['wall_time_s'] = round(time.perf_counter() - start, 2)
+    return entry
+
+def run_batch(jobs, batch_dir, max_workers=BATCH_WORKERS, use_cache=True):
+    """
+    Runs a list of (city, size_km) jobs, at most max_workers at a time, each
+    in its own worker process. Every job writes to its own subfolder of
+    batch_dir, and a failing, slow or crashing job does not stop the others.
+    Jobs with the same subfolder as an earlier job are skipped.
+    
+    Args:
+        jobs: List of (city name, size_km) tuples
+        batch_dir: Folder of the job subfolders and the manifest
+        max_workers: Maximum number of jobs running at the same time
+        use_cache: False to geocode and run DAVE again for every job
+    
+    Returns:
+        Path to the manifest JSON file
+    """
+    os.makedirs(batch_dir, exist_ok=True)
+    start = time.perf_counter()
+    entries = []
+    
+    # Jobs with the same folder (e.g. berlin:2 and Berlin:2) would write to the same files
+    unique_jobs = {}
+    for city_name, size_km in jobs:
+        folder = job_folder_name(city_name, size_km)
+        if folder in unique_jobs:
+            print(f"Skipping {city_name} ({size_km:g} km): same output folder {folder} as "
+                  f"{unique_jobs[folder][0]} ({unique_jobs[folder][1]:g} km)")
+        else:
+            unique_jobs[folder] = (city_name, size_km)
+    pending = list(unique_jobs.items())
+    
+    # Every job runs in its own worker process, so a worker that dies (e.g.
+    # out of memory or killed by a signal) only fails its own job
+    workers = min(len(pending), max_workers or os.cpu_count() or 1) or 1
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            folder, (city_name, size_km) = pending.pop(0)
+            job_dir = os.path.join(batch_dir, folder)
+            executor = ProcessPoolExecutor(max_workers=1)
+            future = executor.submit(run_city_job, city_name, size_km, job_dir, use_cache)
+            running[future] = (city_name, size_km, job_dir, executor, time.perf_counter())
+        
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            city_name, size_km, job_dir, executor, job_start = running.pop(future)
+            try:
+                entry = future.result()
+            except Exception as e:
+                # The worker process itself died
+                entry = job_entry(city_name, size_km, job_dir, f"{type(e).__name__}: {e}",
+                                  round(time.perf_counter() - job_start, 2))
+            executor.shutdown()
+            entries.append(entry)
+            print(f"[{len(entries)}/{len(unique_jobs)}] {city_name} ({size_km:g} km): {entry['status']}"
+                  + (f" - {entry['error']}" if entry['error'] else ''))
+    
+    # Manifest in the order of the jobs
+    order = {os.path.join(batch_dir, folder): i for i, folder in enumerate(unique_jobs)}
+    entries.sort(key=lambda entry: order[entry['folder']])
+    manifest = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'workers': workers,
+        'total_wall_time_s': round(time.perf_counter() - start, 2),
+        'succeeded': sum(entry['status'] == 'ok' for entry in entries),
+        'failed': sum(entry['status'] != 'ok' for entry in entries),
+        'jobs': entries
+    }
+    manifest_path = os.path.join(batch_dir, BATCH_MANIFEST_FILENAME)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    print(f"Batch finished: {manifest['succeeded']} succeeded, {manifest['failed']} failed")
+    print(f"Manifest saved to: {manifest_path}")
+    return manifest_path
+
+def parse_job(value):
+    """Parses a CITY:SIZE_KM batch job argument"""
+    city_name, _, size_km = value.rpartition(':')
+    if not city_name:
+        raise argparse.ArgumentTypeError(f"Expected CITY:SIZE_KM, got {value}")
+    try:
+        return city_name, float(size_km)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size_km in {value}")
+
 # Usage example
 if __name__ == "__main__":
-    # Create GeoJSON for the area
-    geojson_path = create_city_geojson("berlin", size_km=2)
+    parser = argparse.ArgumentParser(description='Create the MV network of a city with DAVE.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record time and memory per stage in Generated_Files/profile_1_city_network.json')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Geocode, download and run DAVE again instead of reusing the results of previous runs')
+    parser.add_argument('--batch', nargs='+', type=parse_job, metavar='CITY:SIZE_KM',
+                        help='Create the networks of several areas in parallel, e.g. --batch berlin:2 munich:5, '
+                             'in output/batch/<city>_<size>km with a manifest.json')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS,
+                        help='Maximum number of batch jobs running at the same time')
+    parser.add_argument('--fixtures', choices=FIXTURE_MODES, default=None,
+                        help='record: store the geocode, OSM and DAVE responses in DAVE/fixtures; '
+                             'replay: serve them from there without network access')
+    args = parser.parse_args()
+    
+    if args.profile:
+        enable_profiling()
+    if args.fixtures:
+        set_fixture_mode(args.fixtures)
+    
+    if args.batch:
+        # One output folder per job and a manifest of all jobs
+        run_batch(args.batch, str(Path(__file__).parent / 'output' / BATCH_DIRNAME), args.workers,
+                  use_cache=not args.no_cache)
+    else:
+        # Create GeoJSON for the area
+        geojson_path = create_city_geojson("berlin", size_km=2, use_cache=not args.no_cache)
+        
+        if geojson_path:
+            # Create network with DAVE
+            grid_data = create_dave_network(geojson_path, use_cache=not args.no_cache)
     
-    if geojson_path:
-        # Create network with DAVE
-        grid_data = create_dave_network(geojson_path)
+    save_profile('1_city_network', str(Path(__file__).parent / 'Generated_Files'))
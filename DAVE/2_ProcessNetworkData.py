@@ -1,112 +1,53 @@
+import argparse
 import json
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 import csv
-import pyproj
-import re
 from collections import defaultdict
+import projection
+from network_loader import load_mv_network, mv_network_key, load_tower_table
+from mv_graph_store import MV_GRAPH_DIRNAME, MV_GRAPH_FILES, save_mv_graph
+from tower_ingest import deduplicate_co_sited
+from tower_association import (SIMULATION_PARAMETERS_FILE, coverage_radius,
+                               build_association_table, save_association_csv)
+from build_cache import stage_key, cached_value, cached_files
+from stage_profiler import stage, enable_profiling, save_profile
+from network_render import (LABEL_LIMIT, line_segments, segment_label_positions,
+                            draw_lines, draw_circles, draw_markers, draw_labels)
 
 # Variable for the name of the JSON file to be read
 JSON_FILENAME = 'B2_dave_dataset.json'
 GNB_4G_FILENAME = 'B8_vd_4g.json'
 GNB_5G_FILENAME = 'B8_vd_5g.json'
 
-def load_data(file_path):
-    with open(file_path, 'r') as file:
-        return json.load(file)
+# Cell tower sources in the output folder: (file name, technology, operator)
+GNB_SOURCES = [
+    (GNB_4G_FILENAME, '4G', 'B8_vd'),
+    (GNB_5G_FILENAME, '5G', 'B8_vd'),
+]
 
-def extract_mv_data(data):
-    # Extraction of medium voltage data
-    try:
-        # Check if mv_data exists
-        if '_object' not in data:
-            print("No _object key in data")
-            return {}, {}
-            
-        if 'mv_data' not in data['_object']:
-            print("No mv_data key in data['_object']")
-            return {}, {}
-            
-        if '_object' not in data['_object']['mv_data']:
-            print("No _object key in data['_object']['mv_data']")
-            return {}, {}
-        
-        mv_data = data['_object']['mv_data']['_object']
-        
-        # Create a simpler GeoJSON structure for nodes
-        nodes_features = []
-        if 'mv_nodes' in mv_data:
-            nodes_json = mv_data['mv_nodes']
-            # Check if mv_nodes is already in the correct format
-            if '_object' in nodes_json and isinstance(nodes_json['_object'], str):
-                # Try to extract from the string
-                try:
-                    return json.loads(nodes_json['_object']), json.loads(mv_data['mv_lines']['_object'])
-                except json.JSONDecodeError:
-                    print(f"Error decoding mv_nodes/_object or mv_lines/_object as JSON")
-            
-            # Alternative approach: manual creation of GeoJSON
-            if 'dtype' in nodes_json:
-                print("Found mv_nodes with dtype, creating features manually...")
-                # Here we may need to read the data directly from the JSON file
-                # as it may be stored in a different format
-        
-        # Create a simpler GeoJSON structure for lines
-        lines_features = []
-        if 'mv_lines' in mv_data:
-            lines_json = mv_data['mv_lines']
-            # Similar approach to nodes
+# Co-sited towers closer than this (meters) are merged into one entry, 0 disables merging
+GNB_DEDUP_RADIUS_M = 5
 
-        # Create GeoJSON objects
-        nodes_geojson = {"type": "FeatureCollection", "features": nodes_features}
-        lines_geojson = {"type": "FeatureCollection", "features": lines_features}
-        
-        # Alternative approach: reading from the attached file
-        print("Attempting to read MV data from attached file...")
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        # Check if the file exists
-        json_path = os.path.join(script_dir, 'output', 'B2dave_dataset.json')
-        print(f"Looking for data in: {json_path}")
-        
-        if os.path.exists(json_path):
-            with open(json_path, 'r') as f:
-                # Search for mv_nodes and mv_lines as strings in the file
-                content = f.read()
-                # Search for the section containing mv_nodes
-                mv_nodes_match = re.search(r'"mv_nodes":\s*{\s*"_module":[^}]+?"_object":\s*"({[^"]+})"', content)
-                mv_lines_match = re.search(r'"mv_lines":\s*{\s*"_module":[^}]+?"_object":\s*"({[^"]+})"', content)
-                
-                if mv_nodes_match and mv_lines_match:
-                    try:
-                        # Decode the JSON strings containing the GeoJSON
-                        nodes_str = mv_nodes_match.group(1).replace('\\', '')
-                        lines_str = mv_lines_match.group(1).replace('\\', '')
-                        
-                        # Replace escaped characters
-                        nodes_str = nodes_str.replace('\\"', '"')
-                        lines_str = lines_str.replace('\\"', '"')
-                        
-                        # Decode JSON objects
-                        nodes_geojson = json.loads(nodes_str)
-                        lines_geojson = json.loads(lines_str)
-                        
-                        print(f"Successfully extracted MV data from file. Found {len(nodes_geojson.get('features', []))} nodes and {len(lines_geojson.get('features', []))} lines.")
-                        return nodes_geojson, lines_geojson
-                    except json.JSONDecodeError as e:
-                        print(f"Error decoding extracted JSON: {e}")
-                else:
-                    print("Could not find mv_nodes or mv_lines patterns in the file.")
-        else:
-            print(f"Warning: File {json_path} not found")
-        
-        return nodes_geojson, lines_geojson
-        
-    except Exception as e:
-        print(f"Error in extract_mv_data: {e}")
-        import traceback
-        traceback.print_exc()
-        return {}, {}
+# Maximum number of processes parsing tower files (None: one per CPU)
+GNB_INGEST_WORKERS = None
+
+# Edge distances used as graph weights: 'polyline' (along the line geometry)
+# or 'euclidean' (straight line between the end nodes)
+EDGE_DISTANCE_MODE = 'polyline'
+
+# GeoJSON polygon in the DAVE folder (e.g. 'berlin.geojson') the MV network and
+# the GNBs are clipped to, None to keep everything within the MV network bounding box
+AOI_GEOJSON = None
+
+# Files whose content is part of the build cache keys of the outputs
+CODE_FILES = ['2_ProcessNetworkData.py', 'network_loader.py', 'projection.py',
+              'mv_graph_store.py', 'tower_ingest.py', 'network_render.py', 'tower_association.py',
+              'aoi_clip.py']
+
+# Also export the MV graph as mv_nodes_info.csv (the DronePathCreator.java input)
+EXPORT_MV_NODES_CSV = True
 
 def convert_to_normalized_coordinates(coords_list, bbox):
     """
@@ -120,184 +61,15 @@ def convert_to_normalized_coordinates(coords_list, bbox):
     Returns:
         List with converted coordinates [x, y]
     """
-    # Calculation of scale factors
-    transformer = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:3035", always_xy=True)
-    
-    # Conversion of bbox limits to meters
-    min_x, min_y = transformer.transform(bbox['min_lon'], bbox['min_lat'])
-    max_x, max_y = transformer.transform(bbox['max_lon'], bbox['max_lat'])
-    
-    # Calculation of the width and height of the space
-    width = max_x - min_x
-    height = max_y - min_y
-    
-    # Adding a 10% margin on all sides
-    margin_x = width * 0.1
-    margin_y = height * 0.1
-    
-    # Conversion of the point coordinates
-    x, y = transformer.transform(coords_list[0], coords_list[1])
-    
-    # Normalization with margin
-    norm_x = x - min_x + margin_x
-    norm_y = y - min_y + margin_y
-    
-    # Return normalized coordinates
-    return [int(norm_x), int(norm_y)]
-
-def parse_nodes(nodes_data):
-    nodes_dict = {}
-    all_coordinates = []
-    
-    for feature in nodes_data.get('features', []):
-        properties = feature.get('properties', {})
-        geometry = feature.get('geometry', {})
-        
-        node_id = properties.get('dave_name', '')
-        # Extract the numerical part of the ID
-        node_num = node_id.split('_')[-1]
-        coordinates = geometry.get('coordinates', [0, 0])
-        all_coordinates.append(coordinates)
-        
-        nodes_dict[node_id] = {
-            'id': node_num,  # Store only the numerical part
-            'coordinates': coordinates,
-            'connections': []
-        }
-    
-    # Calculate bounding box
-    if all_coordinates:
-        lats = [coord[1] for coord in all_coordinates]
-        lons = [coord[0] for coord in all_coordinates]
-        
-        bbox = {
-            'min_lat': min(lats),
-            'max_lat': max(lats),
-            'min_lon': min(lons),
-            'max_lon': max(lons)
-        }
-        
-        # Add normalized coordinates to each node
-        for node_id, node_data in nodes_dict.items():
-            node_data['normalized_coordinates'] = convert_to_normalized_coordinates(
-                node_data['coordinates'], bbox
-            )
-    
-    return nodes_dict
-
-def parse_lines(lines_data, nodes_dict):
-    lines = []
-    total_length = 0
-    
-    # Add a dictionary to store edge distances
-    edge_distances = {}
-    # To avoid double calculation of the same edge
-    processed_edges = set()
-    # New variable for total length based on Euclidean distance
-    euclidean_total_length_m = 0
-    
-    for feature in lines_data.get('features', []):
-        properties = feature.get('properties', {})
-        geometry = feature.get('geometry', {})
-        
-        from_bus = properties.get('from_bus', '')
-        to_bus = properties.get('to_bus', '')
-        length_km = properties.get('length_km', 0)
-        
-        # Calculate the distance between nodes
-        if from_bus in nodes_dict and to_bus in nodes_dict:
-            coord1 = nodes_dict[from_bus]['coordinates']
-            coord2 = nodes_dict[to_bus]['coordinates']
-            distance = calculate_distance(coord1, coord2)
-            
-            # Store the distance in both directions
-            edge_key1 = f"{from_bus}-{to_bus}"
-            edge_key2 = f"{to_bus}-{from_bus}"
-            edge_distances[edge_key1] = int(distance)
-            edge_distances[edge_key2] = int(distance)
-            
-            # Add the Euclidean distance to the total length
-            # only once for each pair of nodes
-            if (from_bus, to_bus) not in processed_edges and (to_bus, from_bus) not in processed_edges:
-                euclidean_total_length_m += distance
-                processed_edges.add((from_bus, to_bus))
-        
-        # Add connections to the nodes
-        if from_bus in nodes_dict:
-            nodes_dict[from_bus]['connections'].append(to_bus)
-        if to_bus in nodes_dict:
-            nodes_dict[to_bus]['connections'].append(from_bus)
-        
-        coordinates = geometry.get('coordinates', [])
-        
-        if from_bus and to_bus and coordinates:
-            lines.append({
-                'from_bus': from_bus,
-                'to_bus': to_bus,
-                'length_km': length_km,
-                'coordinates': coordinates,
-                'euclidean_distance': edge_distances.get(f"{from_bus}-{to_bus}", 0)
-            })
-            total_length += length_km
-    
-    # Add distances to node data
-    for node_id, node_data in nodes_dict.items():
-        node_data['edge_distances'] = {}
-        for connection in node_data['connections']:
-            edge_key = f"{node_id}-{connection}"
-            if edge_key in edge_distances:
-                node_data['edge_distances'][connection] = edge_distances[edge_key]
-    
-    # Convert from meters to kilometers
-    euclidean_total_length_km = euclidean_total_length_m / 1000
-    
-    return lines, euclidean_total_length_km
+    # The bbox origin and margins are computed once per bbox by the projection service
+    return projection.normalize([coords_list], bbox)[0].tolist()
 
 def calculate_distance(coord1, coord2):
-    # Convert from geographic coordinates to meters
-    transformer = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:3035", always_xy=True)
-    
-    x1, y1 = transformer.transform(coord1[0], coord1[1])
-    x2, y2 = transformer.transform(coord2[0], coord2[1])
-    
-    # Calculate distance in meters
-    distance = ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
-    
-    return distance
+    # Convert from geographic coordinates to meters with the shared transformer
+    return projection.calculate_distance(coord1, coord2)
 
 def calculate_area_dimensions(coordinates):
-    if not coordinates:
-        return {
-            'min_lat': 0, 'max_lat': 0, 'min_lon': 0, 'max_lon': 0,
-            'width': 0, 'height': 0, 'area': 0
-        }
-        
-    lats = [coord[1] for coord in coordinates]
-    lons = [coord[0] for coord in coordinates]
-    
-    transformer = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:3035", always_xy=True)
-    
-    min_lat, max_lat = min(lats), max(lats)
-    min_lon, max_lon = min(lons), max(lons)
-    
-    # Convert coordinates to meters
-    x1, y1 = transformer.transform(min_lon, min_lat)
-    x2, y2 = transformer.transform(max_lon, max_lat)
-    
-    # Calculate dimensions
-    width = abs(x2 - x1)
-    height = abs(y2 - y1)
-    area = width * height / 1000000  # in square kilometers
-    
-    return {
-        'min_lat': min_lat,
-        'max_lat': max_lat,
-        'min_lon': min_lon,
-        'max_lon': max_lon,
-        'width': int(width),
-        'height': int(height),
-        'area': round(area, 2)
-    }
+    return projection.calculate_area_dimensions(coordinates)
 
 def get_tech_color(tech):
     """
@@ -364,46 +136,21 @@ def plot_network(nodes_dict, lines, total_length):
     # Increase the size of the plot and improve the ratio
     plt.figure(figsize=(18, 15))
     
-    # Collect all coordinates for dimension calculation
-    all_coordinates = []
+    ax = plt.gca()
     
-    # Plot lines and add distances
-    for line in lines:
-        from_node = nodes_dict.get(line['from_bus'])
-        to_node = nodes_dict.get(line['to_bus'])
-        
-        if from_node and to_node:
-            x1, y1 = from_node['coordinates']
-            x2, y2 = to_node['coordinates']
-            
-            plt.plot([x1, x2], [y1, y2], 'k-', linewidth=1.0, alpha=0.8, zorder=1)
-            all_coordinates.append([x1, y1])
-            all_coordinates.append([x2, y2])
-            
-            # Calculate distance in meters
-            distance = calculate_distance([x1, y1], [x2, y2])
-            
-            # Display the distance above the line
-            midx = (x1 + x2) / 2
-            midy = (y1 + y2) / 2
-            
-            # Calculate the slope of the line for the direction of the offset
-            if x2 != x1:  # Avoid division by zero
-                slope = (y2 - y1) / (x2 - x1)
-                angle = np.arctan(slope)
-                offset_x = -0.00001 * np.sin(angle)
-                offset_y = 0.00001 * np.cos(angle)
-            else:  # Vertical line
-                offset_x = 0.00001
-                offset_y = 0
-            
-            plt.text(midx + offset_x, midy + offset_y, f"{int(distance)}m", 
-                    fontsize=8, ha='center', va='center', 
-                    bbox=dict(facecolor='white', alpha=0.8, edgecolor='none', boxstyle='round,pad=0.2'),
-                    zorder=3)
+    # Plot all lines as one collection
+    segments, drawn_lines = line_segments(nodes_dict, lines)
+    draw_lines(ax, segments, linewidth=1.0, alpha=0.8, zorder=1)
+    
+    # Display the distances (in meters, already calculated by parse_lines) above the lines
+    draw_labels(ax, segment_label_positions(segments, offset=0.00001),
+                [f"{int(line['euclidean_distance'])}m" for line in drawn_lines],
+                fontsize=8, ha='center', va='center', 
+                bbox=dict(facecolor='white', alpha=0.8, edgecolor='none', boxstyle='round,pad=0.2'),
+                zorder=3)
     
     # Calculate area dimensions to adjust aspect ratio
-    dimensions = calculate_area_dimensions(all_coordinates)
+    dimensions = calculate_area_dimensions(segments.reshape(-1, 2))
     
     # Set axis limits with small padding for clearer plot display
     padding = 0.0005
@@ -411,7 +158,6 @@ def plot_network(nodes_dict, lines, total_length):
     plt.ylim(dimensions['min_lat'] - padding, dimensions['max_lat'] + padding)
     
     # Set equal aspect ratio for normal circles
-    ax = plt.gca()
     ax.set_aspect('equal')
     
     # Define node size - adjusted for equal aspect ratio
@@ -419,18 +165,12 @@ def plot_network(nodes_dict, lines, total_length):
     node_radius = 0.0005  # Adjusted size
     
     # Plot nodes as circles with their IDs inside - all same color and size
-    for node_id, node_data in nodes_dict.items():
-        x, y = node_data['coordinates']
-        
-        # Use the already stored numerical ID
-        node_num = node_data['id']
-        
-        # Draw circle - all same color and size
-        circle = plt.Circle((x, y), radius=node_radius, fc=node_color, ec='black', alpha=0.8, zorder=2)
-        ax.add_patch(circle)
-        
-        # Add ID inside the circle
-        plt.text(x, y, node_num, fontsize=9, ha='center', va='center', weight='bold', zorder=3)
+    node_coordinates = [node_data['coordinates'] for node_data in nodes_dict.values()]
+    draw_circles(ax, node_coordinates, node_radius, facecolor=node_color, edgecolor='black', alpha=0.8, zorder=2)
+    
+    # Add the already stored numerical ID inside the circles
+    draw_labels(ax, node_coordinates, [node_data['id'] for node_data in nodes_dict.values()],
+                fontsize=9, ha='center', va='center', weight='bold', zorder=3)
     
     # Set plot properties
     plt.title('Medium Voltage Network', fontsize=16, fontweight='bold')
@@ -476,21 +216,26 @@ def plot_network(nodes_dict, lines, total_length):
     
     return dimensions
 
-def parse_gnb_data(gnb_4g_file, gnb_5g_file, bbox):
+def parse_gnb_data(gnb_sources, bbox, dedup_radius=None, use_cache=True, aoi_path=None):
     """
-    Reads the GNB data from 4G and 5G files and filters those
-    that are within the MV network bounding box (with additional margin)
+    Reads the GNB data from any number of operator/technology files and
+    filters those that are within the MV network bounding box (with additional margin)
+    and, if given, within the area of interest polygon
     
     Args:
-        gnb_4g_file: Path to the 4G file
-        gnb_5g_file: Path to the 5G file
+        gnb_sources: List of (path, technology, operator) tuples
         bbox: The bounding box of the MV network
+        dedup_radius: Co-sited towers closer than this (meters) are merged,
+                      GNB_DEDUP_RADIUS_M by default
+        use_cache: False to parse the tower files even if their tower table is cached
+        aoi_path: GeoJSON polygon the GNBs are clipped to, None to only use the bounding box
         
     Returns:
-        Dictionary with filtered GNBs and normalized coordinates
+        Dictionary with filtered GNBs and normalized coordinates, None if
+        the GNB data could not be parsed (so that the failure is not cached)
     """
-    gnb_dict = {}
-    gnb_id = 0
+    if dedup_radius is None:
+        dedup_radius = GNB_DEDUP_RADIUS_M
     
     # Calculate an expanded bounding box to include more GNBs
     # Add 10% margin to the original bounding box
@@ -508,85 +253,55 @@ def parse_gnb_data(gnb_4g_file, gnb_5g_file, bbox):
     print(f"Extended bounding box: {extended_bbox}")
     
     try:
-        # Load 4G data
-        if os.path.exists(gnb_4g_file):
-            print(f"Reading 4G data from {gnb_4g_file}")
-            data_4g = load_data(gnb_4g_file)
-            for gnb in data_4g.get('responseData', []):
-                lat = gnb.get('latitude', 0)
-                lon = gnb.get('longitude', 0)
-                
-                # Check if the point is within the expanded bounding box
-                if (extended_bbox['min_lon'] <= lon <= extended_bbox['max_lon'] and 
-                    extended_bbox['min_lat'] <= lat <= extended_bbox['max_lat']):
-                    
-                    # Create a list of coordinates [longitude, latitude]
-                    coords = [lon, lat]
-                    
-                    # Calculate normalized coordinates using the original bbox
-                    # to maintain the correct scale
-                    normalized_coords = convert_to_normalized_coordinates(coords, bbox)
-                    
-                    # Determine GNB type from towerAttributes
-                    gnb_type = "MACRO"  # Default
-                    if "towerAttributes" in gnb and "TOWER_TYPE" in gnb["towerAttributes"]:
-                        gnb_type = gnb["towerAttributes"]["TOWER_TYPE"]
-                    
-                    # Store information
-                    gnb_dict[gnb_id] = {
-                        'coordinates': coords,
-                        'normalized_coordinates': normalized_coords,
-                        'type': gnb_type,
-                        'technology': '4G'
-                    }
-                    gnb_id += 1
-        
-        # Load 5G data
-        if os.path.exists(gnb_5g_file):
-            print(f"Reading 5G data from {gnb_5g_file}")
-            data_5g = load_data(gnb_5g_file)
-            for gnb in data_5g.get('responseData', []):
-                lat = gnb.get('latitude', 0)
-                lon = gnb.get('longitude', 0)
-                
-                # Check if the point is within the expanded bounding box
-                if (extended_bbox['min_lon'] <= lon <= extended_bbox['max_lon'] and 
-                    extended_bbox['min_lat'] <= lat <= extended_bbox['max_lat']):
-                    
-                    # Create a list of coordinates [longitude, latitude]
-                    coords = [lon, lat]
-                    
-                    # Calculate normalized coordinates using the original bbox
-                    normalized_coords = convert_to_normalized_coordinates(coords, bbox)
-                    
-                    # Determine GNB type from towerAttributes
-                    gnb_type = "MACRO"  # Default
-                    if "towerAttributes" in gnb and "TOWER_TYPE" in gnb["towerAttributes"]:
-                        gnb_type = gnb["towerAttributes"]["TOWER_TYPE"]
-                    
-                    # Store information
-                    gnb_dict[gnb_id] = {
-                        'coordinates': coords,
-                        'normalized_coordinates': normalized_coords,
-                        'type': gnb_type,
-                        'technology': '5G'
-                    }
-                    gnb_id += 1
+        # Parse all tower files concurrently into one columnar tower table (shared with the plot scripts)
+        towers = load_tower_table(gnb_sources, GNB_INGEST_WORKERS, use_cache)
+        
+        # Keep the towers within the expanded bounding box in one vectorized pass
+        mask = ((towers['lon'] >= extended_bbox['min_lon']) & (towers['lon'] <= extended_bbox['max_lon']) &
+                (towers['lat'] >= extended_bbox['min_lat']) & (towers['lat'] <= extended_bbox['max_lat']))
+        towers = {key: values[mask] for key, values in towers.items()}
+        
+        # Keep only the towers inside the area of interest
+        if aoi_path:
+            from aoi_clip import load_aoi, clip_points
+            inside = clip_points(np.column_stack((towers['lon'], towers['lat'])), load_aoi(aoi_path))
+            print(f"Area of interest: kept {np.count_nonzero(inside)} of {len(inside)} GNBs")
+            towers = {key: values[inside] for key, values in towers.items()}
+        
+        # Project the surviving GNBs in one call
+        coordinates = np.column_stack((towers['lon'], towers['lat']))
+        projected = projection.project(coordinates)
+        
+        # Merge co-sited entries (e.g. 4G and 5G on the same mast) with a spatial hash
+        towers, kept = deduplicate_co_sited(towers, projected, dedup_radius)
+        if len(kept) < len(coordinates):
+            print(f"Merged {len(coordinates) - len(kept)} co-sited GNB entries (radius {dedup_radius} m)")
+        coordinates = coordinates[kept]
+        
+        # Calculate normalized coordinates using the original bbox
+        # to maintain the correct scale
+        normalized = projection.to_frame(projected[kept], bbox)
+        
+        # Store information
+        gnb_dict = {}
+        for gnb_id, (coords, normalized_coords, gnb_type, technology, technologies, operators) in enumerate(zip(
+                coordinates.tolist(), normalized.tolist(), towers['type'], towers['technology'],
+                towers['technologies'], towers['operators'])):
+            gnb_dict[gnb_id] = {
+                'coordinates': coords,
+                'normalized_coordinates': normalized_coords,
+                'type': gnb_type,
+                'technology': technology,
+                'technologies': technologies,
+                'operators': operators
+            }
         
         print(f"Found {len(gnb_dict)} GNBs within the MV network bounding box")
         
         # Detailed information about station types
-        tech_counts = {
-            '4G': sum(1 for gnb in gnb_dict.values() if gnb.get('technology') == '4G'),
-            '5G': sum(1 for gnb in gnb_dict.values() if gnb.get('technology') == '5G')
-        }
-        
-        type_counts = {}
-        for gnb in gnb_dict.values():
-            gnb_type = gnb.get('type', 'UNKNOWN')
-            if gnb_type not in type_counts:
-                type_counts[gnb_type] = 0
-            type_counts[gnb_type] += 1
+        tech_counts = {tech: int(np.count_nonzero(towers['technology'] == tech)) for tech in ('4G', '5G')}
+        type_values, type_totals = np.unique(towers['type'].astype(str), return_counts=True)
+        type_counts = dict(zip(type_values.tolist(), type_totals.tolist()))
         
         print(f"GNB Technologies: {tech_counts}")
         print(f"GNB Types: {type_counts}")
@@ -597,7 +312,7 @@ def parse_gnb_data(gnb_4g_file, gnb_5g_file, bbox):
         print(f"Error parsing GNB data: {e}")
         import traceback
         traceback.print_exc()
-        return {}
+        return None
 
 def determine_gnb_type(properties):
     """
@@ -635,23 +350,22 @@ def save_gnbs_to_csv(gnb_dict, output_file):
         gnb_dict: Dictionary with GNB data
         output_file: File path for saving
     """
-    try:
-        with open(output_file, 'w', newline='') as csvfile:
-            fieldnames = ['id', 'coordinates', 'normalized_coordinates', 'type', 'technology']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for gnb_id, gnb_data in gnb_dict.items():
-                writer.writerow({
-                    'id': gnb_id,
-                    'coordinates': gnb_data['coordinates'],
-                    'normalized_coordinates': gnb_data['normalized_coordinates'],
-                    'type': gnb_data['type'],
-                    'technology': gnb_data['technology']
-                })
-        print(f"Successfully saved {len(gnb_dict)} GNBs to {output_file}")
-    except Exception as e:
-        print(f"Error saving GNB data to CSV: {e}")
+    with open(output_file, 'w', newline='') as csvfile:
+        fieldnames = ['id', 'coordinates', 'normalized_coordinates', 'type', 'technology', 'technologies', 'operators']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        
+        writer.writeheader()
+        for gnb_id, gnb_data in gnb_dict.items():
+            writer.writerow({
+                'id': gnb_id,
+                'coordinates': gnb_data['coordinates'],
+                'normalized_coordinates': gnb_data['normalized_coordinates'],
+                'type': gnb_data['type'],
+                'technology': gnb_data['technology'],
+                'technologies': gnb_data.get('technologies', gnb_data['technology']),
+                'operators': gnb_data.get('operators', '')
+            })
+    print(f"Successfully saved {len(gnb_dict)} GNBs to {output_file}")
 
 def plot_combined_network(nodes_dict, lines, gnb_dict, total_length, output_filename='combined_network_map.png'):
     """
@@ -685,53 +399,42 @@ def plot_combined_network(nodes_dict, lines, gnb_dict, total_length, output_file
     all_x_coords = x_coords + gnb_x_coords
     all_y_coords = y_coords + gnb_y_coords
     
-    # Plot lines and add distances
-    for line in lines:
-        from_node_id = line['from_bus']
-        to_node_id = line['to_bus']
+    ax = plt.gca()
+    
+    # Plot all lines as one collection
+    segments, drawn_lines = line_segments(nodes_dict, lines, 'normalized_coordinates')
+    draw_lines(ax, segments, linewidth=1.0, alpha=0.6, zorder=1)
+    
+    # Add distance labels (if available in data) to the middle of the edges
+    label_positions = []
+    label_texts = []
+    for line, position in zip(drawn_lines, segment_label_positions(segments)):
+        distance = None
         
-        if from_node_id in nodes_dict and to_node_id in nodes_dict:
-            from_x = nodes_dict[from_node_id]['normalized_coordinates'][0]
-            from_y = nodes_dict[from_node_id]['normalized_coordinates'][1]
-            to_x = nodes_dict[to_node_id]['normalized_coordinates'][0]
-            to_y = nodes_dict[to_node_id]['normalized_coordinates'][1]
-            
-            # Plot the line
-            plt.plot([from_x, to_x], [from_y, to_y], 'k-', linewidth=1.0, alpha=0.6, zorder=1)
-            
-            # Add distance label to the middle of the edge
-            mid_x = (from_x + to_x) / 2
-            mid_y = (from_y + to_y) / 2
-            
-            # Calculate distance (if available in data)
-            distance = None
+        if 'euclidean_distance' in line:
+            distance = line['euclidean_distance']
+        elif 'edge_distances' in nodes_dict[line['from_bus']] and line['to_bus'] in nodes_dict[line['from_bus']]['edge_distances']:
+            distance = nodes_dict[line['from_bus']]['edge_distances'][line['to_bus']]
             
-            if 'euclidean_distance' in line:
-                distance = line['euclidean_distance']
-            elif 'edge_distances' in nodes_dict[from_node_id] and to_node_id in nodes_dict[from_node_id]['edge_distances']:
-                distance = nodes_dict[from_node_id]['edge_distances'][to_node_id]
-                
-            if distance is not None:
-                # Add distance label to the edge
-                plt.text(mid_x, mid_y, f"{int(distance)}m", fontsize=7, 
-                        bbox=dict(facecolor='white', alpha=0.7, edgecolor='gray', boxstyle='round,pad=0.2'),
-                        ha='center', va='center', zorder=5)
+        if distance is not None:
+            label_positions.append(position)
+            label_texts.append(f"{int(distance)}m")
+    
+    draw_labels(ax, label_positions, label_texts, fontsize=7, 
+                bbox=dict(facecolor='white', alpha=0.7, edgecolor='gray', boxstyle='round,pad=0.2'),
+                ha='center', va='center', zorder=5)
     
     # Plot MV nodes
     # Use a single color for all MV nodes
     mv_color = '#add8e6'  # Light blue
     mv_size = 210         # Triple size (70 * 3 = 210)
     
-    for node_id, node_data in nodes_dict.items():
-        x, y = node_data['normalized_coordinates'][0], node_data['normalized_coordinates'][1]
-        node_num = node_data['id']  # Use numerical ID
-        
-        # Plot the node
-        plt.scatter(x, y, color=mv_color, s=mv_size, edgecolors='black', linewidths=0.8, alpha=0.9, zorder=2)
-        
-        # Add node ID inside the node (larger size due to larger node)
-        plt.text(x, y, node_num, fontsize=9, ha='center', va='center', 
-                color='black', weight='bold', zorder=3)
+    node_coordinates = list(zip(x_coords, y_coords))
+    draw_markers(ax, node_coordinates, color=mv_color, s=mv_size, edgecolors='black', linewidths=0.8, alpha=0.9, zorder=2)
+    
+    # Add node IDs inside the nodes (larger size due to larger nodes)
+    draw_labels(ax, node_coordinates, [node_data['id'] for node_data in nodes_dict.values()],
+                fontsize=9, ha='center', va='center', color='black', weight='bold', zorder=3)
     
     # Define sizes for different tower types
     gnb_sizes = {
@@ -745,37 +448,37 @@ def plot_combined_network(nodes_dict, lines, gnb_dict, total_length, output_file
     tech_scatter_refs = {}  # For different technologies
     type_scatter_refs = {}  # For different tower types
     
-    # Plot GNB towers
-    for gnb_id, gnb_data in gnb_dict.items():
-        x, y = gnb_data['normalized_coordinates'][0], gnb_data['normalized_coordinates'][1]
+    # Group GNB towers by marker class (technology and tower type)
+    gnb_groups = {}
+    for gnb_data in gnb_dict.values():
         tech = gnb_data.get('technology', '4G')
         tower_type = gnb_data.get('type', 'MACRO')
+        gnb_groups.setdefault((tech, tower_type), []).append(gnb_data['normalized_coordinates'])
         
+        # Maintain references for legend
+        if tech not in tech_scatter_refs:
+            tech_scatter_refs[tech] = (get_tech_color(tech), 'o')  # Simplified for legend
+        if tower_type not in type_scatter_refs:
+            type_scatter_refs[tower_type] = get_tower_marker(tower_type)
+    
+    # Plot GNB towers, one scatter per marker class
+    for (tech, tower_type), points in gnb_groups.items():
         # Use color, marker, and size with helper functions
         color = get_tech_color(tech)
-        marker = get_tower_marker(tower_type)
-        size = gnb_sizes.get(tower_type, 80)
-        
-        # Plot the GNB
-        scatter = plt.scatter(x, y, color=color, marker=marker, s=size, 
-                    edgecolors='black', linewidths=0.8, alpha=0.9, zorder=4)
-        
-        # Add label with type and technology
-        label_text = f"{tech}/{tower_type[:2]}"
-        plt.text(x, y + 100, label_text, fontsize=6, ha='center', va='center',
-                color='black', weight='bold',
-                bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.1', 
-                         edgecolor=color, linewidth=0.5),
-                zorder=5)
-        
-        # Maintain references for legend
-        tech_key = tech
-        if tech_key not in tech_scatter_refs:
-            tech_scatter_refs[tech_key] = (color, 'o')  # Simplified for legend
-            
-        type_key = tower_type
-        if type_key not in type_scatter_refs:
-            type_scatter_refs[type_key] = marker
+        draw_markers(ax, points, color=color, marker=get_tower_marker(tower_type), s=gnb_sizes.get(tower_type, 80), 
+                     edgecolors='black', linewidths=0.8, alpha=0.9, zorder=4)
+    
+    # Add labels with type and technology
+    if len(gnb_dict) <= LABEL_LIMIT:
+        for gnb_data in gnb_dict.values():
+            x, y = gnb_data['normalized_coordinates'][0], gnb_data['normalized_coordinates'][1]
+            tech = gnb_data.get('technology', '4G')
+            tower_type = gnb_data.get('type', 'MACRO')
+            plt.text(x, y + 100, f"{tech}/{tower_type[:2]}", fontsize=6, ha='center', va='center',
+                    color='black', weight='bold',
+                    bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.1', 
+                             edgecolor=get_tech_color(tech), linewidth=0.5),
+                    zorder=5)
     
     # Create legend elements
     legend_elements = []
@@ -876,32 +579,67 @@ def plot_combined_network(nodes_dict, lines, gnb_dict, total_length, output_file
     
     return dimensions
 
-def main(json_filename=JSON_FILENAME):
+def save_mv_network_map(nodes_dict, lines, total_length, output_path):
+    """Plots the MV network only and saves it"""
+    plot_network(nodes_dict, lines, total_length)
+    plt.savefig(output_path, dpi=300, bbox_inches='tight', pad_inches=0.2)
+    print(f"MV network map saved as: {output_path}")
+    plt.close()
+
+def mv_export_paths(generated_dir, dronesim_dir):
+    """Returns the paths of all files written by export_mv_network"""
+    paths = [os.path.join(generated_dir, MV_GRAPH_DIRNAME, name) for name in MV_GRAPH_FILES]
+    if EXPORT_MV_NODES_CSV:
+        paths.append(os.path.join(generated_dir, 'mv_nodes_info.csv'))
+    if os.path.exists(dronesim_dir):
+        paths += [os.path.join(dronesim_dir, MV_GRAPH_DIRNAME, name) for name in MV_GRAPH_FILES]
+        if EXPORT_MV_NODES_CSV:
+            paths.append(os.path.join(dronesim_dir, 'mv_nodes_info.csv'))
+    return paths
+
+def export_mv_network(nodes_dict, generated_dir, dronesim_dir):
+    """Saves the MV graph (and the optional CSV) to Generated_Files and to DroneSim"""
+    # Save the MV graph (node table and edge list) in Generated_Files
+    mv_graph_dir = save_mv_graph(nodes_dict, os.path.join(generated_dir, MV_GRAPH_DIRNAME))
+    print(f"MV graph saved to: {mv_graph_dir}")
+    
+    # Optional CSV export of the MV nodes (still read by DronePathCreator.java)
+    if EXPORT_MV_NODES_CSV:
+        save_nodes_to_csv(nodes_dict, os.path.join(generated_dir, 'mv_nodes_info.csv'))
+    
+    # Also save a copy to EdgeSimulator/PureEdgeSim/DroneSim
+    if os.path.exists(dronesim_dir):
+        dronesim_mv_graph = save_mv_graph(nodes_dict, os.path.join(dronesim_dir, MV_GRAPH_DIRNAME))
+        print(f"Also saved MV graph to: {dronesim_mv_graph}")
+        if EXPORT_MV_NODES_CSV:
+            dronesim_mv_csv = os.path.join(dronesim_dir, 'mv_nodes_info.csv')
+            save_nodes_to_csv(nodes_dict, dronesim_mv_csv)
+            print(f"Also saved MV nodes info to: {dronesim_mv_csv}")
+    else:
+        print(f"Warning: Directory {dronesim_dir} not found, couldn't save MV nodes info there")
+
+def main(json_filename=JSON_FILENAME, use_cache=True, aoi_geojson=AOI_GEOJSON):
     # Load the data
     script_dir = os.path.dirname(os.path.abspath(__file__))
     data_path = os.path.join(script_dir, 'output', json_filename)
+    aoi_path = os.path.join(script_dir, aoi_geojson) if aoi_geojson else None
+    
+    # Every stage is keyed by its inputs, its parameters and the code implementing it
+    code_files = [os.path.join(script_dir, name) for name in CODE_FILES]
     
     print(f"Loading data from {data_path}")
     try:
-        data = load_data(data_path)
-        
-        # Extract MV data
-        mv_nodes_data, mv_lines_data = extract_mv_data(data)
-        
-        if not mv_nodes_data or not mv_lines_data:
-            print("No MV data found in the JSON file.")
-            return
-        
-        # Process MV data
-        nodes_dict = parse_nodes(mv_nodes_data)
-        if not nodes_dict:
-            print("No nodes could be parsed from the MV data.")
-            return
-            
-        lines, total_length = parse_lines(mv_lines_data, nodes_dict)
-        if not lines:
-            print("No lines could be parsed from the MV data.")
+        # The parsed network is cached by the shared loader; the outputs also
+        # depend on the code of this script
+        mv_key = stage_key('mv_outputs', code_files, params=mv_network_key(data_path, EDGE_DISTANCE_MODE, aoi_path))
+        with stage('load_mv_network', 'load'):
+            mv_network = load_mv_network(data_path, EDGE_DISTANCE_MODE, use_cache, aoi_path)
+        if mv_network is None:
             return
+        nodes_dict = mv_network['nodes']
+        lines = mv_network['lines']
+        total_length = mv_network['total_length']
+        dimensions = mv_network['dimensions']
         
         print(f"Found {len(nodes_dict)} nodes and {len(lines)} lines.")
         
@@ -911,27 +649,20 @@ def main(json_filename=JSON_FILENAME):
             os.makedirs(generated_dir)
             print(f"Created directory: {generated_dir}")
         
-        # Plot MV network only
-        dimensions = plot_network(nodes_dict, lines, total_length)
-        
-        # Αποθήκευση του mv_network_map.png στο Generated_Files
+        # Plot MV network only and save mv_network_map.png in Generated_Files
         mv_network_map = os.path.join(generated_dir, 'mv_network_map.png')
-        plt.savefig(mv_network_map, dpi=300, bbox_inches='tight', pad_inches=0.2)
-        print(f"MV network map saved as: {mv_network_map}")
-        plt.close()
+        with stage('plot_mv_network_map', 'plot'):
+            cached_files('mv_network_map', stage_key('mv_network_map', params=mv_key), [mv_network_map],
+                         lambda: save_mv_network_map(nodes_dict, lines, total_length, mv_network_map), use_cache)
         
-        # Save MV node information to CSV in Generated_Files
-        mv_csv_path = os.path.join(generated_dir, 'mv_nodes_info.csv')
-        save_nodes_to_csv(nodes_dict, mv_csv_path)
-        
-        # Also save a copy to EdgeSimulator/PureEdgeSim/DroneSim
+        # Save the MV graph and the MV nodes CSV to Generated_Files and DroneSim
         dronesim_dir = os.path.join(os.path.dirname(script_dir), 'PureEdgeSim', 'DroneSim')
-        if os.path.exists(dronesim_dir):
-            dronesim_mv_csv = os.path.join(dronesim_dir, 'mv_nodes_info.csv')
-            save_nodes_to_csv(nodes_dict, dronesim_mv_csv)
-            print(f"Also saved MV nodes info to: {dronesim_mv_csv}")
-        else:
-            print(f"Warning: Directory {dronesim_dir} not found, couldn't save MV nodes info there")
+        mv_graph_dir = os.path.join(generated_dir, MV_GRAPH_DIRNAME)
+        mv_csv_path = os.path.join(generated_dir, 'mv_nodes_info.csv')
+        export_paths = mv_export_paths(generated_dir, dronesim_dir)
+        with stage('export_mv_graph', 'export'):
+            cached_files('mv_export', stage_key('mv_export', params=[mv_key, export_paths]), export_paths,
+                         lambda: export_mv_network(nodes_dict, generated_dir, dronesim_dir), use_cache)
         
         # Create bounding box from dimensions
         bbox = {
@@ -942,24 +673,49 @@ def main(json_filename=JSON_FILENAME):
         }
         
         # Load and process GNB data
-        gnb_4g_path = os.path.join(script_dir, 'output', GNB_4G_FILENAME)
-        gnb_5g_path = os.path.join(script_dir, 'output', GNB_5G_FILENAME)
-        
-        print(f"Loading and processing GNB data from {gnb_4g_path} and {gnb_5g_path}")
-        
-        # Extract GNB data (4G and 5G)
-        gnb_dict = parse_gnb_data(gnb_4g_path, gnb_5g_path, bbox)
-        
-        if not gnb_dict:
+        gnb_sources = [(os.path.join(script_dir, 'output', filename), technology, operator)
+                       for filename, technology, operator in GNB_SOURCES]
+        
+        print(f"Loading and processing GNB data from {', '.join(path for path, _, _ in gnb_sources)}")
+        
+        # Extract GNB data (all operators and technologies)
+        gnb_key = stage_key('gnb_filter', [path for path, _, _ in gnb_sources] + ([aoi_path] if aoi_path else []) + code_files,
+                            params=[bbox, GNB_SOURCES, GNB_DEDUP_RADIUS_M])
+        with stage('filter_gnbs', 'filter'):
+            gnb_dict = cached_value('gnb_filter', gnb_key,
+                                    lambda: parse_gnb_data(gnb_sources, bbox, use_cache=use_cache, aoi_path=aoi_path),
+                                    use_cache)
+        
+        if gnb_dict is None:
+            print("GNB data could not be parsed, the GNB outputs are not updated.")
+        elif not gnb_dict:
             print("No GNBs found within the MV network bounding box.")
         else:
             # Save GNB information to CSV in Generated_Files
             gnb_csv_path = os.path.join(generated_dir, 'gnb_info.csv')
-            save_gnbs_to_csv(gnb_dict, gnb_csv_path)
+            with stage('export_gnb_csv', 'export'):
+                cached_files('gnb_csv', stage_key('gnb_csv', params=gnb_key), [gnb_csv_path],
+                             lambda: save_gnbs_to_csv(gnb_dict, gnb_csv_path), use_cache)
             print(f"GNB information saved to: {gnb_csv_path}")
             
             # Create combined network map with MV and GNB
-            plot_combined_network(nodes_dict, lines, gnb_dict, total_length, os.path.join(generated_dir, 'combined_network_map.png'))
+            combined_network_map = os.path.join(generated_dir, 'combined_network_map.png')
+            with stage('plot_combined_network_map', 'plot'):
+                cached_files('combined_network_map', stage_key('combined_network_map', params=[mv_key, gnb_key]),
+                             [combined_network_map],
+                             lambda: plot_combined_network(nodes_dict, lines, gnb_dict, total_length, combined_network_map),
+                             use_cache)
+            
+            # Associate the MV buses and edges with the GNBs within the simulation coverage radius
+            coverage = coverage_radius(os.path.join(os.path.dirname(script_dir), SIMULATION_PARAMETERS_FILE))
+            association_csv_path = os.path.join(generated_dir, 'mv_gnb_association.csv')
+            with stage('associate_gnbs', 'compute'):
+                cached_files('mv_gnb_association', stage_key('mv_gnb_association', params=[mv_key, gnb_key, coverage]),
+                             [association_csv_path],
+                             lambda: save_association_csv(build_association_table(nodes_dict, gnb_dict, coverage),
+                                                          association_csv_path),
+                             use_cache)
+            print(f"MV bus/edge to GNB association ({coverage:.0f} m coverage) saved to: {association_csv_path}")
         
         # Print information
         print("\nBounding box coordinates (latitude, longitude):")
@@ -972,7 +728,9 @@ def main(json_filename=JSON_FILENAME):
         print(f"Height: {dimensions['height']} meters")
         print(f"Total area: {dimensions['area']} km²")
         print(f"\nTotal Euclidean network line length: {total_length:.2f} km")
-        print(f"\nNode information saved to: {mv_csv_path}")
+        print(f"\nNode information saved to: {mv_graph_dir}")
+        if EXPORT_MV_NODES_CSV:
+            print(f"Node information exported to: {mv_csv_path}")
         
     except Exception as e:
         print(f"Error in main function: {e}")
@@ -980,4 +738,16 @@ def main(json_filename=JSON_FILENAME):
         traceback.print_exc()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Process the DAVE MV network and the GNB data.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute every stage instead of reusing the outputs of previous runs')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record time and memory per stage in Generated_Files/profile_2_ProcessNetworkData.json')
+    parser.add_argument('--aoi', default=AOI_GEOJSON,
+                        help='GeoJSON polygon in the DAVE folder the MV network and the GNBs are clipped to')
+    args = parser.parse_args()
+    
+    if args.profile:
+        enable_profiling()
+    main(use_cache=not args.no_cache, aoi_geojson=args.aoi)
+    save_profile('2_ProcessNetworkData', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Generated_Files'))
@@ -1,8 +1,281 @@
 import csv
 import os
 import shutil
+import argparse
+import numpy as np
+from xml.sax.saxutils import escape, quoteattr
+from stage_profiler import stage, enable_profiling, save_profile
+from tower_ingest import spatial_hash_groups
+from backhaul_topology import TOPOLOGIES, build_backhaul, link_latency
+from tower_association import SIMULATION_PARAMETERS_FILE, coverage_radius
 
-def convert_gnb_to_xml():
+# Towers closer than this (in the meters of the normalized coordinates) are
+# merged into one datacenter site; 0 only merges towers at the same position
+GNB_MERGE_RADIUS_M = 10
+
+# Capacity, power and link latency of a tower per type and technology;
+# '*' matches any type or technology
+PROFILES_FILENAME = 'datacenter_profiles.csv'
+PROFILE_FIELDS = ['cores', 'mips', 'ram', 'storage', 'idleConsumption', 'maxConsumption', 'latency']
+
+# Profile of towers without a matching row (and of all towers without a profiles file)
+DATACENTER_PROFILE = {
+    'cores': 1,
+    'mips': 71000,
+    'ram': 8192,
+    'storage': 64000,
+    'idleConsumption': 7,
+    'maxConsumption': 15,
+    'latency': 0.002
+}
+# A merged site adds up the cores, RAM, storage and power of its towers
+SUMMED_CAPACITY = ['cores', 'ram', 'storage', 'idleConsumption', 'maxConsumption']
+
+# Links between the datacenters: 'mst' (minimum spanning tree plus
+# BACKHAUL_REDUNDANCY nearest-neighbor links per site), 'knn'
+# (BACKHAUL_NEIGHBORS nearest neighbors), 'delaunay' or 'chain' (each site
+# to the next one in CSV order, only gnb_0 connected to the cloud)
+BACKHAUL_TOPOLOGY = 'mst'
+BACKHAUL_NEIGHBORS = 3
+BACKHAUL_REDUNDANCY = 1
+# Number of sites with a link to the cloud, spread over the area
+CLOUD_UPLINKS = 3
+CLOUD_LINK_LATENCY_S = 0.05
+
+# Sites farther than edge_datacenters_coverage from every drone path:
+# None (no check), 'report' (listed in gnb_coverage.csv) or 'drop' (also
+# left out of the XML)
+COVERAGE_PRUNING = None
+PRUNING_MODES = ('report', 'drop')
+# Drone paths flown by DroneSimulation (relative to the EdgeSimulator folder);
+# DronePathCreator writes them when a simulation starts, so a simulation has
+# to run on the network of gnb_info.csv before the sites can be pruned
+DRONE_PATH_FILE = os.path.join('PureEdgeSim', 'DroneSim', 'drone_path.csv')
+
+# Sidecar table with the towers of every datacenter site
+SITES_CSV_FILENAME = 'gnb_sites.csv'
+SITE_FIELDS = ['site', 'x_pos', 'y_pos', 'towers', 'tower_ids', 'types', 'technologies',
+               'cores', 'mips', 'ram', 'storage', 'idleConsumption', 'maxConsumption', 'latency']
+
+def parse_position(gnb):
+    """Returns the (x, y) position of a gnb_info.csv row, negative values set to 0"""
+    coords = gnb['normalized_coordinates'].strip('[]').split(', ')
+    return max(0, int(coords[0])), max(0, int(coords[1]))
+
+def read_gnbs(csvfile):
+    """
+    Reads the gnb_info.csv rows into compact columns
+    
+    Returns:
+        Dictionary with the lists id, type and technology and the
+        integer array positions (N, 2)
+    """
+    gnbs = {'id': [], 'type': [], 'technology': []}
+    positions = []
+    for row in csv.DictReader(csvfile):
+        gnbs['id'].append(row['id'])
+        gnbs['type'].append(row.get('type', ''))
+        gnbs['technology'].append(row.get('technology', ''))
+        positions.append(parse_position(row))
+    gnbs['positions'] = np.array(positions, dtype=np.int64).reshape(-1, 2)
+    return gnbs
+
+def cluster_sites(positions, radius):
+    """
+    Groups the towers into sites with a grid hash (see tower_ingest.spatial_hash_groups)
+    
+    Returns:
+        Integer array (N,) with the site of each tower, numbered in order of
+        their first tower
+    """
+    # Positions are integers, so half a meter only merges identical positions
+    return spatial_hash_groups(positions.astype(float), max(radius, 0.5))
+
+def load_profiles(profiles_path):
+    """
+    Reads the datacenter profiles table
+    
+    Returns:
+        Dictionary (type, technology) -> profile with the PROFILE_FIELDS,
+        empty if the file does not exist
+    """
+    profiles = {}
+    try:
+        with open(profiles_path, 'r') as csvfile:
+            for row in csv.DictReader(csvfile):
+                profile = {}
+                for field in PROFILE_FIELDS:
+                    value = row.get(field) or DATACENTER_PROFILE[field]
+                    profile[field] = float(value) if field == 'latency' else int(float(value))
+                profiles[(row['type'].strip().upper(), row['technology'].strip().upper())] = profile
+    except FileNotFoundError:
+        print(f"Warning: {profiles_path} not found, all GNBs get the default profile")
+    return profiles
+
+def tower_profile(profiles, tower_type, technology):
+    """Profile of a tower: the exact row, then the rows with '*' for the technology or type"""
+    tower_type = (tower_type or '').upper()
+    technology = (technology or '').upper()
+    for key in ((tower_type, technology), (tower_type, '*'), ('*', technology), ('*', '*')):
+        if key in profiles:
+            return profiles[key]
+    return DATACENTER_PROFILE
+
+def site_capacity(tower_profiles):
+    """
+    Capacity, power and link latency of a site from the profiles of its towers.
+    MIPS are per core, so the site keeps the total MIPS of its towers with the
+    summed cores; the latency is the one of its fastest tower.
+    """
+    capacity = {key: sum(profile[key] for profile in tower_profiles) for key in SUMMED_CAPACITY}
+    capacity['mips'] = round(sum(profile['mips'] * profile['cores'] for profile in tower_profiles) / capacity['cores'])
+    capacity['latency'] = min(profile['latency'] for profile in tower_profiles)
+    return capacity
+
+def prune_uncovered_sites(gnbs, sites, paths, radius, mode):
+    """
+    Finds the sites that no drone path comes within radius of
+    
+    Args:
+        gnbs: GNB columns, as returned by read_gnbs
+        sites: Site of each GNB, as returned by cluster_sites
+        paths: Drone paths, as returned by coverage_pruning.read_drone_paths
+        radius: Coverage radius of the datacenters in meters
+        mode: 'report' to keep all sites, 'drop' to remove the uncovered ones
+    
+    Returns:
+        Tuple (gnbs, sites, rows of coverage_pruning.COVERAGE_FIELDS)
+    """
+    from coverage_pruning import path_distances
+    
+    # A site is placed at its first tower
+    site_numbers, first = np.unique(sites, return_index=True)
+    distances = path_distances(gnbs['positions'][first], paths)
+    covered = distances <= radius
+    
+    rows = []
+    for i, distance, is_covered in zip(first.tolist(), distances.tolist(), covered.tolist()):
+        x_pos, y_pos = gnbs['positions'][i].tolist()
+        rows.append({
+            'site_tower': gnbs['id'][i],
+            'x_pos': x_pos,
+            'y_pos': y_pos,
+            'path_distance': int(distance) if np.isfinite(distance) else '',
+            'covered': is_covered
+        })
+    
+    if mode == 'drop':
+        keep = covered[np.searchsorted(site_numbers, sites)]
+        gnbs = {key: values[keep] if isinstance(values, np.ndarray) else [v for v, k in zip(values, keep) if k]
+                for key, values in gnbs.items()}
+        sites = sites[keep]
+    
+    return gnbs, sites, rows
+
+def write_datacenter(xmlfile, name, x_pos, y_pos, capacity, tower_ids=()):
+    """Writes one edge datacenter element, with the ids of its towers if it merges several"""
+    xmlfile.write(f'\t<datacenter name={quoteattr(name)}>\n')
+    if len(tower_ids) > 1:
+        xmlfile.write(f'\t\t<!-- towers: {", ".join(escape(str(t)) for t in tower_ids)} -->\n')
+    xmlfile.write('\t\t<periphery>true</periphery>\n'
+                  f'\t\t<idleConsumption>{capacity["idleConsumption"]}</idleConsumption>\n'
+                  f'\t\t<maxConsumption>{capacity["maxConsumption"]}</maxConsumption>\n'
+                  '\t\t<isOrchestrator>false</isOrchestrator>\n'
+                  '\t\t<location>\n'
+                  f'\t\t\t<x_pos>{x_pos}</x_pos>\n'
+                  f'\t\t\t<y_pos>{y_pos}</y_pos>\n'
+                  '\t\t</location>\n'
+                  f'\t\t<cores>{capacity["cores"]}</cores>\n'
+                  f'\t\t<mips>{capacity["mips"]}</mips>\n'
+                  f'\t\t<ram>{capacity["ram"]}</ram>\n'
+                  f'\t\t<storage>{capacity["storage"]}</storage>\n'
+                  '\t</datacenter>\n')
+
+def write_link(xmlfile, source, target, latency):
+    """Writes one network link element"""
+    xmlfile.write('\t\t<link>\n'
+                  f'\t\t\t<from>{escape(source)}</from>\n'
+                  f'\t\t\t<to>{escape(target)}</to>\n'
+                  f'\t\t\t<latency>{latency}</latency>\n'
+                  '\t\t</link>\n')
+
+def write_edge_datacenters(gnbs, sites, xmlfile, sites_writer=None, topology=BACKHAUL_TOPOLOGY, profiles=None):
+    """
+    Writes the edge datacenters XML with one datacenter per site
+    
+    Args:
+        gnbs: GNB columns, as returned by read_gnbs
+        sites: Site of each GNB, as returned by cluster_sites
+        xmlfile: Open text file the XML is written to
+        sites_writer: Optional csv.DictWriter for the rows of SITE_FIELDS
+        topology: Backhaul topology, one of backhaul_topology.TOPOLOGIES
+        profiles: Datacenter profiles, as returned by load_profiles (None: the default profile)
+        
+    Returns:
+        Tuple (number of datacenters, number of backhaul links, number of cloud uplinks)
+    """
+    members = {}
+    for i, site in enumerate(sites.tolist()):
+        members.setdefault(site, []).append(i)
+    
+    xmlfile.write('<?xml version="1.0" ?>\n<edge_datacenters>\n')
+    
+    # Create datacenters with sequential numbering, in order of the first tower of each site
+    site_positions = []
+    site_latencies = []
+    for new_id, indices in enumerate(members.values()):
+        first = indices[0]
+        original_id = gnbs['id'][first]
+        # The site keeps the position of its first tower
+        x_pos, y_pos = gnbs['positions'][first].tolist()
+        site_positions.append((x_pos, y_pos))
+        tower_ids = [gnbs['id'][i] for i in indices]
+        capacity = site_capacity([tower_profile(profiles or {}, gnbs['type'][i], gnbs['technology'][i])
+                                  for i in indices])
+        site_latencies.append(capacity['latency'])
+        
+        write_datacenter(xmlfile, f"gnb_{new_id}", x_pos, y_pos, capacity, tower_ids)
+        if sites_writer is not None:
+            sites_writer.writerow(dict(capacity, site=f"gnb_{new_id}", x_pos=x_pos, y_pos=y_pos,
+                                       towers=len(indices), tower_ids=';'.join(tower_ids),
+                                       types='/'.join(sorted({gnbs['type'][i] for i in indices})),
+                                       technologies='/'.join(sorted({gnbs['technology'][i] for i in indices}))))
+        
+        for i in indices[1:]:
+            print(f"Merging gnb_{gnbs['id'][i]} into site gnb_{new_id} "
+                  f"(coordinates {gnbs['positions'][i][0]},{gnbs['positions'][i][1]})")
+        if original_id != str(new_id):
+            print(f"ID renumbering: gnb_{original_id} -> gnb_{new_id}")
+    
+    included = len(members)
+    
+    # Backhaul links with a latency based on their length and the latency of their sites
+    links, lengths, uplinks = build_backhaul(np.array(site_positions, dtype=float).reshape(-1, 2), topology,
+                                             BACKHAUL_NEIGHBORS, BACKHAUL_REDUNDANCY, CLOUD_UPLINKS)
+    site_latencies = np.array(site_latencies, dtype=float)
+    hop_latencies = (site_latencies[links[:, 0]] + site_latencies[links[:, 1]]) / 2
+    
+    # Add network connections
+    xmlfile.write('\t<network_links>\n')
+    
+    # Connect the uplink sites to the cloud (gnb_0 is always one of them);
+    # without sites there is no datacenter to link
+    if not included:
+        print("Warning: no GNB sites are left, the XML has no datacenters and no network links")
+    for site in uplinks.tolist() if included else []:
+        write_link(xmlfile, 'default_cloud', f"gnb_{site}", CLOUD_LINK_LATENCY_S)
+    
+    # Add connections between neighboring GNBs
+    for (i, j), latency in zip(links.tolist(), link_latency(lengths, hop_latencies).tolist()):
+        write_link(xmlfile, f"gnb_{i}", f"gnb_{j}", round(latency, 6))
+    
+    # Close the XML
+    xmlfile.write('\t</network_links>\n</edge_datacenters>\n')
+    
+    return included, len(links), len(uplinks) if included else 0
+
+def convert_gnb_to_xml(merge_radius=GNB_MERGE_RADIUS_M, topology=BACKHAUL_TOPOLOGY, profiles_file=PROFILES_FILENAME,
+                       pruning=COVERAGE_PRUNING, drone_path_csv=None):
     # Find the directory where the current script is located
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
@@ -17,103 +290,65 @@ def convert_gnb_to_xml():
     # Path to gnb_info.csv
     gnb_csv_path = os.path.join(generated_dir, 'gnb_info.csv')
     
+    xml_output_path = os.path.join(generated_dir, 'edge_datacenters.xml')
+    sites_csv_path = os.path.join(generated_dir, SITES_CSV_FILENAME)
+    
     # Read the gnb_info.csv file
-    gnbs = []
-    try:
-        with open(gnb_csv_path, 'r') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                gnbs.append(row)
-    except FileNotFoundError:
-        print(f"Error: The file {gnb_csv_path} was not found.")
-        return
-    except Exception as e:
-        print(f"Error reading GNB CSV file: {e}")
-        return
-    
-    # Create XML
-    xml_content = '<?xml version="1.0" ?>\n<edge_datacenters>\n'
-    
-    # Track coordinates that have already been used
-    used_coordinates = set()
-    
-    # List to store GNBs to include
-    included_gnbs = []
-    
-    # Add each GNB as a datacenter if it has unique coordinates
-    for gnb in gnbs:
-        # Extract coordinates and check for negative values
-        coords = gnb['normalized_coordinates'].strip('[]').split(', ')
-        x_pos = max(0, int(coords[0]))  # If negative, set to 0
-        y_pos = max(0, int(coords[1]))
-        
-        # Check if these coordinates have already been used
-        coord_key = f"{x_pos}_{y_pos}"
-        if coord_key in used_coordinates:
-            print(f"Skipping gnb_{gnb['id']} (coordinates {x_pos},{y_pos} already in use)")
-            continue
-        
-        # Add coordinates to the set of used coordinates
-        used_coordinates.add(coord_key)
-        
-        # Add GNB to the list of included GNBs
-        included_gnbs.append(gnb)
+    with stage('load_gnb_csv', 'load'):
+        try:
+            with open(gnb_csv_path, 'r') as csvfile:
+                gnbs = read_gnbs(csvfile)
+        except FileNotFoundError:
+            print(f"Error: The file {gnb_csv_path} was not found.")
+            return
+        except Exception as e:
+            print(f"Error reading GNB CSV file: {e}")
+            return
     
-    # Create datacenters with sequential numbering
-    for new_id, gnb in enumerate(included_gnbs):
-        original_id = gnb['id']
-        
-        # Extract coordinates and check for negative values
-        coords = gnb['normalized_coordinates'].strip('[]').split(', ')
-        x_pos = max(0, int(coords[0]))  # If negative, set to 0
-        y_pos = max(0, int(coords[1]))
-        
-        # Create datacenter in XML
-        xml_content += f'\t<datacenter name="gnb_{new_id}">\n'
-        xml_content += '\t\t<periphery>true</periphery>\n'
-        xml_content += '\t\t<idleConsumption>7</idleConsumption>\n'
-        xml_content += '\t\t<maxConsumption>15</maxConsumption>\n'
-        xml_content += '\t\t<isOrchestrator>false</isOrchestrator>\n'
-        xml_content += '\t\t<location>\n'
-        xml_content += f'\t\t\t<x_pos>{x_pos}</x_pos>\n'
-        xml_content += f'\t\t\t<y_pos>{y_pos}</y_pos>\n'
-        xml_content += '\t\t</location>\n'
-        xml_content += '\t\t<cores>1</cores>\n'
-        xml_content += '\t\t<mips>71000</mips>\n'
-        xml_content += '\t\t<ram>8192</ram>\n'
-        xml_content += '\t\t<storage>64000</storage>\n'
-        xml_content += '\t</datacenter>\n'
-        
-        if original_id != str(new_id):
-            print(f"ID renumbering: gnb_{original_id} -> gnb_{new_id}")
+    total = len(gnbs['id'])
     
-    # Add network connections
-    xml_content += '\t<network_links>\n'
-    
-    # Connect node 0 to the cloud (node 0 will always exist with the new numbering)
-    xml_content += '\t\t<link>\n'
-    xml_content += '\t\t\t<from>default_cloud</from>\n'
-    xml_content += '\t\t\t<to>gnb_0</to>\n'
-    xml_content += '\t\t\t<latency>0.05</latency>\n'
-    xml_content += '\t\t</link>\n'
-    
-    # Add connections between neighboring GNBs (optional)
-    # Connect each GNB to the next one in the list
-    if len(included_gnbs) > 1:
-        for i in range(len(included_gnbs) - 1):
-            xml_content += '\t\t<link>\n'
-            xml_content += f'\t\t\t<from>gnb_{i}</from>\n'
-            xml_content += f'\t\t\t<to>gnb_{i+1}</to>\n'
-            xml_content += '\t\t\t<latency>0.002</latency>\n'
-            xml_content += '\t\t</link>\n'
+    # Capacity profiles per tower type and technology
+    profiles = load_profiles(os.path.join(script_dir, profiles_file))
     
-    # Close the XML
-    xml_content += '\t</network_links>\n</edge_datacenters>\n'
+    # Merge towers within merge_radius of each other into one site
+    with stage('cluster_gnbs', 'filter'):
+        sites = cluster_sites(gnbs['positions'], merge_radius)
     
-    # Save XML to Generated_Files
-    xml_output_path = os.path.join(generated_dir, 'edge_datacenters.xml')
-    with open(xml_output_path, 'w') as xmlfile:
-        xmlfile.write(xml_content)
+    # Check the sites against the drone paths and the coverage of the simulation
+    if pruning:
+        from coverage_pruning import COVERAGE_CSV_FILENAME, read_drone_paths, save_coverage_csv
+        if drone_path_csv is None:
+            drone_path_csv = os.path.join(os.path.dirname(script_dir), DRONE_PATH_FILE)
+        coverage = coverage_radius(os.path.join(os.path.dirname(script_dir), SIMULATION_PARAMETERS_FILE))
+        with stage('prune_uncovered_sites', 'filter'):
+            paths = None
+            if not os.path.exists(drone_path_csv):
+                print(f"Warning: {drone_path_csv} not found, no sites are pruned")
+            elif os.path.getmtime(drone_path_csv) < os.path.getmtime(gnb_csv_path):
+                # Paths written before the network may belong to another network
+                print(f"Warning: {drone_path_csv} is older than {gnb_csv_path}, no sites are pruned; "
+                      f"run the simulation on the new network first so that it writes the drone paths")
+            else:
+                paths = read_drone_paths(drone_path_csv)
+            if paths is not None:
+                gnbs, sites, coverage_rows = prune_uncovered_sites(gnbs, sites, paths, coverage, pruning)
+                coverage_csv_path = os.path.join(generated_dir, COVERAGE_CSV_FILENAME)
+                save_coverage_csv(coverage_rows, coverage_csv_path)
+                uncovered = sum(not row['covered'] for row in coverage_rows)
+                print(f"{uncovered} of {len(coverage_rows)} sites are farther than {coverage:.0f} m from every drone path"
+                      f" ({'left out of the XML' if pruning == 'drop' else 'kept'}), see {coverage_csv_path}")
+    
+    # Every datacenter is written to the file as soon as it is created, so
+    # the XML is never held in memory
+    with stage('export_xml', 'export'):
+        with open(xml_output_path + '.tmp', 'w') as xmlfile, open(sites_csv_path, 'w', newline='') as sitesfile:
+            sites_writer = csv.DictWriter(sitesfile, fieldnames=SITE_FIELDS)
+            sites_writer.writeheader()
+            included, link_count, uplink_count = write_edge_datacenters(gnbs, sites, xmlfile, sites_writer,
+                                                                       topology, profiles)
+        
+        # Replace the previous XML only once the new one is complete
+        os.replace(xml_output_path + '.tmp', xml_output_path)
     
     print(f"XML file created: {xml_output_path}")
     
@@ -128,7 +363,29 @@ def convert_gnb_to_xml():
     else:
         print(f"Warning: Directory {drone_settings_dir} not found, couldn't save XML there")
     
-    print(f"Included {len(included_gnbs)} GNBs out of {len(gnbs)} total")
+    print(f"Site table saved to: {sites_csv_path}")
+    print(f"Backhaul ({topology}): {link_count} links between sites, {uplink_count} cloud uplinks")
+    print(f"Included {included} GNB sites out of {total} total GNBs (merge radius {merge_radius} m)")
 
 if __name__ == "__main__":
-    convert_gnb_to_xml() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Convert gnb_info.csv to the edge datacenters XML.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record time and memory per stage in Generated_Files/profile_3_gnb_to_xml.json')
+    parser.add_argument('--merge-radius', type=float, default=GNB_MERGE_RADIUS_M,
+                        help='Towers closer than this (meters) are merged into one datacenter site')
+    parser.add_argument('--topology', choices=TOPOLOGIES, default=BACKHAUL_TOPOLOGY,
+                        help='Topology of the backhaul links between the datacenters')
+    parser.add_argument('--profiles', default=PROFILES_FILENAME,
+                        help='CSV in the DAVE folder with the capacity of the datacenters per tower type and technology')
+    parser.add_argument('--prune-coverage', choices=PRUNING_MODES, default=COVERAGE_PRUNING,
+                        help='Report (or drop) the sites that no drone path in drone_path.csv comes within '
+                             'edge_datacenters_coverage of')
+    parser.add_argument('--drone-paths', default=None,
+                        help='drone_path.csv to prune with (default: PureEdgeSim/DroneSim/drone_path.csv, '
+                             'the paths of the last simulation; scenarios keep theirs in their settings folder)')
+    args = parser.parse_args()
+    
+    if args.profile:
+        enable_profiling()
+    convert_gnb_to_xml(args.merge_radius, args.topology, args.profiles, args.prune_coverage, args.drone_paths)
+    save_profile('3_gnb_to_xml', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Generated_Files')) 
\ No newline at end of file
@@ -4,6 +4,9 @@ import argparse
 import json
 import os
 from collections import deque
+from mv_graph_store import load_mv_networkx
+from worst_path import worst_path_to_leaves
+from stage_profiler import stage, enable_profiling, save_profile
 
 # Initial node definition
 START_NODE = '21'  
@@ -53,45 +56,14 @@ def load_graph_from_csv(csv_file):
     
     return G, node_coords
 
-def find_leaf_nodes(G):
-    """Find all leaf nodes in the graph (nodes with only one connection)."""
-    leaf_nodes = []
-    for node in G.nodes():
-        if G.degree(node) == 1:
-            leaf_nodes.append(node)
-    return leaf_nodes
-
-def find_all_paths_to_leaves(G, start_node):
-    """Find all paths from the starting node to leaf nodes."""
-    leaf_nodes = find_leaf_nodes(G)
-    all_paths = []
-    all_path_weights = []
-    
-    for leaf in leaf_nodes:
-        try:
-            # Use networkx's all_simple_paths function to find all simple paths
-            paths = list(nx.all_simple_paths(G, start_node, leaf))
-            
-            for path in paths:
-                # Calculate total weight of the path
-                total_weight = 0
-                for i in range(len(path) - 1):
-                    total_weight += G[path[i]][path[i+1]]['weight']
-                
-                all_paths.append(path)
-                all_path_weights.append(total_weight)
-        except nx.NetworkXNoPath:
-            continue
-    
-    return all_paths, all_path_weights
-
-def find_worst_path(paths, path_weights):
-    """Find the worst path (with the largest total weight)."""
-    if not paths:
-        return None
-    
-    max_weight_idx = path_weights.index(max(path_weights))
-    return paths[max_weight_idx], path_weights[max_weight_idx]
+def load_graph(input_path):
+    """
+    Loads the graph from the MV graph directory written by 2_ProcessNetworkData.py,
+    or from an exported mv_nodes_info.csv file.
+    """
+    if os.path.isdir(input_path):
+        return load_mv_networkx(input_path)
+    return load_graph_from_csv(input_path)
 
 def create_smart_path(G, start_node, worst_path=None):
     """
@@ -228,13 +200,18 @@ def save_path_to_csv(path, node_coords, output_file, drone_ids):
 def main():
     """Main function."""
     parser = argparse.ArgumentParser(description='Create a smart path avoiding worst path to leaf nodes.')
-    parser.add_argument('--input', default='Generated_Files/mv_nodes_info.csv', help='Input CSV file')
+    parser.add_argument('--input', default='Generated_Files/mv_graph', help='Input MV graph directory or CSV file')
     parser.add_argument('--output-csv', default='Generated_Files/drone_path.csv', help='Output CSV file')
     parser.add_argument('--start-node', default=START_NODE, help='Starting node')
     parser.add_argument('--num-drones', type=int, default=NUM_DRONES, help='Number of drones to use')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record time and memory per stage in Generated_Files/profile_4_create_drone_path_custom.json')
     
     args = parser.parse_args()
     
+    if args.profile:
+        enable_profiling()
+    
     # Handle relative file paths
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
@@ -245,10 +222,17 @@ def main():
     
     output_csv = os.path.join(script_dir, args.output_csv)
     
+    # Fall back to the CSV export if the MV graph arrays have not been generated yet
+    if not os.path.exists(input_file):
+        csv_file = os.path.join(os.path.dirname(input_file), 'mv_nodes_info.csv')
+        if os.path.exists(csv_file):
+            input_file = csv_file
+    
     print(f"Loading data from {input_file}")
     
-    # Load graph from CSV
-    G, node_coords = load_graph_from_csv(input_file)
+    # Load graph from the MV graph arrays (or CSV)
+    with stage('load_graph', 'load'):
+        G, node_coords = load_graph(input_file)
     
     # Check if start_node exists in the graph
     if args.start_node not in G.nodes():
@@ -258,26 +242,28 @@ def main():
     else:
         start_node = args.start_node
     
-    # Find all paths to leaf nodes
-    print(f"Finding all paths from {start_node} to leaf nodes...")
-    paths, path_weights = find_all_paths_to_leaves(G, start_node)
+    # Find the heaviest path to a leaf node
+    print(f"Finding the worst path from {start_node} to the leaf nodes...")
+    with stage('find_worst_path', 'compute'):
+        result = worst_path_to_leaves(G, start_node)
     
-    if not paths:
+    if result is None:
         print("No paths to leaf nodes found.")
         worst_path = None
         worst_path_weight = 0
     else:
-        # Find the worst path
-        worst_path, worst_path_weight = find_worst_path(paths, path_weights)
+        worst_path, worst_path_weight = result
         print(f"\nWorst path (weight {worst_path_weight}):")
         print(" -> ".join(worst_path))
     
     # Create smart path avoiding the worst path
     print(f"\nCreating smart path starting from {start_node}, avoiding worst path when possible...")
-    smart_path, total_distance = create_smart_path(G, start_node, worst_path)
+    with stage('create_smart_path', 'compute'):
+        smart_path, total_distance = create_smart_path(G, start_node, worst_path)
     
     # Find split points for drones
-    drone_ids = find_split_points(G, smart_path, total_distance, args.num_drones)
+    with stage('find_split_points', 'compute'):
+        drone_ids = find_split_points(G, smart_path, total_distance, args.num_drones)
     
     # Calculate distance per drone
     drone_distances = [0] * args.num_drones
@@ -310,8 +296,11 @@ def main():
     print(f"\nTotal path distance: {total_distance} meters")
     
     # Save to CSV
-    save_path_to_csv(smart_path, node_coords, output_csv, drone_ids)
+    with stage('save_path_csv', 'export'):
+        save_path_to_csv(smart_path, node_coords, output_csv, drone_ids)
     print(f"Path saved to CSV in {output_csv}")
+    
+    save_profile('4_create_drone_path_custom', os.path.join(script_dir, 'Generated_Files'))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -3,12 +3,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 from collections import defaultdict
 import os
-import pyproj
-
-# Load data
-def load_data(file_path):
-    with open(file_path, 'r') as file:
-        return json.load(file)
+import projection
+from network_loader import load_tower_table
 
 # Colors for technology (4G/5G)
 def get_tech_color(tech):
@@ -24,31 +20,9 @@ def get_tower_marker(tower_type):
     }
     return markers.get(tower_type, "*")  # Default: star
 
-# Calculate distance between two points in meters
+# Calculate the dimensions of the area in meters
 def calculate_area_dimensions(lats, lons):
-    transformer = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:3035", always_xy=True)
-    
-    min_lat, max_lat = min(lats), max(lats)
-    min_lon, max_lon = min(lons), max(lons)
-    
-    # Convert coordinates to real meters
-    x1, y1 = transformer.transform(min_lon, min_lat)
-    x2, y2 = transformer.transform(max_lon, max_lat)
-    
-    # Calculate dimensions
-    width = abs(x2 - x1)
-    height = abs(y2 - y1)
-    area = width * height / 1000000  # in square kilometers
-    
-    return {
-        'min_lat': min_lat,
-        'max_lat': max_lat,
-        'min_lon': min_lon,
-        'max_lon': max_lon,
-        'width': int(width),
-        'height': int(height),
-        'area': round(area, 2)
-    }
+    return projection.calculate_area_dimensions(np.column_stack((lons, lats)))
 
 def main():
     # Get script directory
@@ -63,8 +37,8 @@ def main():
     lte_path = os.path.join(script_dir, 'output', 'B8_vd_4g.json')
     nr_path = os.path.join(script_dir, 'output', 'B8_vd_5g.json')
     
-    lte_data = load_data(lte_path)
-    nr_data = load_data(nr_path)
+    # Tower table, parsed once and cached by the shared loader
+    towers = load_tower_table([(lte_path, '4G', 'B8_vd'), (nr_path, '5G', 'B8_vd')])
     
     # Create plot
     plt.figure(figsize=(15, 12))
@@ -76,31 +50,13 @@ def main():
     # Dict to store scatter objects for the ordered legend
     tech_tower_scatters = {}
     
-    # Process 4G/LTE data
-    for tower in lte_data['responseData']:
-        lat = tower['latitude']
-        lon = tower['longitude']
-        all_lats.append(lat)
-        all_lons.append(lon)
-        
-        tower_type = tower['towerAttributes'].get('TOWER_TYPE', 'UNKNOWN')
-        key = (tower_type, '4G')
-        
-        if key not in tech_tower_scatters:
-            tech_tower_scatters[key] = {'lats': [], 'lons': []}
-        
-        tech_tower_scatters[key]['lats'].append(lat)
-        tech_tower_scatters[key]['lons'].append(lon)
-    
-    # Process 5G/NR data
-    for tower in nr_data['responseData']:
-        lat = tower['latitude']
-        lon = tower['longitude']
+    # Group the towers by tower type and technology
+    for lon, lat, tower_type, tech in zip(towers['lon'].tolist(), towers['lat'].tolist(),
+                                          towers['type'], towers['technology']):
         all_lats.append(lat)
         all_lons.append(lon)
         
-        tower_type = tower['towerAttributes'].get('TOWER_TYPE', 'UNKNOWN')
-        key = (tower_type, '5G')
+        key = (tower_type, tech)
         
         if key not in tech_tower_scatters:
             tech_tower_scatters[key] = {'lats': [], 'lons': []}
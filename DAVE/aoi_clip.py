@@ -0,0 +1,118 @@
+import json
+import numpy as np
+import shapely
+from shapely.geometry import shape, mapping
+from shapely.ops import unary_union
+from shapely.strtree import STRtree
+from projection import lonlat_array
+
+def load_aoi(geojson_path):
+    """Loads the area of interest of a GeoJSON file as one (multi)polygon"""
+    with open(geojson_path, 'r') as file:
+        geojson = json.load(file)
+
+    features = geojson.get('features', [geojson] if geojson.get('type') == 'Feature' else [])
+    if not features and 'coordinates' in geojson:
+        return shape(geojson)
+    return unary_union([shape(feature['geometry']) for feature in features])
+
+def clip_points(coordinates, aoi):
+    """
+    Returns a boolean mask of the points inside the area of interest
+
+    Args:
+        coordinates: Array-like (N, 2) with [longitude, latitude]
+        aoi: Area of interest polygon
+    """
+    coordinates = lonlat_array(coordinates)
+    mask = np.zeros(len(coordinates), dtype=bool)
+    if len(coordinates) == 0:
+        return mask
+
+    # Bulk-loaded index over the points, queried once with the area
+    tree = STRtree(shapely.points(coordinates))
+    mask[tree.query(aoi, predicate='intersects')] = True
+    return mask
+
+def _next_bus_number(node_names):
+    numbers = [int(name.rsplit('_', 1)[-1]) for name in node_names if name.rsplit('_', 1)[-1].isdigit()]
+    return max(numbers, default=-1) + 1
+
+def clip_mv_network(nodes_data, lines_data, aoi):
+    """
+    Clips the MV network of a DAVE dataset to an area of interest.
+    Buses outside the area are removed. Lines between two removed buses
+    are removed, lines between two kept buses are kept whole, and lines
+    that leave the area from a kept bus are cut at the boundary, where a
+    new boundary bus is added.
+
+    Args:
+        nodes_data: GeoJSON with the MV nodes
+        lines_data: GeoJSON with the MV lines
+        aoi: Area of interest polygon
+
+    Returns:
+        Tuple (nodes GeoJSON, lines GeoJSON) of the clipped network
+    """
+    node_features = nodes_data.get('features', [])
+    coordinates = [feature.get('geometry', {}).get('coordinates', [0, 0])[:2] for feature in node_features]
+    inside = clip_points(coordinates, aoi)
+
+    kept_nodes = [feature for feature, keep in zip(node_features, inside.tolist()) if keep]
+    kept_buses = {feature.get('properties', {}).get('dave_name', ''): feature for feature in kept_nodes}
+    next_number = _next_bus_number([feature.get('properties', {}).get('dave_name', '') for feature in node_features])
+
+    # Only lines that intersect the area can be kept
+    line_features = [feature for feature in lines_data.get('features', []) if feature.get('geometry')]
+    line_geometries = [shape(feature['geometry']) for feature in line_features]
+    candidates = sorted(STRtree(line_geometries).query(aoi, predicate='intersects').tolist()) if line_geometries else []
+
+    kept_lines = []
+    boundary_nodes = []
+    for index in candidates:
+        feature = line_features[index]
+        properties = feature.get('properties', {})
+        from_bus = properties.get('from_bus', '')
+        to_bus = properties.get('to_bus', '')
+
+        if from_bus in kept_buses and to_bus in kept_buses:
+            kept_lines.append(feature)
+            continue
+        if from_bus not in kept_buses and to_bus not in kept_buses:
+            continue
+
+        # Cut the line at the boundary and keep the piece that starts at the kept bus
+        inner_bus, outer_bus = (from_bus, to_bus) if from_bus in kept_buses else (to_bus, from_bus)
+        inner_point = shape(kept_buses[inner_bus]['geometry'])
+        line = line_geometries[index]
+        pieces = [piece for piece in getattr(line.intersection(aoi), 'geoms', [line.intersection(aoi)])
+                  if piece.geom_type == 'LineString' and not piece.is_empty]
+        if not pieces:
+            continue
+        piece = min(pieces, key=lambda candidate: candidate.distance(inner_point))
+
+        # Orient the piece from the kept bus to the boundary
+        piece_coordinates = list(piece.coords)
+        if shapely.Point(piece_coordinates[-1]).distance(inner_point) < shapely.Point(piece_coordinates[0]).distance(inner_point):
+            piece_coordinates.reverse()
+
+        boundary_bus = f"{outer_bus.rsplit('_', 1)[0] if '_' in outer_bus else 'node'}_{next_number}"
+        next_number += 1
+        boundary_nodes.append({
+            'type': 'Feature',
+            'properties': dict(kept_buses[inner_bus].get('properties', {}), dave_name=boundary_bus, aoi_boundary=True),
+            'geometry': {'type': 'Point', 'coordinates': list(piece_coordinates[-1])}
+        })
+
+        # The DAVE length is scaled by the part of the line that is kept
+        length_ratio = piece.length / line.length if line.length > 0 else 1
+        clipped_properties = dict(properties, from_bus=inner_bus, to_bus=boundary_bus,
+                                  length_km=properties.get('length_km', 0) * length_ratio)
+        kept_lines.append(dict(feature, properties=clipped_properties,
+                               geometry=mapping(shapely.LineString(piece_coordinates))))
+
+    print(f"Area of interest: kept {len(kept_nodes)} of {len(node_features)} MV nodes "
+          f"(+{len(boundary_nodes)} boundary nodes) and {len(kept_lines)} of {len(line_features)} MV lines")
+
+    return (dict(nodes_data, features=kept_nodes + boundary_nodes),
+            dict(lines_data, features=kept_lines))
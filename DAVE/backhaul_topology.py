@@ -0,0 +1,139 @@
+import numpy as np
+from scipy.spatial import cKDTree, Delaunay, QhullError
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree, connected_components
+
+# Topologies of the links between the edge datacenters
+TOPOLOGIES = ('mst', 'knn', 'delaunay', 'chain')
+
+# Latency of a backhaul link: a fixed switching delay per hop plus the
+# propagation delay along the fiber route
+HOP_LATENCY_S = 0.002
+FIBER_LATENCY_S_PER_M = 5e-9    # about 2/3 of the speed of light
+FIBER_ROUTE_FACTOR = 1.5        # fiber routes are longer than the straight line
+
+def link_latency(distance, hop_latency=HOP_LATENCY_S):
+    """Latency in seconds of a backhaul link of the given length in meters"""
+    return hop_latency + np.asarray(distance, dtype=float) * FIBER_ROUTE_FACTOR * FIBER_LATENCY_S_PER_M
+
+def _unique_pairs(pairs):
+    """Undirected pairs (i < j) without duplicates and self loops"""
+    pairs = np.sort(np.asarray(pairs, dtype=np.int64).reshape(-1, 2), axis=1)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.unique(pairs, axis=0)
+
+def chain_links(count):
+    """Links every datacenter to the next one"""
+    return np.column_stack((np.arange(count - 1), np.arange(1, count))) if count > 1 else np.empty((0, 2), np.int64)
+
+def knn_links(points, k):
+    """Links every datacenter to its k nearest neighbors"""
+    k = min(k, len(points) - 1)
+    if k < 1:
+        return np.empty((0, 2), np.int64)
+    _, neighbors = cKDTree(points).query(points, k=k + 1)
+    # The first neighbor is the point itself
+    return _unique_pairs(np.column_stack((np.repeat(np.arange(len(points)), k), neighbors[:, 1:].reshape(-1))))
+
+def delaunay_links(points):
+    """Links of the Delaunay triangulation; k nearest neighbors for degenerate layouts (e.g. collinear)"""
+    if len(points) < 3:
+        return chain_links(len(points))
+    try:
+        triangles = Delaunay(points).simplices
+    except QhullError:
+        return knn_links(points, 8)
+    return _unique_pairs(np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [0, 2]]]))
+
+def mst_links(points, redundancy=1):
+    """
+    Euclidean minimum spanning tree (a subgraph of the Delaunay triangulation),
+    with extra Delaunay links for the sites with fewer than 1 + redundancy
+    links, so that no site depends on a single link
+    """
+    candidates = delaunay_links(points)
+    if len(candidates) == 0:
+        return candidates
+
+    lengths = np.hypot(*(points[candidates[:, 0]] - points[candidates[:, 1]]).T)
+    # Zero weights are missing edges for scipy, so every length gets a small offset
+    graph = coo_matrix((lengths + 1e-9, (candidates[:, 0], candidates[:, 1])), shape=(len(points),) * 2)
+    tree = minimum_spanning_tree(graph).tocoo()
+    links = _unique_pairs(np.column_stack((tree.row, tree.col)))
+
+    if redundancy > 0:
+        degree = np.bincount(links.reshape(-1), minlength=len(points))
+        linked = set(map(tuple, links.tolist()))
+        extra = []
+        # Shortest candidates first, each one used if one of its sites still lacks links
+        for k in np.argsort(lengths, kind='stable').tolist():
+            i, j = candidates[k].tolist()
+            if (i, j) in linked or (degree[i] > redundancy and degree[j] > redundancy):
+                continue
+            extra.append((i, j))
+            linked.add((i, j))
+            degree[i] += 1
+            degree[j] += 1
+        if extra:
+            links = _unique_pairs(np.concatenate([links, extra]))
+    return links
+
+def cloud_uplinks(points, count, links):
+    """
+    Chooses the datacenters connected to the cloud: the first one and the
+    ones farthest from the uplinks chosen so far, and at least one in every
+    part of the backhaul that is not connected to the others
+
+    Returns:
+        Sorted array with the indices of the uplink datacenters
+    """
+    if len(points) == 0:
+        return np.empty(0, np.int64)
+
+    uplinks = [0]
+    distances = np.hypot(*(points - points[0]).T)
+    while len(uplinks) < min(count, len(points)):
+        farthest = int(np.argmax(distances))
+        uplinks.append(farthest)
+        distances = np.minimum(distances, np.hypot(*(points - points[farthest]).T))
+
+    graph = coo_matrix((np.ones(len(links)), (links[:, 0], links[:, 1])), shape=(len(points),) * 2)
+    _, components = connected_components(graph, directed=False)
+    connected = set(components[uplinks].tolist())
+    for component in range(components.max() + 1):
+        if component not in connected:
+            uplinks.append(int(np.flatnonzero(components == component)[0]))
+
+    return np.unique(uplinks)
+
+def build_backhaul(points, topology='mst', neighbors=3, redundancy=1, uplinks=3):
+    """
+    Builds the backhaul links between the edge datacenters and their cloud uplinks
+
+    Args:
+        points: Array (N, 2) with the datacenter positions in meters
+        topology: One of TOPOLOGIES
+        neighbors: Number of neighbors of every datacenter for 'knn'
+        redundancy: Minimum number of links of every datacenter beyond the first for 'mst'
+        uplinks: Number of datacenters connected to the cloud ('chain' only uses the first)
+
+    Returns:
+        Tuple (links (L, 2), link lengths in meters (L,), uplink indices)
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+
+    if topology == 'mst':
+        links = mst_links(points, redundancy)
+    elif topology == 'knn':
+        links = knn_links(points, neighbors)
+    elif topology == 'delaunay':
+        links = delaunay_links(points)
+    elif topology == 'chain':
+        links = chain_links(len(points))
+        uplinks = 1
+    else:
+        raise ValueError(f"Unknown backhaul topology: {topology}")
+
+    links = np.asarray(links, dtype=np.int64).reshape(-1, 2)
+    lengths = np.hypot(*(points[links[:, 0]] - points[links[:, 1]]).T)
+    return links, lengths, cloud_uplinks(points, uplinks, links)
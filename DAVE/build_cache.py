@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+# Local cache folder of the DAVE scripts
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+# Digests of files already hashed in this process: (path, size, mtime) -> digest
+_file_digests = {}
+
+def file_digest(path):
+    """
+    Returns the SHA-256 digest of the content of a file.
+    Missing files have a fixed digest, so that creating them changes the key.
+    """
+    if not os.path.exists(path):
+        return 'missing'
+
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_digests:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        _file_digests[memo_key] = digest.hexdigest()
+
+    return _file_digests[memo_key]
+
+def stage_key(stage, files=(), params=None):
+    """
+    Calculates the cache key of a stage from the content of its input
+    files (including the code that implements it) and its parameters
+
+    Args:
+        stage: Name of the stage
+        files: Input files of the stage
+        params: JSON-serializable parameters, e.g. upstream stage keys
+
+    Returns:
+        Hexadecimal key
+    """
+    digest = hashlib.sha256(stage.encode())
+    for path in files:
+        digest.update(file_digest(path).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def _entry_dir(stage, key, cache_dir):
+    return os.path.join(cache_dir, stage, key[:32])
+
+def cached_value(stage, key, build, enabled=True, cache_dir=CACHE_DIR):
+    """
+    Returns the result of build() for the key, reusing the pickled result
+    of a previous run when one exists. A None result is not cached.
+
+    Args:
+        stage: Name of the stage
+        key: Key returned by stage_key
+        build: Function without arguments that computes the value
+        enabled: False to always run build() and bypass the cache
+        cache_dir: Root folder of the cache
+    """
+    if not enabled:
+        return build()
+
+    value_path = os.path.join(_entry_dir(stage, key, cache_dir), 'value.pickle')
+    if os.path.exists(value_path):
+        print(f"Reusing cached {stage}")
+        with open(value_path, 'rb') as file:
+            return pickle.load(file)
+
+    value = build()
+    if value is None:
+        return value
+
+    os.makedirs(os.path.dirname(value_path), exist_ok=True)
+    temp_path = value_path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, value_path)
+
+    return value
+
+def cached_files(stage, key, outputs, build, enabled=True, cache_dir=CACHE_DIR):
+    """
+    Produces the output files of a stage, copying them from the cache when
+    a previous run had the same key, otherwise running build() and storing
+    the files it wrote in the cache. The outputs are removed before build(),
+    so a failed build leaves them missing instead of stale, and the entry
+    is only stored when build() wrote every output.
+
+    Args:
+        stage: Name of the stage
+        key: Key returned by stage_key
+        outputs: Paths of the files written by build()
+        build: Function without arguments that writes the outputs
+        enabled: False to always run build() and bypass the cache
+        cache_dir: Root folder of the cache
+
+    Returns:
+        True if the outputs were reused from the cache
+    """
+    entry_dir = _entry_dir(stage, key, cache_dir)
+    cached = [os.path.join(entry_dir, str(i)) for i in range(len(outputs))]
+
+    if enabled and os.path.exists(os.path.join(entry_dir, 'complete')):
+        print(f"Reusing cached {stage}")
+        for cached_path, output_path in zip(cached, outputs):
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            shutil.copy2(cached_path, output_path)
+        return True
+
+    # Outputs of an earlier run are removed first: builders that catch their
+    # own errors would otherwise leave them in place as this key's result
+    for output_path in outputs:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    build()
+
+    missing = [output_path for output_path in outputs if not os.path.exists(output_path)]
+    if missing:
+        print(f"Warning: {stage} did not write {', '.join(missing)}, the outputs are not cached")
+        return False
+    if not enabled:
+        return False
+
+    os.makedirs(entry_dir, exist_ok=True)
+    for cached_path, output_path in zip(cached, outputs):
+        shutil.copy2(output_path, cached_path)
+    with open(os.path.join(entry_dir, 'complete'), 'w') as file:
+        file.write('\n'.join(outputs))
+
+    return False
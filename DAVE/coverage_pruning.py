@@ -0,0 +1,53 @@
+import csv
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+# Datacenter report of the pruning pass, in Generated_Files
+COVERAGE_CSV_FILENAME = 'gnb_coverage.csv'
+COVERAGE_FIELDS = ['site_tower', 'x_pos', 'y_pos', 'path_distance', 'covered']
+
+def read_drone_paths(csv_path):
+    """
+    Reads the paths of drone_path.csv (NodeID, X, Y, drone_id)
+
+    Returns:
+        List of arrays (P, 2) with the waypoints of each drone, in file order
+    """
+    paths = {}
+    with open(csv_path, 'r') as csvfile:
+        for row in csv.DictReader(csvfile):
+            paths.setdefault(row.get('drone_id', '0'), []).append((float(row['X']), float(row['Y'])))
+    return [np.array(points, dtype=float) for points in paths.values()]
+
+def path_distances(points, paths):
+    """
+    Minimum distance of every point to the drone paths
+
+    Args:
+        points: Array (N, 2) with positions in the coordinates of the paths
+        paths: List of waypoint arrays, as returned by read_drone_paths
+
+    Returns:
+        Array (N,) with the distances, inf if there are no paths
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    # Paths with a single waypoint are points
+    geometries = [shapely.linestrings(path) if len(path) > 1 else shapely.points(path[0])
+                  for path in paths if len(path)]
+    if not geometries or len(points) == 0:
+        return np.full(len(points), np.inf)
+
+    # One index over all paths, one nearest-path query for all points
+    tree = STRtree(geometries)
+    (point_index, _), distances = tree.query_nearest(shapely.points(points), return_distance=True, all_matches=False)
+    result = np.full(len(points), np.inf)
+    result[point_index] = distances
+    return result
+
+def save_coverage_csv(rows, output_path):
+    """Saves the path distance and coverage of every datacenter site"""
+    with open(output_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=COVERAGE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
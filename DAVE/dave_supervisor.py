@@ -0,0 +1,135 @@
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from build_cache import file_digest
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Limits of one DAVE worker process (None: no limit)
+DAVE_MEMORY_LIMIT_MB = 8192
+DAVE_TIME_LIMIT_S = 3600
+# Further attempts after a failed worker; completed stages are not repeated
+DAVE_RETRIES = 1
+
+# Progress of the worker in the output folder
+CHECKPOINT_FILENAME = 'dave_checkpoint.json'
+
+def read_checkpoint(output_folder, area_key):
+    """Returns the checkpoint of the output folder, a new one if it belongs to another area"""
+    checkpoint_path = os.path.join(output_folder, CHECKPOINT_FILENAME)
+    try:
+        with open(checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('area_key') == area_key:
+            return checkpoint
+    except (OSError, ValueError):
+        pass
+    return {'area_key': area_key, 'completed': [], 'attempts': []}
+
+def write_checkpoint(output_folder, checkpoint):
+    checkpoint_path = os.path.join(output_folder, CHECKPOINT_FILENAME)
+    temp_path = checkpoint_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temp_path, checkpoint_path)
+
+def _limit_resources(memory_mb, time_s):
+    """Returns the function that applies the limits in the worker process before it starts"""
+    def apply_limits():
+        if memory_mb:
+            limit = int(memory_mb) << 20
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        if time_s:
+            # CPU time limit; the wall time is limited by the supervisor
+            resource.setrlimit(resource.RLIMIT_CPU, (int(time_s), int(time_s) + 5))
+    return apply_limits if resource is not None else None
+
+def run_supervised(geojson_path, output_folder, memory_mb=DAVE_MEMORY_LIMIT_MB,
+                   time_s=DAVE_TIME_LIMIT_S, retries=DAVE_RETRIES):
+    """
+    Runs the DAVE grid generation of an area in a separate worker process
+    with memory and time limits, so that a runaway build cannot take the
+    pipeline down. A failed worker is retried, and stages completed by a
+    previous attempt (see CHECKPOINT_FILENAME) are not run again.
+
+    Args:
+        geojson_path: GeoJSON file with the area
+        output_folder: Folder of the DAVE dataset and the checkpoint
+        memory_mb: Address space limit of the worker in MB
+        time_s: CPU and wall time limit of the worker in seconds
+        retries: Number of further attempts after a failed worker
+
+    Returns:
+        True if all stages completed
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    area_key = file_digest(geojson_path)
+    command = [sys.executable, os.path.abspath(__file__), str(geojson_path), str(output_folder)]
+
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(command, preexec_fn=_limit_resources(memory_mb, time_s),
+                                    timeout=time_s)
+            returncode, error = result.returncode, None
+        except subprocess.TimeoutExpired:
+            returncode, error = None, f"wall time limit of {time_s} s exceeded"
+
+        if returncode is not None and returncode != 0:
+            # Negative return codes are signals, e.g. SIGXCPU (CPU limit) or SIGKILL
+            error = f"worker exited with code {returncode}"
+
+        # The worker updates the checkpoint itself, the supervisor adds the attempt
+        checkpoint = read_checkpoint(output_folder, area_key)
+        checkpoint['attempts'].append({
+            'attempt': attempt + 1,
+            'returncode': returncode,
+            'error': error,
+            'wall_time_s': round(time.perf_counter() - start, 2)
+        })
+        write_checkpoint(output_folder, checkpoint)
+
+        if error is None:
+            return True
+        print(f"DAVE worker attempt {attempt + 1} failed: {error} "
+              f"(completed stages: {', '.join(checkpoint['completed']) or 'none'})")
+
+    return False
+
+def run_worker(geojson_path, output_folder):
+    """Runs the stages of the grid generation that are not in the checkpoint yet"""
+    # Step 1 is only loaded in the worker process
+    city_network = importlib.import_module('1_city_network')
+    from pathlib import Path
+
+    checkpoint = read_checkpoint(output_folder, file_digest(geojson_path))
+    dataset_path = os.path.join(output_folder, city_network.DAVE_DATASET_FILENAME)
+
+    if 'create_grid' in checkpoint['completed'] and os.path.exists(dataset_path):
+        print(f"Resuming from checkpoint: {dataset_path} already created")
+        return
+
+    own_area = city_network.gpd.read_file(geojson_path).iloc[0].geometry
+    grid_data = city_network.run_create_grid(own_area, Path(output_folder))
+    checkpoint['completed'].append('create_grid')
+    write_checkpoint(output_folder, checkpoint)
+
+    # The plot is not needed by the later steps, so a failing plot keeps the dataset
+    city_network.plot_dave_network(grid_data)
+    checkpoint['completed'].append('plot_grid_data')
+    write_checkpoint(output_folder, checkpoint)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Worker process of run_supervised: runs DAVE for one area.')
+    parser.add_argument('geojson_path', help='GeoJSON file with the area')
+    parser.add_argument('output_folder', help='Folder of the DAVE dataset and the checkpoint')
+    args = parser.parse_args()
+
+    run_worker(args.geojson_path, args.output_folder)
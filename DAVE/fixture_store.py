@@ -0,0 +1,105 @@
+import os
+import pickle
+import shutil
+from build_cache import stage_key
+
+# Folder of the recorded responses, one subfolder per kind of call
+FIXTURE_DIR = os.environ.get('DAVE_FIXTURE_DIR',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures'))
+
+# 'live' calls the network services, 'record' also stores their responses,
+# 'replay' only serves stored responses. Kept in the environment so that
+# worker processes use the same mode.
+FIXTURE_MODES = ('live', 'record', 'replay')
+FIXTURE_MODE_VARIABLE = 'DAVE_FIXTURE_MODE'
+
+def set_fixture_mode(mode):
+    if mode not in FIXTURE_MODES:
+        raise ValueError(f"Unknown fixture mode: {mode}")
+    os.environ[FIXTURE_MODE_VARIABLE] = mode
+
+def fixture_mode():
+    return os.environ.get(FIXTURE_MODE_VARIABLE, 'live')
+
+def cache_enabled(use_cache):
+    """
+    Whether the build cache may be used around a recorded call. Recording
+    bypasses the cache, since a cache hit would skip the call and leave the
+    recorded fixtures incomplete.
+    """
+    return use_cache and fixture_mode() != 'record'
+
+def _fixture_dir(name, params):
+    # Same keys as the build cache, but without the code files, so that
+    # recordings stay valid when the scripts change
+    return os.path.join(FIXTURE_DIR, name, stage_key(name, params=params)[:32])
+
+def _missing(name, params):
+    return FileNotFoundError(f"No recorded {name} for {params} in {FIXTURE_DIR}; "
+                             f"run step 1 once with --fixtures record on a machine with network access")
+
+def recorded_value(name, params, call):
+    """
+    Returns the result of call(), or its recorded result in replay mode
+
+    Args:
+        name: Kind of call, e.g. 'geocode'
+        params: JSON-serializable arguments that identify the call
+        call: Function without arguments that makes the live call
+
+    Returns:
+        The (recorded) result of the call
+    """
+    value_path = os.path.join(_fixture_dir(name, params), 'value.pickle')
+    mode = fixture_mode()
+
+    if mode == 'replay':
+        if not os.path.exists(value_path):
+            raise _missing(name, params)
+        print(f"Replaying recorded {name}")
+        with open(value_path, 'rb') as file:
+            return pickle.load(file)
+
+    value = call()
+    if mode == 'record':
+        os.makedirs(os.path.dirname(value_path), exist_ok=True)
+        with open(value_path, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"Recorded {name} in {os.path.dirname(value_path)}")
+    return value
+
+def recorded_files(name, params, outputs, call):
+    """
+    Runs call(), which writes the output files, or copies the recorded
+    output files in replay mode
+
+    Args:
+        name: Kind of call, e.g. 'create_grid'
+        params: JSON-serializable arguments that identify the call
+        outputs: Paths of the files written by call()
+        call: Function without arguments that makes the live call
+
+    Returns:
+        True if the outputs were replayed
+    """
+    entry_dir = _fixture_dir(name, params)
+    recorded = [os.path.join(entry_dir, os.path.basename(path)) for path in outputs]
+    mode = fixture_mode()
+
+    if mode == 'replay':
+        if not all(os.path.exists(path) for path in recorded):
+            raise _missing(name, params)
+        print(f"Replaying recorded {name}")
+        for recorded_path, output_path in zip(recorded, outputs):
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            shutil.copy2(recorded_path, output_path)
+        return True
+
+    call()
+    if mode == 'record':
+        os.makedirs(entry_dir, exist_ok=True)
+        for recorded_path, output_path in zip(recorded, outputs):
+            if os.path.exists(output_path):
+                shutil.copy2(output_path, recorded_path)
+        print(f"Recorded {name} in {entry_dir}")
+    return False
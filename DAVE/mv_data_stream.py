@@ -0,0 +1,174 @@
+import json
+import re
+
+# Location of the MV GeoJSON payloads inside a DAVE dataset export
+MV_NODES_PATH = ('_object', 'mv_data', '_object', 'mv_nodes', '_object')
+MV_LINES_PATH = ('_object', 'mv_data', '_object', 'mv_lines', '_object')
+
+# Number of characters read from the file at a time
+CHUNK_SIZE = 1 << 20
+
+# Next character that changes the structure of the document
+_STRUCTURAL = re.compile(r'[{}\[\]",]')
+# Next character that changes the nesting depth of the document
+_BRACKET = re.compile(r'[{}\[\]"]')
+# Body of a JSON string up to (not including) its closing quote
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+def stream_json_values(file_path, paths, chunk_size=CHUNK_SIZE):
+    """
+    Incrementally scans a JSON file and yields the raw JSON text of the
+    values found at the requested key paths. Only the requested values
+    are kept in memory; containers that cannot hold a requested path are
+    skipped by bracket counting. Scanning stops as soon as all requested
+    values have been found.
+
+    Args:
+        file_path: Path to the JSON file
+        paths: Iterable of key paths, e.g. ('_object', 'mv_data', '_object')
+        chunk_size: Number of characters read at a time
+
+    Yields:
+        Tuples (path, raw_json_text)
+    """
+    remaining = set(tuple(path) for path in paths)
+    prefixes = set(path[:i] for path in remaining for i in range(len(path)))
+
+    # Each frame is [is_object, current_key, expecting_key]
+    stack = []
+
+    in_string = False
+    key_parts = None      # Raw text of the object key being read
+    key_start = None
+    skip_depth = 0        # Depth inside a container that is skipped or captured
+    capture = None        # Dictionary describing the value being captured
+
+    with open(file_path, 'r', encoding='utf-8') as file:
+        buf = ''
+        pos = 0
+
+        while remaining:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+
+            # Move the captured text of the previous buffer out of it
+            if capture is not None:
+                capture['parts'].append(buf[capture['start']:pos])
+                capture['start'] = 0
+            if key_start is not None:
+                key_parts.append(buf[key_start:pos])
+                key_start = 0
+
+            buf = buf[pos:] + chunk
+            pos = 0
+
+            while True:
+                if in_string:
+                    pos = _STRING_BODY.match(buf, pos).end()
+                    if pos >= len(buf) or buf[pos] != '"':
+                        # The string continues in the next chunk; an escape cut
+                        # by the chunk boundary stays at pos for the next buffer
+                        break
+
+                    in_string = False
+                    end = pos
+                    pos += 1
+
+                    if key_start is not None:
+                        raw_key = ''.join(key_parts) + buf[key_start:end]
+                        stack[-1][1] = json.loads(f'"{raw_key}"')
+                        stack[-1][2] = False
+                        key_parts = None
+                        key_start = None
+                    elif capture is not None and skip_depth == 0:
+                        yield capture['path'], ''.join(capture['parts']) + buf[capture['start']:pos]
+                        remaining.discard(capture['path'])
+                        capture = None
+                        if not remaining:
+                            return
+                    continue
+
+                if skip_depth:
+                    # Inside a skipped or captured container only brackets and strings matter
+                    match = _BRACKET.search(buf, pos)
+                    if match is None:
+                        pos = len(buf)
+                        break
+
+                    char = match.group()
+                    pos = match.end()
+                    if char == '"':
+                        in_string = True
+                    elif char in '{[':
+                        skip_depth += 1
+                    else:
+                        skip_depth -= 1
+                        if skip_depth == 0 and capture is not None:
+                            yield capture['path'], ''.join(capture['parts']) + buf[capture['start']:pos]
+                            remaining.discard(capture['path'])
+                            capture = None
+                            if not remaining:
+                                return
+                    continue
+
+                match = _STRUCTURAL.search(buf, pos)
+                if match is None:
+                    pos = len(buf)
+                    break
+
+                char = match.group()
+                start = match.start()
+                pos = match.end()
+
+                if char == '"':
+                    in_string = True
+                    if stack and stack[-1][0] and stack[-1][2]:
+                        key_parts = []
+                        key_start = pos
+                    else:
+                        path = tuple(frame[1] for frame in stack)
+                        if path in remaining:
+                            capture = {'path': path, 'parts': [], 'start': start}
+                elif char in '{[':
+                    path = tuple(frame[1] for frame in stack)
+                    if path in remaining:
+                        capture = {'path': path, 'parts': [], 'start': start}
+                        skip_depth = 1
+                    elif path not in prefixes:
+                        skip_depth = 1
+                    else:
+                        stack.append([char == '{', None, char == '{'])
+                elif char in '}]':
+                    stack.pop()
+                elif char == ',' and stack and stack[-1][0]:
+                    stack[-1][2] = True
+
+def decode_geojson(raw_value):
+    """
+    Decodes a GeoJSON payload of a DAVE export. DAVE stores GeoDataFrames
+    as JSON strings, so the value is decoded once as a JSON string and
+    then once more as the GeoJSON document it contains.
+    """
+    value = json.loads(raw_value)
+    if isinstance(value, str):
+        value = json.loads(value)
+    return value
+
+def stream_mv_data(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Extracts the mv_nodes and mv_lines GeoJSON of a DAVE dataset without
+    loading the whole file in memory
+
+    Args:
+        file_path: Path to the DAVE dataset JSON file
+        chunk_size: Number of characters read at a time
+
+    Returns:
+        Tuple (nodes_geojson, lines_geojson); missing payloads are empty dictionaries
+    """
+    found = {}
+    for path, raw_value in stream_json_values(file_path, [MV_NODES_PATH, MV_LINES_PATH], chunk_size):
+        found[path] = decode_geojson(raw_value)
+
+    return found.get(MV_NODES_PATH, {}), found.get(MV_LINES_PATH, {})
@@ -0,0 +1,138 @@
+import os
+import numpy as np
+
+# Name of the directory that holds the MV graph arrays
+MV_GRAPH_DIRNAME = 'mv_graph'
+
+# One .npy file per column, so every column can be memory-mapped on load
+NODE_IDS_FILE = 'node_ids.npy'
+COORDINATES_FILE = 'coordinates.npy'
+NORMALIZED_COORDINATES_FILE = 'normalized_coordinates.npy'
+EDGES_FILE = 'edges.npy'
+EDGE_DISTANCES_FILE = 'edge_distances.npy'
+MV_GRAPH_FILES = [NODE_IDS_FILE, COORDINATES_FILE, NORMALIZED_COORDINATES_FILE, EDGES_FILE, EDGE_DISTANCES_FILE]
+
+def nodes_dict_to_arrays(nodes_dict):
+    """
+    Converts the parsed MV nodes into a node table and an undirected edge list
+
+    Args:
+        nodes_dict: Dictionary with MV node data, as created by parse_nodes/parse_lines
+
+    Returns:
+        Dictionary with the arrays node_ids (N,), coordinates (N, 2),
+        normalized_coordinates (N, 2), edges (E, 2) with node indices and
+        edge_distances (E,) in meters
+    """
+    index = {node_id: i for i, node_id in enumerate(nodes_dict)}
+
+    edges = []
+    distances = []
+    for i, node_data in enumerate(nodes_dict.values()):
+        for connection, distance in node_data.get('edge_distances', {}).items():
+            j = index.get(connection)
+            # Each undirected edge is stored once
+            if j is not None and i < j:
+                edges.append((i, j))
+                distances.append(distance)
+
+    return {
+        'node_ids': np.array([str(node_data['id']) for node_data in nodes_dict.values()]),
+        'coordinates': np.array([node_data['coordinates'][:2] for node_data in nodes_dict.values()],
+                                dtype=np.float64).reshape(-1, 2),
+        'normalized_coordinates': np.array([node_data['normalized_coordinates'] for node_data in nodes_dict.values()],
+                                           dtype=np.int64).reshape(-1, 2),
+        'edges': np.array(edges, dtype=np.int32).reshape(-1, 2),
+        'edge_distances': np.array(distances, dtype=np.int64)
+    }
+
+def save_mv_graph(nodes_dict, output_dir):
+    """
+    Saves the MV graph as a node table and an edge list of .npy files
+
+    Args:
+        nodes_dict: Dictionary with MV node data
+        output_dir: Directory where the arrays are written
+
+    Returns:
+        Path to the graph directory
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    graph = nodes_dict_to_arrays(nodes_dict)
+
+    np.save(os.path.join(output_dir, NODE_IDS_FILE), graph['node_ids'])
+    np.save(os.path.join(output_dir, COORDINATES_FILE), graph['coordinates'])
+    np.save(os.path.join(output_dir, NORMALIZED_COORDINATES_FILE), graph['normalized_coordinates'])
+    np.save(os.path.join(output_dir, EDGES_FILE), graph['edges'])
+    np.save(os.path.join(output_dir, EDGE_DISTANCES_FILE), graph['edge_distances'])
+
+    return output_dir
+
+def load_mv_graph(graph_dir, mmap=True):
+    """
+    Loads the MV graph arrays in one call
+
+    Args:
+        graph_dir: Directory written by save_mv_graph
+        mmap: Memory-map the arrays instead of reading them in memory
+
+    Returns:
+        Dictionary with the arrays node_ids, coordinates,
+        normalized_coordinates, edges and edge_distances
+    """
+    mmap_mode = 'r' if mmap else None
+    return {
+        'node_ids': np.load(os.path.join(graph_dir, NODE_IDS_FILE), mmap_mode=mmap_mode),
+        'coordinates': np.load(os.path.join(graph_dir, COORDINATES_FILE), mmap_mode=mmap_mode),
+        'normalized_coordinates': np.load(os.path.join(graph_dir, NORMALIZED_COORDINATES_FILE), mmap_mode=mmap_mode),
+        'edges': np.load(os.path.join(graph_dir, EDGES_FILE), mmap_mode=mmap_mode),
+        'edge_distances': np.load(os.path.join(graph_dir, EDGE_DISTANCES_FILE), mmap_mode=mmap_mode)
+    }
+
+def load_mv_networkx(graph_dir):
+    """
+    Loads the MV graph as a networkx graph
+
+    Returns:
+        G: Graph with 'pos' node attributes and 'weight' edge attributes
+        node_coords: Dictionary with the normalized (x, y) of each node
+    """
+    # Only loaded here, the readers of the simulation logs do not need networkx
+    import networkx as nx
+
+    graph = load_mv_graph(graph_dir)
+
+    node_ids = graph['node_ids'].tolist()
+    positions = [tuple(xy) for xy in graph['normalized_coordinates'].tolist()]
+    node_coords = dict(zip(node_ids, positions))
+
+    G = nx.Graph()
+    G.add_nodes_from((node_id, {'pos': pos}) for node_id, pos in node_coords.items())
+    G.add_weighted_edges_from(
+        (node_ids[i], node_ids[j], weight)
+        for (i, j), weight in zip(graph['edges'].tolist(), graph['edge_distances'].tolist())
+    )
+
+    return G, node_coords
+
+def read_mv_graph(graph_dir):
+    """
+    Reads the MV graph arrays as plot data, as used by the log analysis
+    scripts of PureEdgeSim/DroneSim
+
+    Returns:
+        mv_nodes: Dictionary {node_id: (x, y)} with normalized coordinates
+        mv_connections: List of (node1, node2, distance) with node1 < node2
+    """
+    graph = load_mv_graph(graph_dir)
+    node_ids = np.asarray(graph['node_ids']).astype(int)
+    edges = graph['edges']
+
+    mv_nodes = dict(zip(node_ids.tolist(), map(tuple, graph['normalized_coordinates'].tolist())))
+
+    # Order each edge so that node1 < node2
+    edge_ids = np.sort(node_ids[edges], axis=1) if len(edges) else np.empty((0, 2), dtype=int)
+    mv_connections = [(node1, node2, distance)
+                      for (node1, node2), distance in zip(edge_ids.tolist(), graph['edge_distances'].tolist())]
+
+    return mv_nodes, mv_connections
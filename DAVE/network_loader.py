@@ -0,0 +1,312 @@
+import json
+import os
+import numpy as np
+import projection
+from mv_data_stream import stream_mv_data
+from tower_ingest import ingest_tower_sources
+from build_cache import stage_key, cached_value
+from stage_profiler import stage
+
+# Edge distances used as graph weights when no mode is given: 'polyline'
+# (along the line geometry) or 'euclidean' (straight line between the end nodes)
+DEFAULT_EDGE_DISTANCE_MODE = 'polyline'
+
+# Files whose content is part of the key of the cached networks
+LOADER_CODE_FILES = ['network_loader.py', 'projection.py', 'mv_data_stream.py', 'tower_ingest.py', 'aoi_clip.py']
+
+def _code_files():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return [os.path.join(script_dir, name) for name in LOADER_CODE_FILES]
+
+def extract_mv_data(file_path):
+    """
+    Extracts the medium voltage nodes and lines from a DAVE dataset.
+    The file is streamed, so only the mv_nodes and mv_lines payloads are
+    kept in memory regardless of the size of the export.
+    
+    Args:
+        file_path: Path to the DAVE dataset JSON file
+        
+    Returns:
+        Tuple (nodes_geojson, lines_geojson), empty dictionaries if not found
+    """
+    try:
+        nodes_geojson, lines_geojson = stream_mv_data(file_path)
+        
+        if not nodes_geojson or not lines_geojson:
+            print("Could not find mv_data._object.mv_nodes or mv_lines in the file.")
+            return {}, {}
+        
+        print(f"Successfully extracted MV data from file. Found {len(nodes_geojson.get('features', []))} nodes and {len(lines_geojson.get('features', []))} lines.")
+        return nodes_geojson, lines_geojson
+        
+    except json.JSONDecodeError as e:
+        print(f"Error decoding extracted JSON: {e}")
+        return {}, {}
+    except Exception as e:
+        print(f"Error in extract_mv_data: {e}")
+        import traceback
+        traceback.print_exc()
+        return {}, {}
+
+def parse_nodes(nodes_data):
+    """Converts the GeoJSON nodes to a dictionary with geographic and normalized coordinates"""
+    nodes_dict = {}
+    all_coordinates = []
+    
+    for feature in nodes_data.get('features', []):
+        properties = feature.get('properties', {})
+        geometry = feature.get('geometry', {})
+        
+        node_id = properties.get('dave_name', '')
+        # Extract the numerical part of the ID
+        node_num = node_id.split('_')[-1]
+        coordinates = geometry.get('coordinates', [0, 0])
+        all_coordinates.append(coordinates)
+        
+        nodes_dict[node_id] = {
+            'id': node_num,  # Store only the numerical part
+            'coordinates': coordinates,
+            'connections': []
+        }
+    
+    # Calculate bounding box
+    if all_coordinates:
+        lats = [coord[1] for coord in all_coordinates]
+        lons = [coord[0] for coord in all_coordinates]
+        
+        bbox = {
+            'min_lat': min(lats),
+            'max_lat': max(lats),
+            'min_lon': min(lons),
+            'max_lon': max(lons)
+        }
+        
+        # Add normalized coordinates to each node (all nodes projected in one call)
+        normalized = projection.normalize(all_coordinates, bbox).tolist()
+        for node_data, normalized_coords in zip(nodes_dict.values(), normalized):
+            node_data['normalized_coordinates'] = normalized_coords
+    
+    return nodes_dict
+
+def line_parts(geometry):
+    """Returns the vertex lists of a LineString or MultiLineString geometry"""
+    coordinates = geometry.get('coordinates') or []
+    if geometry.get('type') == 'MultiLineString':
+        return [part for part in coordinates if part]
+    return [coordinates] if coordinates else []
+
+def parse_lines(lines_data, nodes_dict, distance_mode=None):
+    """
+    Converts the MV lines and calculates the edge distances of the nodes
+    
+    Args:
+        lines_data: GeoJSON with the MV lines
+        nodes_dict: Dictionary with MV node data, as created by parse_nodes
+        distance_mode: 'euclidean' (straight line between the end nodes) or
+                       'polyline' (along the line geometry) edge distances,
+                       DEFAULT_EDGE_DISTANCE_MODE by default
+    
+    Returns:
+        Tuple (lines, total Euclidean length of the distinct edges in km)
+    """
+    if distance_mode is None:
+        distance_mode = DEFAULT_EDGE_DISTANCE_MODE
+    
+    lines = []
+    total_length = 0
+    
+    features = lines_data.get('features', [])
+    node_ids = list(nodes_dict)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    
+    bus_pairs = [(feature.get('properties', {}).get('from_bus', ''),
+                  feature.get('properties', {}).get('to_bus', '')) for feature in features]
+    
+    # Edges as node index arrays (-1 for unknown nodes)
+    from_index = np.fromiter((index.get(from_bus, -1) for from_bus, _ in bus_pairs), dtype=np.int64, count=len(features))
+    to_index = np.fromiter((index.get(to_bus, -1) for _, to_bus in bus_pairs), dtype=np.int64, count=len(features))
+    known = np.flatnonzero((from_index >= 0) & (to_index >= 0))
+    
+    # Vertices of the line geometries, each part of a line as a separate path
+    parts = [line_parts(feature.get('geometry') or {}) for feature in features]
+    part_feature = np.array([k for k, feature_parts in enumerate(parts) for _ in feature_parts], dtype=np.int64)
+    part_sizes = [len(part) for feature_parts in parts for part in feature_parts]
+    vertices = [vertex[:2] for feature_parts in parts for part in feature_parts for vertex in part]
+    
+    # Project the nodes and all line vertices in one call
+    node_coordinates = projection.lonlat_array([node_data['coordinates'] for node_data in nodes_dict.values()])
+    projected = projection.project(np.concatenate([node_coordinates, np.asarray(vertices, dtype=float).reshape(-1, 2)]))
+    projected_nodes, projected_vertices = projected[:len(node_ids)], projected[len(node_ids):]
+    
+    # Straight-line length of the edges between known nodes
+    delta = projected_nodes[to_index[known]] - projected_nodes[from_index[known]]
+    euclidean = np.hypot(delta[:, 0], delta[:, 1])
+    
+    # Length along the line geometry; lines without geometry keep the straight-line length
+    part_lengths = projection.path_lengths(projected_vertices, np.repeat(np.arange(len(part_sizes)), part_sizes),
+                                           len(part_sizes))
+    polyline = np.bincount(part_feature, weights=part_lengths, minlength=len(features))[known]
+    polyline = np.where(polyline > 0, polyline, euclidean)
+    
+    # Undirected edges: the sorted index pair identifies the edge
+    pairs = np.sort(np.column_stack((from_index[known], to_index[known])), axis=1)
+    _, first, inverse = np.unique(pairs, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    
+    # Total length based on Euclidean distance, only once for each pair of nodes
+    euclidean_total_length_m = euclidean[first].sum()
+    
+    # Edge distance of each pair; parallel lines keep the shortest one
+    if distance_mode == 'polyline':
+        edge_lengths = np.full(len(first), np.inf)
+        np.minimum.at(edge_lengths, inverse, polyline)
+    elif distance_mode == 'euclidean':
+        edge_lengths = euclidean[first]
+    else:
+        raise ValueError(f"Unknown edge distance mode: {distance_mode}")
+    edge_distances = edge_lengths.astype(np.int64)[inverse].tolist()
+    
+    # Distances of the known features, in feature order
+    feature_euclidean = np.zeros(len(features), dtype=np.int64)
+    feature_euclidean[known] = euclidean.astype(np.int64)
+    feature_polyline = np.zeros(len(features), dtype=np.int64)
+    feature_polyline[known] = polyline.astype(np.int64)
+    
+    for node_data in nodes_dict.values():
+        node_data['edge_distances'] = {}
+    
+    # Add distances to node data, in order of the connections of each node
+    for k, distance in zip(known.tolist(), edge_distances):
+        from_bus, to_bus = bus_pairs[k]
+        nodes_dict[from_bus]['edge_distances'].setdefault(to_bus, distance)
+        nodes_dict[to_bus]['edge_distances'].setdefault(from_bus, distance)
+    
+    for feature, (from_bus, to_bus), euclidean_distance, polyline_distance in zip(
+            features, bus_pairs, feature_euclidean.tolist(), feature_polyline.tolist()):
+        properties = feature.get('properties', {})
+        geometry = feature.get('geometry', {})
+        
+        length_km = properties.get('length_km', 0)
+        
+        # Add connections to the nodes
+        if from_bus in nodes_dict:
+            nodes_dict[from_bus]['connections'].append(to_bus)
+        if to_bus in nodes_dict:
+            nodes_dict[to_bus]['connections'].append(from_bus)
+        
+        coordinates = geometry.get('coordinates', [])
+        
+        if from_bus and to_bus and coordinates:
+            lines.append({
+                'from_bus': from_bus,
+                'to_bus': to_bus,
+                'length_km': length_km,
+                'coordinates': coordinates,
+                'euclidean_distance': euclidean_distance,
+                'polyline_distance': polyline_distance
+            })
+            total_length += length_km
+    
+    # Convert from meters to kilometers
+    euclidean_total_length_km = float(euclidean_total_length_m) / 1000
+    
+    return lines, euclidean_total_length_km
+
+def parse_mv_network(data_path, distance_mode=None, aoi_path=None):
+    """
+    Extracts and parses the MV network of a DAVE dataset
+    
+    Args:
+        data_path: Path to the DAVE dataset JSON file
+        distance_mode: Edge distance mode of parse_lines
+        aoi_path: GeoJSON polygon the network is clipped to, None to keep the whole network
+    
+    Returns:
+        Dictionary with nodes, lines, total_length (km) and dimensions,
+        None if no network was found
+    """
+    # Extract MV data
+    with stage('extract_mv_data', 'extract'):
+        mv_nodes_data, mv_lines_data = extract_mv_data(data_path)
+    
+    if not mv_nodes_data or not mv_lines_data:
+        print("No MV data found in the JSON file.")
+        return None
+    
+    # Clip the network to the area of interest before anything is projected
+    if aoi_path:
+        from aoi_clip import load_aoi, clip_mv_network
+        with stage('clip_mv_network', 'filter'):
+            mv_nodes_data, mv_lines_data = clip_mv_network(mv_nodes_data, mv_lines_data, load_aoi(aoi_path))
+    
+    # Process MV data
+    with stage('parse_mv_nodes', 'project'):
+        nodes_dict = parse_nodes(mv_nodes_data)
+    if not nodes_dict:
+        print("No nodes could be parsed from the MV data.")
+        return None
+        
+    with stage('parse_mv_lines', 'project'):
+        lines, total_length = parse_lines(mv_lines_data, nodes_dict, distance_mode)
+    if not lines:
+        print("No lines could be parsed from the MV data.")
+        return None
+    
+    return {
+        'nodes': nodes_dict,
+        'lines': lines,
+        'total_length': total_length,
+        'dimensions': calculate_network_dimensions(nodes_dict, lines)
+    }
+
+def calculate_network_dimensions(nodes_dict, lines):
+    """Calculates the area dimensions of the drawn MV lines, as shown in mv_network_map.png"""
+    coordinates = []
+    for line in lines:
+        if line['from_bus'] in nodes_dict and line['to_bus'] in nodes_dict:
+            coordinates.append(nodes_dict[line['from_bus']]['coordinates'])
+            coordinates.append(nodes_dict[line['to_bus']]['coordinates'])
+    return projection.calculate_area_dimensions(coordinates)
+
+def mv_network_key(data_path, distance_mode=None, aoi_path=None):
+    """Cache key of the parsed MV network of a DAVE dataset"""
+    return stage_key('mv_network', [data_path] + ([aoi_path] if aoi_path else []) + _code_files(),
+                     params=distance_mode or DEFAULT_EDGE_DISTANCE_MODE)
+
+def load_mv_network(data_path, distance_mode=None, use_cache=True, aoi_path=None):
+    """
+    Returns the parsed MV network of a DAVE dataset. The result is cached
+    on disk, keyed by the content of the dataset, so the dataset is only
+    extracted and parsed again when it changes.
+    
+    Args:
+        data_path: Path to the DAVE dataset JSON file
+        distance_mode: Edge distance mode of parse_lines
+        use_cache: False to always parse the dataset
+        aoi_path: GeoJSON polygon the network is clipped to, None to keep the whole network
+    
+    Returns:
+        Dictionary with nodes, lines, total_length (km) and dimensions,
+        None if no network was found
+    """
+    return cached_value('mv_network', mv_network_key(data_path, distance_mode, aoi_path),
+                        lambda: parse_mv_network(data_path, distance_mode, aoi_path), use_cache)
+
+def tower_table_key(tower_sources):
+    """Cache key of the tower table of a list of (path, technology, operator) sources"""
+    return stage_key('tower_table', [path for path, _, _ in tower_sources] + _code_files(),
+                     params=[list(source) for source in tower_sources])
+
+def load_tower_table(tower_sources, max_workers=None, use_cache=True):
+    """
+    Returns the towers of all GNB files as one columnar table (see
+    tower_ingest.TOWER_COLUMNS), cached on disk keyed by the content of the files
+    
+    Args:
+        tower_sources: List of (path, technology, operator) tuples; missing files are skipped
+        max_workers: Maximum number of processes parsing the files
+        use_cache: False to always parse the files
+    """
+    return cached_value('tower_table', tower_table_key(tower_sources),
+                        lambda: ingest_tower_sources(tower_sources, max_workers), use_cache)
@@ -0,0 +1,90 @@
+import numpy as np
+from matplotlib.collections import EllipseCollection, LineCollection
+
+# Above this number of elements, per-element text labels (node IDs, line
+# distances, tower labels) are not drawn, since every label is a separate artist
+LABEL_LIMIT = 300
+
+# Layers with more elements than this are rasterized when saved to vector formats
+RASTERIZE_LIMIT = 2000
+
+def line_segments(nodes_dict, lines, coordinates_key='coordinates'):
+    """
+    Collects the segments of the lines whose both end nodes are known
+
+    Args:
+        nodes_dict: Dictionary with MV node data
+        lines: List with MV network line data
+        coordinates_key: Node field with the coordinates to draw
+
+    Returns:
+        Tuple (segments, drawn_lines) with an array (L, 2, 2) of segment end
+        points and the list of the corresponding lines
+    """
+    drawn_lines = [line for line in lines
+                   if line['from_bus'] in nodes_dict and line['to_bus'] in nodes_dict]
+    segments = np.array([[nodes_dict[line['from_bus']][coordinates_key],
+                          nodes_dict[line['to_bus']][coordinates_key]] for line in drawn_lines],
+                        dtype=float).reshape(-1, 2, 2)
+    return segments, drawn_lines
+
+def segment_label_positions(segments, offset=0.0):
+    """
+    Calculates the positions of the line labels: the middle of each segment,
+    moved by offset perpendicular to the segment
+
+    Args:
+        segments: Array (L, 2, 2) of segment end points
+        offset: Distance of the label from the line, in data units
+
+    Returns:
+        Array (L, 2) with the label positions
+    """
+    start, end = segments[:, 0], segments[:, 1]
+    middle = (start + end) / 2
+    if offset == 0 or len(segments) == 0:
+        return middle
+
+    delta = end - start
+    vertical = delta[:, 0] == 0
+    # Angle of the slope of each line; vertical lines are moved along x
+    angle = np.arctan(np.divide(delta[:, 1], delta[:, 0], out=np.zeros(len(delta)), where=~vertical))
+    shift = np.column_stack((-offset * np.sin(angle), offset * np.cos(angle)))
+    shift[vertical] = (offset, 0)
+    return middle + shift
+
+def draw_lines(ax, segments, color='black', linewidth=1.0, alpha=0.8, zorder=1):
+    """Draws all segments as a single LineCollection"""
+    collection = LineCollection(segments, colors=color, linewidths=linewidth, alpha=alpha, zorder=zorder,
+                                rasterized=len(segments) > RASTERIZE_LIMIT)
+    ax.add_collection(collection)
+    return collection
+
+def draw_circles(ax, centers, radius, facecolor, edgecolor='black', alpha=0.8, zorder=2):
+    """Draws circles with a radius in data units as a single EllipseCollection"""
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    diameters = np.full(len(centers), 2 * radius)
+    collection = EllipseCollection(diameters, diameters, np.zeros(len(centers)), units='xy',
+                                   offsets=centers, offset_transform=ax.transData,
+                                   facecolors=facecolor, edgecolors=edgecolor, alpha=alpha, zorder=zorder,
+                                   rasterized=len(centers) > RASTERIZE_LIMIT)
+    ax.add_collection(collection)
+    return collection
+
+def draw_markers(ax, points, **scatter_kwargs):
+    """Draws all points of one marker class with a single scatter call"""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    return ax.scatter(points[:, 0], points[:, 1], rasterized=len(points) > RASTERIZE_LIMIT, **scatter_kwargs)
+
+def draw_labels(ax, points, texts, limit=LABEL_LIMIT, **text_kwargs):
+    """
+    Draws one text label per point, unless there are more than limit labels
+
+    Returns:
+        Number of labels drawn
+    """
+    if len(texts) > limit:
+        return 0
+    for (x, y), text in zip(np.asarray(points, dtype=float).reshape(-1, 2).tolist(), texts):
+        ax.text(x, y, text, **text_kwargs)
+    return len(texts)
@@ -0,0 +1,204 @@
+import functools
+import numpy as np
+import pyproj
+
+# Geographic (lon/lat) to metric projection used throughout the DAVE scripts
+SOURCE_CRS = "EPSG:4326"
+TARGET_CRS = "EPSG:3035"
+
+# Margin added on all sides of the normalized coordinate system
+NORMALIZATION_MARGIN = 0.1
+
+@functools.lru_cache(maxsize=None)
+def get_transformer(source_crs=SOURCE_CRS, target_crs=TARGET_CRS):
+    """
+    Returns the shared transformer for the given CRS pair.
+    The transformer is created once per process and reused by every call.
+    """
+    return pyproj.Transformer.from_crs(source_crs, target_crs, always_xy=True)
+
+def lonlat_array(coords):
+    """
+    Returns the longitude and latitude of points given as [lon, lat] or
+    [lon, lat, z], as an array of shape (N, 2); the z values are dropped
+    """
+    try:
+        coords = np.asarray(coords, dtype=float)
+    except ValueError:
+        # Mixed 2-D and 3-D points
+        coords = np.array([point[:2] for point in coords], dtype=float)
+    if coords.size == 0:
+        return np.empty((0, 2))
+    if coords.ndim == 1:
+        coords = coords[np.newaxis, :]
+    return coords.reshape(-1, coords.shape[-1])[:, :2]
+
+def project(coords):
+    """
+    Projects geographic coordinates to meters in a single array call
+
+    Args:
+        coords: Array-like with coordinates in the form [[longitude, latitude], ...],
+                optionally with a third (z) value per point
+
+    Returns:
+        NumPy array of shape (N, 2) with the projected [x, y] in meters
+    """
+    coords = lonlat_array(coords)
+    if len(coords) == 0:
+        return np.empty((0, 2))
+
+    x, y = get_transformer().transform(coords[:, 0], coords[:, 1])
+    return np.column_stack((x, y))
+
+def unproject(points):
+    """
+    Converts projected coordinates (meters) back to geographic coordinates
+
+    Returns:
+        NumPy array of shape (N, 2) with [longitude, latitude]
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) == 0:
+        return np.empty((0, 2))
+
+    lon, lat = get_transformer(TARGET_CRS, SOURCE_CRS).transform(points[:, 0], points[:, 1])
+    return np.column_stack((lon, lat))
+
+def calculate_distance(coord1, coord2):
+    """Calculate distance between two points in meters"""
+    (x1, y1), (x2, y2) = project([coord1, coord2])
+    return float(np.hypot(x2 - x1, y2 - y1))
+
+def pairwise_distances(coords1, coords2):
+    """
+    Calculates the distances in meters between two equally sized
+    lists of points, projecting both lists in one call
+    """
+    coords1 = lonlat_array(coords1)
+    coords2 = lonlat_array(coords2)
+    if len(coords1) != len(coords2):
+        raise ValueError(f"pairwise_distances needs lists of equal length, got {len(coords1)} and {len(coords2)} points")
+    projected = project(np.concatenate([coords1, coords2]))
+    half = len(coords1)
+    delta = projected[half:] - projected[:half]
+    return np.hypot(delta[:, 0], delta[:, 1])
+
+def path_lengths(projected, path_ids, count):
+    """
+    Sums the lengths of the segments between consecutive projected points
+    that belong to the same path
+
+    Args:
+        projected: Array (P, 2) with projected points in meters; the points
+                   of each path are consecutive
+        path_ids: Integer array (P,) with the path of each point
+        count: Number of paths
+
+    Returns:
+        Array (count,) with the length of each path in meters
+    """
+    projected = np.asarray(projected, dtype=float).reshape(-1, 2)
+    path_ids = np.asarray(path_ids, dtype=np.int64)
+    if len(projected) < 2:
+        return np.zeros(count)
+
+    delta = projected[1:] - projected[:-1]
+    same_path = path_ids[1:] == path_ids[:-1]
+    return np.bincount(path_ids[1:][same_path], weights=np.hypot(delta[same_path, 0], delta[same_path, 1]),
+                       minlength=count)
+
+@functools.lru_cache(maxsize=None)
+def _frame_for(min_lon, min_lat, max_lon, max_lat, margin):
+    (min_x, min_y), (max_x, max_y) = project([[min_lon, min_lat], [max_lon, max_lat]])
+
+    width = max_x - min_x
+    height = max_y - min_y
+
+    return {
+        'min_x': min_x,
+        'min_y': min_y,
+        'width': width,
+        'height': height,
+        'margin_x': width * margin,
+        'margin_y': height * margin
+    }
+
+def get_frame(bbox, margin=NORMALIZATION_MARGIN):
+    """
+    Returns the normalized coordinate frame of a bounding box.
+    The bbox corners are projected and the margins are computed only
+    once for each distinct bbox.
+
+    Args:
+        bbox: Dictionary with min_lon, min_lat, max_lon, max_lat of the system
+        margin: Fraction of the width/height added on all sides
+
+    Returns:
+        Dictionary with the projected origin (min_x, min_y), the size
+        and the margins of the frame
+    """
+    return _frame_for(float(bbox['min_lon']), float(bbox['min_lat']),
+                      float(bbox['max_lon']), float(bbox['max_lat']), margin)
+
+def normalize(coords, bbox, margin=NORMALIZATION_MARGIN):
+    """
+    Converts geographic coordinates to the normalized (X,Y) system of the
+    bbox, with margin so that the bottom left point is not (0,0)
+
+    Args:
+        coords: Array-like with coordinates in the form [[longitude, latitude], ...]
+        bbox: Dictionary with min_lon, min_lat, max_lon, max_lat of the system
+        margin: Fraction of the width/height added on all sides
+
+    Returns:
+        Integer NumPy array of shape (N, 2) with the normalized [x, y]
+    """
+    return to_frame(project(coords), bbox, margin)
+
+def to_frame(projected, bbox, margin=NORMALIZATION_MARGIN):
+    """
+    Converts already projected coordinates (meters) to the normalized
+    (X,Y) system of the bbox
+
+    Returns:
+        Integer NumPy array of shape (N, 2) with the normalized [x, y]
+    """
+    frame = get_frame(bbox, margin)
+    projected = np.asarray(projected, dtype=float).reshape(-1, 2)
+
+    norm_x = projected[:, 0] - frame['min_x'] + frame['margin_x']
+    norm_y = projected[:, 1] - frame['min_y'] + frame['margin_y']
+
+    # Truncate towards zero, like int()
+    return np.column_stack((norm_x, norm_y)).astype(int)
+
+def calculate_area_dimensions(coordinates):
+    """Calculate area dimensions from coordinates"""
+    if coordinates is None or len(coordinates) == 0:
+        return {
+            'min_lat': 0, 'max_lat': 0, 'min_lon': 0, 'max_lon': 0,
+            'width': 0, 'height': 0, 'area': 0
+        }
+
+    coords = lonlat_array(coordinates)
+    min_lon, min_lat = coords.min(axis=0)
+    max_lon, max_lat = coords.max(axis=0)
+
+    # Convert coordinates to meters
+    (x1, y1), (x2, y2) = project([[min_lon, min_lat], [max_lon, max_lat]])
+
+    # Calculate dimensions
+    width = abs(x2 - x1)
+    height = abs(y2 - y1)
+    area = width * height / 1000000  # in square kilometers
+
+    return {
+        'min_lat': float(min_lat),
+        'max_lat': float(max_lat),
+        'min_lon': float(min_lon),
+        'max_lon': float(max_lon),
+        'width': int(width),
+        'height': int(height),
+        'area': round(area, 2)
+    }
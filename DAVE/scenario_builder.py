@@ -0,0 +1,370 @@
+import argparse
+import copy
+import csv
+import itertools
+import json
+import math
+import os
+import re
+import shutil
+import xml.etree.ElementTree as ET
+import numpy as np
+from mv_graph_store import MV_GRAPH_DIRNAME, load_mv_graph
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PUREEDGESIM_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), 'PureEdgeSim')
+
+# Hand-edited settings that every scenario starts from
+BASE_SETTINGS_DIR = os.path.join(PUREEDGESIM_DIR, 'DroneSim', 'Drone_settings')
+# One folder per scenario, with its own settings and output folders
+SCENARIOS_DIR = os.path.join(PUREEDGESIM_DIR, 'DroneSim', 'Scenarios')
+SCENARIO_SETTINGS_DIRNAME = 'Drone_settings'
+SCENARIO_OUTPUT_DIRNAME = 'Drone_output'
+SCENARIO_MANIFEST_FILENAME = 'scenarios.json'
+
+PROPERTIES_FILENAME = 'simulation_parameters.properties'
+DEVICES_FILENAME = 'edge_devices.xml'
+APPLICATIONS_FILENAME = 'applications.xml'
+DATACENTERS_FILENAME = 'edge_datacenters.xml'
+
+# Margin around the MV network and the datacenters when the map size is
+# taken from the normalized coordinates, and the step the size is rounded up to
+MAP_PADDING_M = 100
+MAP_ROUNDING_M = 100
+
+# Spec keys that set simulation properties
+SPEC_PROPERTIES = {
+    'fleet_size': ['min_number_of_edge_devices', 'max_number_of_edge_devices'],
+    'simulation_time': ['simulation_time'],
+    'coverage': ['edge_datacenters_coverage'],
+    'edge_devices_range': ['edge_devices_range'],
+    'map_length': ['length'],
+    'map_width': ['width']
+}
+
+def load_spec(spec_path):
+    """
+    Reads a scenario spec, a JSON object with the keys
+
+        name: Name of the scenario (default: name of the spec file)
+        fleet_size, simulation_time, coverage, edge_devices_range,
+        map_length, map_width: See SPEC_PROPERTIES; the map size is taken
+            from the normalized bbox when it is not set
+        task_rate: Tasks per minute of every application without its own rate
+        properties: Any other simulation_parameters.properties values
+        device: Values of the edge device elements, e.g. {"speed": 5}
+        applications: Values per application name; a request_size list of
+            {"value": KB, "share": fraction} splits the application into one
+            application per value, with usage_percentage scaled by the share
+        variants: Lists of values per (dotted) key, e.g.
+            {"fleet_size": [5, 10], "applications.OnEdgeHealthClass.rate": [30, 60]};
+            one scenario is built for every combination
+    """
+    with open(spec_path, 'r') as f:
+        spec = json.load(f)
+    spec.setdefault('name', os.path.splitext(os.path.basename(spec_path))[0])
+    return spec
+
+def set_dotted(spec, key, value):
+    """Sets spec['a']['b'] for the key 'a.b', creating the missing levels"""
+    *parents, last = key.split('.')
+    for parent in parents:
+        spec = spec.setdefault(parent, {})
+    spec[last] = value
+
+def _name_part(value):
+    # Only characters that are safe in folder names
+    return re.sub(r'[^A-Za-z0-9_.-]+', '-', str(value)).strip('-')
+
+def expand_variants(spec):
+    """
+    Expands the variants of a spec
+
+    Returns:
+        List of (scenario name, spec without variants), one per combination
+    """
+    base = {key: value for key, value in spec.items() if key != 'variants'}
+    variants = spec.get('variants') or {}
+    if not variants:
+        return [(_name_part(base['name']), base)]
+
+    keys = list(variants)
+    scenarios = []
+    for values in itertools.product(*(variants[key] for key in keys)):
+        scenario = copy.deepcopy(base)
+        parts = [_name_part(base['name'])]
+        for key, value in zip(keys, values):
+            set_dotted(scenario, key, value)
+            parts.append(f"{_name_part(key.split('.')[-1])}{_name_part(value)}")
+        scenarios.append(('_'.join(parts), scenario))
+    return scenarios
+
+def format_property(value):
+    """Formats a value the way the .properties files write it"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (list, tuple)):
+        return ','.join(str(item) for item in value)
+    return str(value)
+
+def write_properties(base_path, output_path, values):
+    """
+    Writes a copy of a .properties file with some values replaced, keeping
+    its comments and order; keys that are not in the file are appended
+
+    Args:
+        base_path: Properties file to start from
+        output_path: Properties file to write
+        values: Dictionary with the new values
+    """
+    remaining = dict(values)
+    line = '\n'
+    with open(base_path, 'r', encoding='utf-8') as base, open(output_path, 'w', encoding='utf-8') as output:
+        for line in base:
+            stripped = line.strip()
+            if stripped and not stripped.startswith(('#', '!')) and '=' in stripped:
+                key, value = line.split('=', 1)
+                if key.strip() in remaining:
+                    # Same spacing around '=' as the original line
+                    space = ' ' if value.startswith(' ') else ''
+                    line = f"{key}={space}{format_property(remaining.pop(key.strip()))}\n"
+            output.write(line)
+        if remaining:
+            output.write('\n' if line.endswith('\n') else '\n\n')
+            output.write('# Scenario values\n')
+            for key, value in remaining.items():
+                output.write(f"{key}={format_property(value)}\n")
+
+def scenario_properties(spec):
+    """Collects the simulation properties set by a spec"""
+    values = {}
+    for key, properties in SPEC_PROPERTIES.items():
+        if spec.get(key) is not None:
+            for name in properties:
+                values[name] = spec[key]
+    values.update(spec.get('properties', {}))
+    return values
+
+def map_extent(generated_dir, datacenters_path):
+    """
+    Largest normalized x and y of the MV network and the edge datacenters
+
+    Args:
+        generated_dir: Generated_Files folder with mv_graph (or mv_nodes_info.csv)
+        datacenters_path: edge_datacenters.xml of the scenario
+
+    Returns:
+        Array (2,) with the largest x and y, None if there are no positions
+    """
+    positions = []
+
+    graph_dir = os.path.join(generated_dir, MV_GRAPH_DIRNAME)
+    nodes_csv = os.path.join(generated_dir, 'mv_nodes_info.csv')
+    if os.path.isdir(graph_dir):
+        positions.append(np.asarray(load_mv_graph(graph_dir)['normalized_coordinates']).reshape(-1, 2))
+    elif os.path.exists(nodes_csv):
+        with open(nodes_csv, 'r') as csvfile:
+            coordinates = [row['normalized_coordinates'].strip('[]').split(',') for row in csv.DictReader(csvfile)]
+        positions.append(np.array(coordinates, dtype=float).reshape(-1, 2))
+
+    # The datacenters are streamed, the file can hold many of them
+    if os.path.exists(datacenters_path):
+        location = []
+        for _, element in ET.iterparse(datacenters_path):
+            if element.tag in ('x_pos', 'y_pos'):
+                location.append(float(element.text))
+            elif element.tag == 'datacenter':
+                element.clear()
+        positions.append(np.array(location, dtype=float).reshape(-1, 2))
+
+    positions = [array for array in positions if len(array)]
+    if not positions:
+        return None
+    return np.concatenate(positions).max(axis=0)
+
+def map_size(extent, padding=MAP_PADDING_M, rounding=MAP_ROUNDING_M):
+    """Map length and width (meters) that hold the extent plus the padding"""
+    return tuple(int(math.ceil((value + padding) / rounding) * rounding) for value in extent)
+
+def _parse_xml(path):
+    # Keeps the comments of the hand-edited files
+    return ET.parse(path, parser=ET.XMLParser(target=ET.TreeBuilder(insert_comments=True)))
+
+def _write_xml(tree, output_path):
+    tree.write(output_path, encoding='utf-8', xml_declaration=True)
+
+def _set_child(element, tag, value):
+    """Sets the text of a child element, adding the child if it is missing"""
+    child = element.find(tag)
+    if child is None:
+        # Same indentation as the last child
+        last = element[-1] if len(element) else None
+        child = ET.SubElement(element, tag)
+        if last is not None:
+            child.tail, last.tail = last.tail, (element.text or '\n')
+    child.text = format_property(value)
+
+def write_devices(base_path, output_path, device):
+    """Writes edge_devices.xml with the device values of the spec set on every device"""
+    tree = _parse_xml(base_path)
+    for element in tree.getroot().iter('device'):
+        for tag, value in device.items():
+            _set_child(element, tag, value)
+    _write_xml(tree, output_path)
+
+def write_applications(base_path, output_path, applications, task_rate=None):
+    """
+    Writes applications.xml with the application values of the spec
+
+    Args:
+        base_path: applications.xml to start from
+        output_path: applications.xml to write
+        applications: Dictionary with the values per application name
+        task_rate: Tasks per minute of the applications without their own rate
+    """
+    tree = _parse_xml(base_path)
+    root = tree.getroot()
+    known = {element.get('name') for element in root.iter('application')}
+    unknown = set(applications) - known
+    if unknown:
+        raise ValueError(f"Unknown applications in the scenario spec: {', '.join(sorted(unknown))}")
+
+    for position, element in reversed(list(enumerate(root))):
+        if element.tag != 'application':
+            continue
+        values = dict(applications.get(element.get('name'), {}))
+        if task_rate is not None:
+            values.setdefault('rate', task_rate)
+
+        request_sizes = values.pop('request_size', None)
+        for tag, value in values.items():
+            _set_child(element, tag, value)
+        if not isinstance(request_sizes, list):
+            if request_sizes is not None:
+                _set_child(element, 'request_size', request_sizes)
+            continue
+
+        # Request-size distribution: one application per size, sharing the
+        # devices of the original application
+        # PureEdgeSim reads whole percentages, the cumulative shares are
+        # rounded so that the parts still add up to the original usage
+        usage = float(element.findtext('usage_percentage', '100'))
+        total_share = sum(size['share'] for size in request_sizes)
+        # Whitespace in front of the application, for the parts after the first
+        indent = root[position - 1].tail if position else root.text
+        parts = []
+        cumulative_share = 0
+        previous_usage = 0
+        for k, size in enumerate(request_sizes):
+            cumulative_share += size['share']
+            part_usage = round(usage * cumulative_share / total_share)
+            if part_usage == previous_usage:
+                raise ValueError(f"The request_size share {size['share']} of {element.get('name')} "
+                                 f"is below one percent of its devices")
+            part = copy.deepcopy(element)
+            if k > 0:
+                part.set('name', f"{element.get('name')}_{k}")
+            _set_child(part, 'request_size', size['value'])
+            _set_child(part, 'usage_percentage', part_usage - previous_usage)
+            previous_usage = part_usage
+            parts.append(part)
+        for part in parts[:-1]:
+            part.tail = indent
+        root[position:position + 1] = parts
+
+    _write_xml(tree, output_path)
+
+def _relative_to_pureedgesim(path):
+    # The simulation runs from the PureEdgeSim folder
+    relative = os.path.relpath(path, PUREEDGESIM_DIR)
+    return path if relative.startswith('..') else relative
+
+def build_scenario(name, spec, base_dir, scenarios_dir, generated_dir):
+    """
+    Writes the settings folder of one scenario
+
+    Returns:
+        Manifest entry with the folders, values and run command of the scenario
+    """
+    scenario_dir = os.path.join(scenarios_dir, name)
+    settings_dir = os.path.join(scenario_dir, SCENARIO_SETTINGS_DIRNAME)
+    output_dir = os.path.join(scenario_dir, SCENARIO_OUTPUT_DIRNAME)
+    os.makedirs(settings_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Settings that the spec does not change (cloud.xml, edge_datacenters.xml, ...)
+    generated = {PROPERTIES_FILENAME, DEVICES_FILENAME, APPLICATIONS_FILENAME}
+    for filename in sorted(os.listdir(base_dir)):
+        source = os.path.join(base_dir, filename)
+        if filename not in generated and os.path.isfile(source):
+            shutil.copy2(source, os.path.join(settings_dir, filename))
+
+    properties = scenario_properties(spec)
+    if 'length' not in properties or 'width' not in properties:
+        extent = map_extent(generated_dir, os.path.join(settings_dir, DATACENTERS_FILENAME))
+        if extent is not None:
+            length, width = map_size(extent)
+            properties.setdefault('length', length)
+            properties.setdefault('width', width)
+
+    write_properties(os.path.join(base_dir, PROPERTIES_FILENAME),
+                     os.path.join(settings_dir, PROPERTIES_FILENAME), properties)
+    write_devices(os.path.join(base_dir, DEVICES_FILENAME),
+                  os.path.join(settings_dir, DEVICES_FILENAME), spec.get('device', {}))
+    write_applications(os.path.join(base_dir, APPLICATIONS_FILENAME),
+                       os.path.join(settings_dir, APPLICATIONS_FILENAME),
+                       spec.get('applications', {}), spec.get('task_rate'))
+
+    settings_arg = _relative_to_pureedgesim(settings_dir) + os.sep
+    output_arg = _relative_to_pureedgesim(output_dir) + os.sep
+    return {
+        'name': name,
+        'settings': settings_dir,
+        'output': output_dir,
+        'properties': properties,
+        'command': f'mvn exec:java -Dexec.mainClass="DroneSim.DroneSimulation" '
+                   f'-Dexec.args="{settings_arg} {output_arg}"'
+    }
+
+def build_scenarios(spec_path, base_dir=BASE_SETTINGS_DIR, scenarios_dir=SCENARIOS_DIR, generated_dir=None):
+    """
+    Builds the settings folders of all scenarios of a spec
+
+    Args:
+        spec_path: JSON scenario spec, see load_spec
+        base_dir: Settings folder the scenarios start from
+        scenarios_dir: Folder that receives one folder per scenario
+        generated_dir: Generated_Files folder with the MV network, for the map size
+
+    Returns:
+        Path to the manifest of the scenarios
+    """
+    if generated_dir is None:
+        generated_dir = os.path.join(SCRIPT_DIR, 'Generated_Files')
+
+    spec = load_spec(spec_path)
+    scenarios = expand_variants(spec)
+    entries = [build_scenario(name, scenario, base_dir, scenarios_dir, generated_dir)
+               for name, scenario in scenarios]
+
+    manifest_path = os.path.join(scenarios_dir, SCENARIO_MANIFEST_FILENAME)
+    with open(manifest_path, 'w') as f:
+        json.dump({'spec': os.path.abspath(spec_path), 'scenarios': entries}, f, indent=2)
+
+    for entry in entries:
+        print(f"Scenario {entry['name']}: {entry['settings']}")
+    print(f"{len(entries)} scenarios written, run commands in {manifest_path}")
+    return manifest_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build PureEdgeSim settings folders from a scenario spec.')
+    parser.add_argument('spec', help='JSON scenario spec')
+    parser.add_argument('--base-settings', default=BASE_SETTINGS_DIR,
+                        help='Settings folder the scenarios start from')
+    parser.add_argument('--output-dir', default=SCENARIOS_DIR,
+                        help='Folder that receives one settings folder per scenario')
+    args = parser.parse_args()
+
+    build_scenarios(args.spec, args.base_settings, args.output_dir)
@@ -0,0 +1,120 @@
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Stages recorded by the current script, None while profiling is disabled
+_stages = None
+# Stages that are running, innermost last
+_open_stages = []
+_start_time = None
+
+def enable_profiling():
+    """Starts recording the stages of the current script"""
+    global _stages, _start_time
+    _stages = []
+    _start_time = time.perf_counter()
+    tracemalloc.start()
+
+def profiling_enabled():
+    return _stages is not None
+
+def _max_rss_mb():
+    """Peak resident set size of the process in MB"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(max_rss / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 2)
+
+def _children_cpu_time():
+    times = os.times()
+    return times.children_user + times.children_system
+
+@contextlib.contextmanager
+def stage(name, category):
+    """
+    Records the wall time, CPU time and memory of a block of code.
+    Does nothing unless enable_profiling() was called.
+
+    Args:
+        name: Name of the stage, e.g. 'extract_mv_data'
+        category: Logical stage (load, extract, project, filter, export, plot, compute)
+    """
+    if _stages is None:
+        yield
+        return
+
+    # The tracemalloc peak is reset for every stage, so the peak reached
+    # so far is handed to the enclosing stage first
+    if _open_stages:
+        _open_stages[-1]['peak'] = max(_open_stages[-1]['peak'], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+
+    current = {'peak': 0}
+    _open_stages.append(current)
+    start_memory = tracemalloc.get_traced_memory()[0]
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    start_children_cpu = _children_cpu_time()
+    try:
+        yield
+    finally:
+        wall_time = time.perf_counter() - start_wall
+        cpu_time = time.process_time() - start_cpu
+        children_cpu_time = _children_cpu_time() - start_children_cpu
+        end_memory, peak = tracemalloc.get_traced_memory()
+        peak = max(current['peak'], peak)
+
+        _open_stages.pop()
+        if _open_stages:
+            _open_stages[-1]['peak'] = max(_open_stages[-1]['peak'], peak)
+
+        _stages.append({
+            'name': name,
+            'category': category,
+            'depth': len(_open_stages),
+            'wall_time_s': round(wall_time, 4),
+            'cpu_time_s': round(cpu_time, 4),
+            'children_cpu_time_s': round(children_cpu_time, 4),
+            'python_peak_mb': round(peak / (1 << 20), 2),
+            'python_retained_mb': round((end_memory - start_memory) / (1 << 20), 2),
+            'max_rss_mb': _max_rss_mb()
+        })
+
+def save_profile(script_name, output_dir):
+    """
+    Saves the recorded stages as profile_<script_name>.json
+
+    Args:
+        script_name: Name of the profiled script
+        output_dir: Folder of the profile file
+
+    Returns:
+        Path to the profile file, None if profiling is disabled
+    """
+    if _stages is None:
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    profile_path = os.path.join(output_dir, f"profile_{script_name}.json")
+    profile = {
+        'script': script_name,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'total_wall_time_s': round(time.perf_counter() - _start_time, 4),
+        'total_cpu_time_s': round(time.process_time(), 4),
+        'max_rss_mb': _max_rss_mb(),
+        'stages': _stages
+    }
+    with open(profile_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+    print(f"Profile saved to: {profile_path}")
+    return profile_path
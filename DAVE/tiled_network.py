@@ -0,0 +1,255 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import projection
+from fixture_store import FIXTURE_MODES, set_fixture_mode
+from mv_data_stream import stream_mv_data
+from tower_ingest import spatial_hash_groups
+
+# Side of the square tiles in km
+TILE_KM = 2
+# Width of the band shared by neighboring tiles, so that lines crossing
+# a tile border are complete in at least one tile
+TILE_OVERLAP_M = 200
+# Buses of different tiles closer than this are the same bus
+BUS_MERGE_RADIUS_M = 1
+
+# Stitched dataset, written in the output folder for 2_ProcessNetworkData.py
+TILED_JSON_FILENAME = 'tiled_dave_dataset.json'
+
+def split_into_tiles(bbox, tile_km=TILE_KM, overlap_m=TILE_OVERLAP_M):
+    """
+    Splits an area into a grid of overlapping square tiles
+
+    Args:
+        bbox: Dictionary with min_lat, max_lat, min_lon, max_lon of the area
+        tile_km: Side of the tiles in km
+        overlap_m: Width of the band shared by neighboring tiles in meters
+
+    Returns:
+        List of tile dictionaries with name, row, col and bbox
+    """
+    (min_x, min_y), (max_x, max_y) = projection.project([[bbox['min_lon'], bbox['min_lat']],
+                                                          [bbox['max_lon'], bbox['max_lat']]])
+    tile_m = tile_km * 1000
+    rows = max(1, int(np.ceil((max_y - min_y) / tile_m)))
+    cols = max(1, int(np.ceil((max_x - min_x) / tile_m)))
+
+    tiles = []
+    for row in range(rows):
+        for col in range(cols):
+            # Tile corners in meters, grown by half the overlap on every side
+            x0 = max(min_x, min_x + col * tile_m - overlap_m / 2)
+            x1 = min(max_x, min_x + (col + 1) * tile_m + overlap_m / 2)
+            y0 = max(min_y, min_y + row * tile_m - overlap_m / 2)
+            y1 = min(max_y, min_y + (row + 1) * tile_m + overlap_m / 2)
+
+            corners = projection.unproject([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+            tiles.append({
+                'name': f"tile_{row}_{col}",
+                'row': row,
+                'col': col,
+                'bbox': {
+                    'min_lat': float(corners[:, 1].min()),
+                    'max_lat': float(corners[:, 1].max()),
+                    'min_lon': float(corners[:, 0].min()),
+                    'max_lon': float(corners[:, 0].max())
+                }
+            })
+
+    return tiles
+
+def build_tile(tile, tiles_dir, use_cache=True):
+    """
+    Runs the grid extraction for one tile and extracts its MV network
+
+    Args:
+        tile: Tile dictionary, as created by split_into_tiles
+        tiles_dir: Folder with one subfolder per tile
+        use_cache: False to run DAVE even if the grid of the tile is cached
+
+    Returns:
+        Tuple (tile name, nodes GeoJSON, lines GeoJSON), with None for
+        both GeoJSONs if DAVE created no dataset for the tile
+    """
+    # Step 1 imports DAVE, so it is only loaded in the worker processes
+    city_network = importlib.import_module('1_city_network')
+
+    tile_dir = os.path.join(tiles_dir, tile['name'])
+    os.makedirs(tile_dir, exist_ok=True)
+
+    # The tile folders are shared by all runs; the grid of a tile is reused
+    # through the build cache, which is keyed by the content of its GeoJSON
+    geojson_path = os.path.join(tile_dir, f"{tile['name']}.geojson")
+    with open(geojson_path, 'w') as f:
+        json.dump(city_network.bbox_geojson(tile['name'], tile['bbox']), f)
+
+    dataset_path = city_network.create_dave_network(geojson_path, tile_dir, use_cache)
+    if dataset_path is None:
+        print(f"No DAVE dataset was created for {tile['name']}")
+        return tile['name'], None, None
+
+    nodes_data, lines_data = stream_mv_data(dataset_path)
+    print(f"{tile['name']}: {len(nodes_data.get('features', []))} MV nodes, "
+          f"{len(lines_data.get('features', []))} MV lines")
+    return tile['name'], nodes_data, lines_data
+
+def _build_tile(args):
+    return build_tile(*args)
+
+def build_tiles(tiles, tiles_dir, max_workers=None, use_cache=True):
+    """
+    Runs build_tile for all tiles in a process pool
+
+    Returns:
+        List of (tile name, nodes GeoJSON, lines GeoJSON), in the order of the tiles
+    """
+    jobs = [(tile, tiles_dir, use_cache) for tile in tiles]
+    workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [_build_tile(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_build_tile, jobs))
+
+def stitch_tiles(tile_results, merge_radius=BUS_MERGE_RADIUS_M):
+    """
+    Stitches the MV networks of the tiles into one network. Buses found by
+    several tiles (in the overlap bands) are merged into one bus, and lines
+    found by several tiles are kept once.
+
+    Args:
+        tile_results: List of (tile name, nodes GeoJSON, lines GeoJSON)
+        merge_radius: Buses of different tiles closer than this (meters) are merged
+
+    Returns:
+        Tuple (nodes GeoJSON, lines GeoJSON) of the stitched network, with
+        bus names numbered anew over the whole area
+    """
+    node_features = []
+    node_keys = []
+    for tile_name, nodes_data, _ in tile_results:
+        for feature in nodes_data.get('features', []):
+            node_features.append(feature)
+            node_keys.append((tile_name, feature.get('properties', {}).get('dave_name', '')))
+
+    coordinates = [feature.get('geometry', {}).get('coordinates', [0, 0])[:2] for feature in node_features]
+    groups = spatial_hash_groups(projection.project(coordinates), merge_radius)
+
+    # One bus per group, named after the first member with a new number
+    stitched_nodes = []
+    bus_names = {}
+    group_names = {}
+    for feature, key, group in zip(node_features, node_keys, groups.tolist()):
+        if group not in group_names:
+            prefix = key[1].rsplit('_', 1)[0] if '_' in key[1] else 'node'
+            group_names[group] = f"{prefix}_{group}"
+            properties = dict(feature.get('properties', {}), dave_name=group_names[group], tile=key[0])
+            stitched_nodes.append(dict(feature, properties=properties))
+        bus_names[key] = group_names[group]
+
+    # Lines with both buses known; a bus pair already found by another tile is skipped
+    stitched_lines = []
+    pair_tiles = {}
+    for tile_name, _, lines_data in tile_results:
+        for feature in lines_data.get('features', []):
+            properties = feature.get('properties', {})
+            from_bus = bus_names.get((tile_name, properties.get('from_bus', '')))
+            to_bus = bus_names.get((tile_name, properties.get('to_bus', '')))
+            if from_bus is None or to_bus is None:
+                continue
+
+            pair = tuple(sorted((from_bus, to_bus)))
+            if pair_tiles.setdefault(pair, tile_name) != tile_name:
+                continue
+
+            properties = dict(properties, from_bus=from_bus, to_bus=to_bus, tile=tile_name)
+            stitched_lines.append(dict(feature, properties=properties))
+
+    return ({'type': 'FeatureCollection', 'features': stitched_nodes},
+            {'type': 'FeatureCollection', 'features': stitched_lines})
+
+def save_mv_dataset(nodes_data, lines_data, output_path):
+    """
+    Saves an MV network in the layout of a DAVE dataset export, so that
+    2_ProcessNetworkData.py reads it like the output of a single run
+    """
+    dataset = {
+        '_module': 'dave_core.dave_structure',
+        '_class': 'davestructure',
+        '_object': {
+            'mv_data': {
+                '_module': 'dave_core.dave_structure',
+                '_class': 'davestructure',
+                '_object': {
+                    'mv_nodes': {'_module': 'geopandas.geodataframe', '_class': 'GeoDataFrame',
+                                 '_object': json.dumps(nodes_data)},
+                    'mv_lines': {'_module': 'geopandas.geodataframe', '_class': 'GeoDataFrame',
+                                 '_object': json.dumps(lines_data)}
+                }
+            }
+        }
+    }
+    with open(output_path, 'w') as f:
+        json.dump(dataset, f)
+    return output_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the MV network of a large area tile by tile.')
+    parser.add_argument('city', help='City name to geocode')
+    parser.add_argument('--size-km', type=float, default=10,
+                        help='Distance from the city center to each side of the area in km')
+    parser.add_argument('--tile-km', type=float, default=TILE_KM, help='Side of the tiles in km')
+    parser.add_argument('--overlap-m', type=float, default=TILE_OVERLAP_M,
+                        help='Width of the band shared by neighboring tiles in meters')
+    parser.add_argument('--workers', type=int, default=None, help='Number of tiles processed in parallel')
+    parser.add_argument('--skip-processing', action='store_true',
+                        help='Only write the stitched dataset, without running 2_ProcessNetworkData')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Geocode the city and run DAVE for every tile even if the results are cached in DAVE/.cache')
+    parser.add_argument('--fixtures', choices=FIXTURE_MODES, default=None,
+                        help='record: store the geocode and DAVE responses in DAVE/fixtures; '
+                             'replay: use the stored responses instead of the network')
+    args = parser.parse_args()
+    use_cache = not args.no_cache
+
+    # The mode is kept in the environment, so the tile workers use it too
+    if args.fixtures:
+        set_fixture_mode(args.fixtures)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.join(script_dir, 'output')
+    tiles_dir = os.path.join(output_dir, 'tiles')
+    os.makedirs(tiles_dir, exist_ok=True)
+
+    # Same geocode (cached and recorded) and bounding box as a single run of step 1
+    city_network = importlib.import_module('1_city_network')
+    print(f"Finding coordinates for {args.city}...")
+    center_lat, center_lon = city_network.geocode_city(args.city, use_cache)
+    bbox = city_network.area_bbox(center_lat, center_lon, args.size_km)
+    tiles = split_into_tiles(bbox, args.tile_km, args.overlap_m)
+    print(f"Processing {len(tiles)} tiles of {args.tile_km} km with {args.overlap_m} m overlap")
+
+    tile_results = build_tiles(tiles, tiles_dir, args.workers, use_cache)
+    # A missing tile would leave a hole in the stitched network
+    missing = [name for name, nodes_data, _ in tile_results if nodes_data is None]
+    if missing:
+        print(f"No MV network for {len(missing)} of {len(tiles)} tiles: {', '.join(missing)}")
+        sys.exit(1)
+
+    nodes_data, lines_data = stitch_tiles(tile_results)
+    print(f"Stitched network: {len(nodes_data['features'])} MV nodes, {len(lines_data['features'])} MV lines")
+
+    dataset_path = save_mv_dataset(nodes_data, lines_data, os.path.join(output_dir, TILED_JSON_FILENAME))
+    print(f"Stitched dataset saved as: {dataset_path}")
+
+    # One normalized coordinate frame for the whole area
+    if not args.skip_processing:
+        importlib.import_module('2_ProcessNetworkData').main(json_filename=TILED_JSON_FILENAME, use_cache=use_cache)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import csv
+import os
+import numpy as np
+from scipy.spatial import cKDTree
+from mv_graph_store import nodes_dict_to_arrays
+
+# Simulation settings that hold the coverage radius of the edge datacenters
+SIMULATION_PARAMETERS_FILE = os.path.join('PureEdgeSim', 'DroneSim', 'Drone_settings', 'simulation_parameters.properties')
+# Used when the settings file or the property is missing (meters)
+DEFAULT_COVERAGE_M = 800
+
+ASSOCIATION_FIELDS = ['element', 'id', 'x', 'y', 'nearest_gnb', 'nearest_distance', 'gnbs_in_coverage']
+
+def read_properties(file_path):
+    """Reads a Java .properties file into a dictionary"""
+    properties = {}
+    with open(file_path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith(('#', '!')) or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            properties[key.strip()] = value.strip()
+    return properties
+
+def coverage_radius(properties_path):
+    """Returns edge_datacenters_coverage of the simulation settings, in meters"""
+    try:
+        return float(read_properties(properties_path)['edge_datacenters_coverage'])
+    except (OSError, KeyError, ValueError):
+        print(f"edge_datacenters_coverage not found in {properties_path}, using {DEFAULT_COVERAGE_M} m")
+        return float(DEFAULT_COVERAGE_M)
+
+def associate_points(points, tower_points, radius):
+    """
+    Finds the nearest tower of each point and counts the towers within radius
+
+    Args:
+        points: Array (N, 2) with normalized coordinates
+        tower_points: Array (T, 2) with normalized tower coordinates
+        radius: Coverage radius in the units of the coordinates (meters)
+
+    Returns:
+        Tuple (nearest tower index, distance to it, number of towers within radius),
+        each an array (N,)
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    tree = cKDTree(np.asarray(tower_points, dtype=float).reshape(-1, 2))
+
+    distances, nearest = tree.query(points, k=1)
+    in_coverage = tree.query_ball_point(points, r=radius, return_length=True)
+    return nearest, distances, np.asarray(in_coverage, dtype=np.int64).reshape(-1)
+
+def build_association_table(nodes_dict, gnb_dict, radius):
+    """
+    Associates every MV bus and every MV edge (at its midpoint) with the GNBs
+
+    Args:
+        nodes_dict: Dictionary with MV node data, as created by parse_nodes/parse_lines
+        gnb_dict: Dictionary with GNB data, keyed by the ids of gnb_info.csv
+        radius: Coverage radius of the GNBs in meters
+
+    Returns:
+        List of rows with the fields of ASSOCIATION_FIELDS
+    """
+    graph = nodes_dict_to_arrays(nodes_dict)
+    bus_points = graph['normalized_coordinates'].astype(float)
+    edge_points = (bus_points[graph['edges'][:, 0]] + bus_points[graph['edges'][:, 1]]) / 2
+
+    gnb_ids = list(gnb_dict)
+    tower_points = [gnb_dict[gnb_id]['normalized_coordinates'] for gnb_id in gnb_ids]
+
+    # Buses and edge midpoints are queried against the same tree in one call
+    nearest, distances, in_coverage = associate_points(np.concatenate([bus_points, edge_points]),
+                                                       tower_points, radius)
+
+    bus_numbers = graph['node_ids'].tolist()
+    element_ids = bus_numbers + [f"{bus_numbers[i]}-{bus_numbers[j]}" for i, j in graph['edges'].tolist()]
+    elements = ['bus'] * len(bus_points) + ['edge'] * len(edge_points)
+
+    rows = []
+    for element, element_id, (x, y), tower, distance, count in zip(
+            elements, element_ids, np.concatenate([bus_points, edge_points]).tolist(),
+            nearest.tolist(), distances.tolist(), in_coverage.tolist()):
+        rows.append({
+            'element': element,
+            'id': element_id,
+            'x': round(x, 1),
+            'y': round(y, 1),
+            'nearest_gnb': gnb_ids[tower],
+            'nearest_distance': int(distance),
+            'gnbs_in_coverage': count
+        })
+
+    return rows
+
+def save_association_csv(rows, output_path):
+    """Saves the bus/edge to GNB association table"""
+    with open(output_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=ASSOCIATION_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
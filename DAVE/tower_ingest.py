@@ -0,0 +1,151 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Columns of the tower table
+TOWER_COLUMNS = ['lon', 'lat', 'type', 'technology', 'operator']
+
+# Preference order when co-sited entries disagree
+TECHNOLOGY_RANK = {'5G': 2, '4G': 1}
+TOWER_TYPE_RANK = {'MACRO': 4, 'MICRO': 3, 'DAS': 2, 'PICO': 1}
+
+def load_tower_columns(gnb_file, technology, operator=''):
+    """
+    Loads the tower records of a GNB file into columnar arrays
+
+    Args:
+        gnb_file: Path to the GNB JSON file
+        technology: Technology of the towers in the file (4G or 5G)
+        operator: Name of the operator the file belongs to
+
+    Returns:
+        Dictionary with the arrays lon, lat, type, technology and operator
+    """
+    with open(gnb_file, 'r') as file:
+        records = json.load(file).get('responseData', [])
+
+    # Determine GNB type from towerAttributes, MACRO by default
+    tower_types = [(gnb.get('towerAttributes') or {}).get('TOWER_TYPE', 'MACRO') for gnb in records]
+
+    return {
+        'lon': np.fromiter((gnb.get('longitude', 0) for gnb in records), dtype=float, count=len(records)),
+        'lat': np.fromiter((gnb.get('latitude', 0) for gnb in records), dtype=float, count=len(records)),
+        'type': np.array(tower_types, dtype=object),
+        'technology': np.full(len(records), technology, dtype=object),
+        'operator': np.full(len(records), operator, dtype=object)
+    }
+
+def _load_tower_source(source):
+    return load_tower_columns(*source)
+
+def concatenate_tower_columns(columns_list):
+    """Concatenates the tower columns of several GNB files into one table"""
+    if not columns_list:
+        return {key: np.empty(0, dtype=float if key in ('lon', 'lat') else object) for key in TOWER_COLUMNS}
+    return {key: np.concatenate([columns[key] for columns in columns_list]) for key in TOWER_COLUMNS}
+
+def ingest_tower_sources(sources, max_workers=None):
+    """
+    Parses any number of operator/technology GNB files concurrently
+    in a process pool and merges them into one tower table
+
+    Args:
+        sources: List of (path, technology, operator) tuples; missing files are skipped
+        max_workers: Maximum number of worker processes (default: one per CPU)
+
+    Returns:
+        Dictionary with the concatenated tower columns, in the order of the sources
+    """
+    sources = [tuple(source) for source in sources if os.path.exists(source[0])]
+    for path, technology, operator in sources:
+        print(f"Reading {technology} data of {operator or 'unknown operator'} from {path}")
+
+    workers = min(len(sources), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        columns_list = [_load_tower_source(source) for source in sources]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            columns_list = list(executor.map(_load_tower_source, sources))
+
+    return concatenate_tower_columns(columns_list)
+
+def spatial_hash_groups(points, radius):
+    """
+    Groups points that lie within radius of a group representative,
+    using a grid hash with cells of the size of the radius
+
+    Args:
+        points: Array (N, 2) with projected coordinates in meters
+        radius: Merge radius in meters
+
+    Returns:
+        Integer array (N,) with the group of each point; groups are numbered
+        in order of their first point
+    """
+    groups = np.arange(len(points))
+    if radius <= 0 or len(points) == 0:
+        return groups
+
+    cells = np.floor(points / radius).astype(np.int64).tolist()
+    grid = {}            # Cell -> representatives (point indices) in that cell
+    group_ids = {}       # Representative -> group number
+
+    for i, (cell_x, cell_y) in enumerate(cells):
+        group = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for representative in grid.get((cell_x + dx, cell_y + dy), ()):
+                    if np.hypot(*(points[i] - points[representative])) <= radius:
+                        group = group_ids[representative]
+                        break
+                if group is not None:
+                    break
+            if group is not None:
+                break
+
+        if group is None:
+            group = len(group_ids)
+            group_ids[i] = group
+            grid.setdefault((cell_x, cell_y), []).append(i)
+        groups[i] = group
+
+    return groups
+
+def deduplicate_co_sited(towers, points, radius):
+    """
+    Merges co-sited towers (e.g. the 4G and 5G entries of the same mast)
+    into one entry per site
+
+    Args:
+        towers: Dictionary with the tower columns
+        points: Array (N, 2) with the projected tower positions in meters
+        radius: Merge radius in meters, 0 disables the merging
+
+    Returns:
+        Tuple (towers, kept) with the merged tower columns, which gain the
+        columns technologies and operators, and the indices of the kept entries
+    """
+    groups = spatial_hash_groups(points, radius)
+    _, kept = np.unique(groups, return_index=True)
+
+    members = {}
+    for i, group in enumerate(groups.tolist()):
+        members.setdefault(group, []).append(i)
+
+    merged = {key: values[kept].copy() for key, values in towers.items()}
+    merged['technologies'] = np.empty(len(kept), dtype=object)
+    merged['operators'] = np.empty(len(kept), dtype=object)
+
+    for row, group in enumerate(groups[kept].tolist()):
+        indices = members[group]
+        technologies = sorted(set(towers['technology'][indices]), key=lambda t: TECHNOLOGY_RANK.get(t, 0))
+        operators = sorted(set(towers['operator'][indices]))
+
+        # The site keeps the most capable technology and tower type of its entries
+        merged['technology'][row] = technologies[-1]
+        merged['type'][row] = max(towers['type'][indices], key=lambda t: TOWER_TYPE_RANK.get(t, 0))
+        merged['technologies'][row] = '/'.join(technologies)
+        merged['operators'][row] = '/'.join(operator for operator in operators if operator)
+
+    return merged, kept
@@ -0,0 +1,170 @@
+import networkx as nx
+
+# Number of partial paths the search inside one meshed part of the grid may
+# extend; larger meshes fall back to the shortest paths for the rest
+WORST_PATH_SEARCH_LIMIT = 200000
+
+def find_leaf_nodes(G, start_node=None):
+    """Find all leaf nodes in the graph (nodes with only one connection), except the start node."""
+    return [node for node in G.nodes() if G.degree(node) == 1 and node != start_node]
+
+def _tree_distances(G, start_node):
+    """
+    Distance and parent of every node of a radial (tree) graph, in one
+    traversal from the start node
+
+    Returns:
+        Tuple (distances, parents) dictionaries
+    """
+    distances = {start_node: 0}
+    parents = {start_node: None}
+    stack = [start_node]
+    while stack:
+        node = stack.pop()
+        for neighbor, data in G[node].items():
+            if neighbor not in distances:
+                distances[neighbor] = distances[node] + data['weight']
+                parents[neighbor] = node
+                stack.append(neighbor)
+    return distances, parents
+
+def _longest_block_paths(block, entry, search_limit):
+    """
+    Longest simple path inside one biconnected block from its entry node to
+    every other node of the block
+
+    The simple paths are enumerated depth-first until search_limit partial
+    paths were extended; nodes whose longest path was not found by then
+    keep the longer of the paths found so far and their shortest path.
+
+    Returns:
+        Tuple (weights, paths, complete) with the weight and node list per
+        node, and whether the search finished within the limit
+    """
+    weights = {}
+    paths = {}
+
+    # Shortest paths first: every node is reached even if the search stops early
+    shortest_weights, shortest_paths = nx.single_source_dijkstra(block, entry, weight='weight')
+    for node, weight in shortest_weights.items():
+        if node != entry:
+            weights[node] = weight
+            paths[node] = shortest_paths[node]
+
+    # Blocks with two nodes are single lines, the shortest path is the only one
+    if block.number_of_nodes() <= 2:
+        return weights, paths, True
+
+    path = [entry]
+    path_weights = [0]
+    visited = {entry}
+    stack = [iter(block[entry].items())]
+    expansions = 0
+    while stack:
+        neighbor_data = next(stack[-1], None)
+        if neighbor_data is None:
+            # All extensions of the current path are done
+            stack.pop()
+            visited.discard(path.pop())
+            path_weights.pop()
+            continue
+        neighbor, data = neighbor_data
+        if neighbor in visited:
+            continue
+        expansions += 1
+        if expansions > search_limit:
+            return weights, paths, False
+        path.append(neighbor)
+        path_weights.append(path_weights[-1] + data['weight'])
+        visited.add(neighbor)
+        stack.append(iter(block[neighbor].items()))
+        if path_weights[-1] > weights[neighbor]:
+            weights[neighbor] = path_weights[-1]
+            paths[neighbor] = list(path)
+    return weights, paths, True
+
+def _block_distances(G, start_node, search_limit):
+    """
+    Longest simple path distance from the start node to every node of a
+    connected meshed graph, over its block-cut tree
+
+    Returns:
+        Tuple (distances, parents); the parent of a node is its parent
+        node, or the node list of the path inside a block that ends at it
+    """
+    node_blocks = {}
+    for block_nodes in nx.biconnected_components(G):
+        for node in block_nodes:
+            node_blocks.setdefault(node, []).append(block_nodes)
+
+    distances = {start_node: 0}
+    parents = {start_node: None}
+    entered = set()
+    stack = [start_node]
+    truncated = 0
+    while stack:
+        entry = stack.pop()
+        for block_nodes in node_blocks[entry]:
+            block_id = id(block_nodes)
+            if block_id in entered:
+                continue
+            entered.add(block_id)
+            # Every other node of the block is only reachable through this entry
+            weights, paths, complete = _longest_block_paths(G.subgraph(block_nodes).copy(), entry, search_limit)
+            truncated += not complete
+            for node, weight in weights.items():
+                distances[node] = distances[entry] + weight
+                parents[node] = paths[node] if len(paths[node]) > 2 else entry
+                stack.append(node)
+
+    if truncated:
+        print(f"Warning: the worst path search stopped after {search_limit} paths in {truncated} meshed blocks, "
+              f"the worst path may be longer")
+    return distances, parents
+
+def worst_path_to_leaves(G, start_node, search_limit=WORST_PATH_SEARCH_LIMIT):
+    """
+    Finds the heaviest simple path from the start node to a leaf node
+
+    Radial grids have a single path to every leaf, found by one traversal
+    (tree DP). Meshed grids are split into their biconnected blocks: a
+    simple path crosses every block between two of its cut nodes, so the
+    longest path only needs to be searched inside each block, with the
+    search bounded by search_limit per block.
+
+    Args:
+        G: Graph with 'weight' edge attributes
+        start_node: Node the paths start from
+        search_limit: Partial paths the search may extend per meshed block
+
+    Returns:
+        Tuple (path, weight), None if no leaf node is reachable
+    """
+    nodes = nx.node_connected_component(G, start_node)
+    # Subgraph views are slow to traverse, the component is copied
+    component = G if len(nodes) == G.number_of_nodes() else G.subgraph(nodes).copy()
+    leaves = find_leaf_nodes(component, start_node)
+    if not leaves:
+        return None
+
+    if component.number_of_edges() == component.number_of_nodes() - 1:
+        distances, parents = _tree_distances(component, start_node)
+    else:
+        distances, parents = _block_distances(component, start_node, search_limit)
+
+    # First heaviest leaf in node order, as with the full enumeration
+    worst_leaf = leaves[0]
+    for leaf in leaves[1:]:
+        if distances[leaf] > distances[worst_leaf]:
+            worst_leaf = leaf
+
+    # Walk back to the start node; parents of block nodes are whole block paths
+    path = [worst_leaf]
+    while parents[path[-1]] is not None:
+        parent = parents[path[-1]]
+        if isinstance(parent, list):
+            path.extend(reversed(parent[:-1]))
+        else:
+            path.append(parent)
+    path.reverse()
+    return path, distances[worst_leaf]
@@ -48,7 +48,7 @@ public class DroneMobilityModel2 extends MobilityModel {
         Map<Integer, List<double[]>> coordinatesMap = new HashMap<>();
         
         try {
-            String csvFilePath = "DroneSim/drone_path.csv";
+            String csvFilePath = DroneSimulation.dronePathFile;
             System.out.println("DroneMobilityModel2: Reading coordinates from: " + csvFilePath);
             
             BufferedReader reader = new BufferedReader(new FileReader(csvFilePath));
@@ -51,7 +51,7 @@ public class DronePathCreator {
     private static void loadNumDronesFromProperties() {
         try {
             Properties properties = new Properties();
-            String propertiesFile = "DroneSim/Drone_settings/simulation_parameters.properties";
+            String propertiesFile = DroneSimulation.settingsPath + "simulation_parameters.properties";
             
             // Check if file exists
             File file = new File(propertiesFile);
@@ -651,15 +651,16 @@ public class DronePathCreator {
         loadNumDronesFromProperties();
         
         String inputFile = "DroneSim/mv_nodes_info.csv";
-        String outputCsv = "DroneSim/drone_path.csv";
+        String outputCsv = DroneSimulation.dronePathFile;
         
         // Test with absolute file paths
         String currentDir = System.getProperty("user.dir");
         System.out.println("Current working directory: " + currentDir);
         
         // Create absolute paths
-        File inputFileObj = new File(currentDir, inputFile);
-        File outputFileObj = new File(currentDir, outputCsv);
+        // (relative to the working directory; the settings folder of a scenario may be absolute)
+        File inputFileObj = new File(inputFile).getAbsoluteFile();
+        File outputFileObj = new File(outputCsv).getAbsoluteFile();
         
         // Update file paths
         inputFile = inputFileObj.getAbsolutePath();
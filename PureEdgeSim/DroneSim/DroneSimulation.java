@@ -11,9 +11,11 @@ import java.util.Arrays;
  * Main class for executing the drone simulation.
  */
 public class DroneSimulation {
-    // Define paths for settings and output folders
-    private static String settingsPath = "DroneSim/Drone_settings/";
-    private static String outputPath = "DroneSim/Drone_output/";
+    // Define paths for settings and output folders (can be set from the command line)
+    static String settingsPath = "DroneSim/Drone_settings/";
+    static String outputPath = "DroneSim/Drone_output/";
+    // Drone paths read by DroneMobilityModel2; kept in the settings folder of a scenario
+    static String dronePathFile = "DroneSim/drone_path.csv";
 
     public DroneSimulation() {
         // Create output folder if it doesn't exist
@@ -27,7 +29,7 @@ public class DroneSimulation {
         try {
             // Define parameters for DronePathCreator
             String inputFile = "DroneSim/mv_nodes_info.csv";
-            String outputCsvPath = "DroneSim/drone_path.csv";
+            String outputCsvPath = dronePathFile;
             
             // Check if input file exists
             File inputFileObj = new File(inputFile);
@@ -90,6 +92,10 @@ public class DroneSimulation {
                 // Sort by last modified date
                 Arrays.sort(folders, (a, b) -> Long.compare(b.lastModified(), a.lastModified()));
                 String latestFolder = folders[0].getName();
+                // LogAnalysis.py looks up folder names in DroneSim/Drone_output, the folders of other outputs are passed as absolute paths
+                if (!new File(outputPath).getAbsoluteFile().equals(new File("DroneSim/Drone_output/").getAbsoluteFile())) {
+                    latestFolder = folders[0].getAbsolutePath();
+                }
                 
                 // Hardcoded path for Python script
                 String pythonScript = "DroneSim/LogAnalysis.py";
@@ -101,7 +107,9 @@ public class DroneSimulation {
                 }
                 
                 // Construct the command to execute the Python script
-                String command = String.format("python3 %s %s", pythonScript, latestFolder);
+                // The settings folder is passed too, for the settings of the scenario that ran
+                String command = String.format("python3 %s %s %s", pythonScript, latestFolder,
+                        new File(settingsPath).getAbsolutePath());
                 System.out.println("Executing command: " + command);
                 
                 // Execute the command
@@ -140,8 +148,17 @@ public class DroneSimulation {
 
     /**
      * Main method to run the simulation
+     * Optional arguments: settings folder and output folder of a scenario
+     * (see DAVE/scenario_builder.py), so that several scenarios can run in parallel
      */
     public static void main(String[] args) {
+        if (args.length > 0) {
+            settingsPath = args[0].endsWith("/") ? args[0] : args[0] + "/";
+            dronePathFile = settingsPath + "drone_path.csv";
+        }
+        if (args.length > 1) {
+            outputPath = args[1].endsWith("/") ? args[1] : args[1] + "/";
+        }
         new DroneSimulation();
     }
 }
\ No newline at end of file
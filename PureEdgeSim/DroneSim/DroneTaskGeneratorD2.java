@@ -9,22 +9,22 @@ import com.mechalikh.pureedgesim.datacentersmanager.ComputingNode;
 import com.mechalikh.pureedgesim.scenariomanager.SimulationParameters;
 import com.mechalikh.pureedgesim.simulationengine.FutureQueue;
 import com.mechalikh.pureedgesim.simulationmanager.SimulationManager;
+import com.mechalikh.pureedgesim.taskgenerator.Application;
 import com.mechalikh.pureedgesim.taskgenerator.DefaultTaskGenerator;
 import com.mechalikh.pureedgesim.taskgenerator.Task;
 
 public class DroneTaskGeneratorD2 extends DefaultTaskGenerator {
     protected Random random;
-    private static final int TASKS_PER_SECOND = 15; // 15 tasks per second
     private final NormalDistribution taskLengthDistribution;
-    private final NormalDistribution requestSizeDistribution;
     
     // Parameters for normal distribution of task length
     private static final double MEAN_TASK_LENGTH = 1722.4; // MI for 53.7ms execution
     private static final double STD_DEV = 96.2; // Standard deviation for ~3ms variation
     
-    // Parameters for normal distribution of request size
-    private static final double MEAN_REQUEST_SIZE = 118; // 118KB
-    private static final double REQUEST_SIZE_STD_DEV = 63; // 63KB
+    // Parameters for normal distribution of request size: the mean is the
+    // request_size of the application, the standard deviation scales with it
+    private static final double REQUEST_SIZE_VARIATION = 63.0 / 118.0; // 63KB for 118KB requests
+    private static final double BITS_PER_KB = 8000; // Request sizes of applications.xml are parsed with 8000 bits per KB
     
     public DroneTaskGeneratorD2(SimulationManager simulationManager) {
         super(simulationManager);
@@ -36,7 +36,6 @@ public class DroneTaskGeneratorD2 extends DefaultTaskGenerator {
         
         // Initialize normal distributions
         taskLengthDistribution = new NormalDistribution(MEAN_TASK_LENGTH, STD_DEV);
-        requestSizeDistribution = new NormalDistribution(MEAN_REQUEST_SIZE, REQUEST_SIZE_STD_DEV);
     }
     
     @Override
@@ -50,29 +49,55 @@ public class DroneTaskGeneratorD2 extends DefaultTaskGenerator {
             return taskList;
         }
         
-        double simulationTime = SimulationParameters.simulationDuration;
-        int totalSeconds = (int) simulationTime;
+        int devicesCount = devicesList.size();
+        int appsCount = SimulationParameters.applicationList.size();
         
-        // For each device (drone)
-        for (ComputingNode drone : devicesList) {
-            // For each second of the simulation
-            for (int second = 0; second < totalSeconds; second++) {
-                // Generate 15 tasks per second
-                for (int i = 0; i < TASKS_PER_SECOND; i++) {
-                    // Calculate exact time with equal intervals within the second
-                    double taskTime = second + (i * (1.0 / TASKS_PER_SECOND));
-                    
-                    // Create task with size from normal distribution
-                    long taskLength = (long) Math.max(1000, taskLengthDistribution.sample());
-                    long requestSize = (long) Math.max(1, requestSizeDistribution.sample()); // Minimum 1KB
-                    insertTask(taskTime, 0, drone, taskLength, requestSize * 8192); // Convert to bits
-                }
+        // Share the devices among the applications by their usage percentage,
+        // rounding the cumulative shares so that split applications cover the
+        // same devices as the original one
+        double cumulativeUsage = 0;
+        int assigned = 0;
+        for (int app = 0; app < appsCount && !devicesList.isEmpty(); app++) {
+            cumulativeUsage += SimulationParameters.applicationList.get(app).getUsagePercentage();
+            int target = (int) Math.round(Math.min(cumulativeUsage, 100) * devicesCount / 100);
+            for (; assigned < target; assigned++) {
+                ComputingNode drone = devicesList.remove(random.nextInt(devicesList.size()));
+                drone.setApplicationType(app);
+                generateTasksForDrone(drone, app);
             }
         }
         
+        // Devices left by usage percentages below 100 run the last application
+        for (ComputingNode drone : devicesList) {
+            drone.setApplicationType(appsCount - 1);
+            generateTasksForDrone(drone, appsCount - 1);
+        }
+        
         return taskList;
     }
     
+    protected void generateTasksForDrone(ComputingNode drone, int appId) {
+        Application app = SimulationParameters.applicationList.get(appId);
+        
+        // The rate of the application is in tasks per minute
+        double interval = 60.0 / app.getRate();
+        int tasksCount = (int) (SimulationParameters.simulationDuration / interval);
+        
+        double meanRequestSize = app.getRequestSize() / BITS_PER_KB;
+        NormalDistribution requestSizeDistribution = new NormalDistribution(meanRequestSize,
+                meanRequestSize * REQUEST_SIZE_VARIATION);
+        
+        for (int i = 0; i < tasksCount; i++) {
+            // Tasks at equal intervals
+            double taskTime = i * interval;
+            
+            // Create task with size from normal distribution
+            long taskLength = (long) Math.max(1000, taskLengthDistribution.sample());
+            long requestSize = (long) Math.max(1, requestSizeDistribution.sample()); // Minimum 1KB
+            insertTask(taskTime, appId, drone, taskLength, requestSize * 8192); // Convert to bits
+        }
+    }
+    
     protected void insertTask(double time, int appId, ComputingNode device, long taskLength, long requestSize) {
         if (time > SimulationParameters.simulationDuration) {
             time = SimulationParameters.simulationDuration - 0.1;
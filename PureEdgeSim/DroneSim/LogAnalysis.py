@@ -11,16 +11,22 @@ import argparse
 import re
 import traceback
 
+# The MV graph arrays are read with the reader of the DAVE scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'DAVE'))
+from mv_graph_store import read_mv_graph
+
 # Definition of paths for all files and folders used
 # Base directories
+PUREEDGESIM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Folder the simulation runs from
 BASE_OUTPUT_DIR = "DroneSim/Drone_output"  # Base output folder
-DRONE_SETTINGS_DIR = "DroneSim/Drone_settings"  # Settings folder
+DRONE_SETTINGS_DIR = "DroneSim/Drone_settings"  # Default settings folder
 
 # Settings files
 SIM_PARAMETERS_FILE = "simulation_parameters.properties"  # Simulation parameters file
 ORCHESTRATOR_FILE = "DroneTaskOrchestratorD2.java"  # Orchestrator file
 
 # Data files
+MV_GRAPH_DIR = "DroneSim/mv_graph"  # MV graph arrays folder
 MV_NODES_INFO_FILE = "DroneSim/mv_nodes_info.csv"  # MV nodes info file
 DRONE_PATH_FILE = "drone_path.csv"  # Drone path filename
 
@@ -43,11 +49,21 @@ SHOW_PLOTS = True  # Set to False to disable plots
 # Time window configuration (in minutes)
 TIME_WINDOW_START = 0  # Starting minute
 
+# Creating the parser
+parser = argparse.ArgumentParser(description='Analyze simulation data')
+parser.add_argument('output_folder', help='The output folder containing the simulation data')
+parser.add_argument('settings_folder', nargs='?', default=DRONE_SETTINGS_DIR,
+                    help='The settings folder the simulation ran with (default: DroneSim/Drone_settings)')
+args = parser.parse_args()
+
+# Settings folder of the simulation, relative paths are relative to the PureEdgeSim folder
+settings_folder = os.path.join(PUREEDGESIM_DIR, args.settings_folder)
+
 # Reading simulation time from settings file
 def read_simulation_time():
     try:
         # Path to settings file
-        properties_file = os.path.join(DRONE_SETTINGS_DIR, SIM_PARAMETERS_FILE)
+        properties_file = os.path.join(settings_folder, SIM_PARAMETERS_FILE)
         
         with open(properties_file, 'r') as f:
             for line in f:
@@ -75,11 +91,6 @@ IMAGE_QUALITIES = {
     '2160': 8000   # ~8MB per image
 }
 
-# Creating the parser
-parser = argparse.ArgumentParser(description='Analyze simulation data')
-parser.add_argument('output_folder', help='The output folder containing the simulation data')
-args = parser.parse_args()
-
 # Setting the base output folder
 output_folder = args.output_folder
 simulation_folder = os.path.join(BASE_OUTPUT_DIR, output_folder)
@@ -352,8 +363,8 @@ def create_simulation_map(output_folder):
         return
         
     # Διάβασμα των τιμών length και width από το simulation_parameters.properties
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(output_folder))))
-    properties_file = os.path.join(base_dir, DRONE_SETTINGS_DIR, SIM_PARAMETERS_FILE)
+    base_dir = PUREEDGESIM_DIR
+    properties_file = os.path.join(settings_folder, SIM_PARAMETERS_FILE)
     length = None  # Αρχικοποίηση με None
     width = None   # Αρχικοποίηση με None
     coverage_radius = 100.0  # Προεπιλεγμένη τιμή σε περίπτωση που δεν βρεθεί στο αρχείο
@@ -409,10 +420,13 @@ def create_simulation_map(output_folder):
     mv_connections = []
     
     try:
-        # Path to the mv_nodes_info.csv file
+        # Path to the MV graph folder and to the mv_nodes_info.csv file
+        mv_graph_dir = os.path.join(base_dir, MV_GRAPH_DIR)
         mv_nodes_csv = os.path.join(base_dir, MV_NODES_INFO_FILE)
         
-        if os.path.exists(mv_nodes_csv):
+        if os.path.isdir(mv_graph_dir):
+            mv_nodes, mv_connections = read_mv_graph(mv_graph_dir)
+        elif os.path.exists(mv_nodes_csv):
             import ast
             
             mv_df = pd.read_csv(mv_nodes_csv)
@@ -747,8 +761,8 @@ def analyze_simulation_data(csv_file):
         df = pd.read_csv(csv_file)
         
         # Read parameters from files
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(csv_file))))
-        properties_file = os.path.join(base_dir, 'DroneSim/Drone_settings/simulation_parameters.properties')
+        base_dir = PUREEDGESIM_DIR
+        properties_file = os.path.join(settings_folder, SIM_PARAMETERS_FILE)
         orchestrator_file = os.path.join(base_dir, 'DroneSim/DroneTaskOrchestratorD2.java')
         
         # Default values
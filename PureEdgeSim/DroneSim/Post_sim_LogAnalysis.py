@@ -12,6 +12,10 @@ import re
 import traceback
 import ast  # For parsing lists and dictionaries from CSV
 
+# The MV graph arrays are read with the reader of the DAVE scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'DAVE'))
+from mv_graph_store import read_mv_graph
+
 # Set here the simulation output folder you want to analyze
 SIM_OUTPUT_FOLDER = "DroneSim/Drone_output/2025-05-22_12-54-33"
 
@@ -25,6 +29,7 @@ SIM_PARAMETERS_FILE = "simulation_parameters.properties"  # Simulation parameter
 ORCHESTRATOR_FILE = "DroneTaskOrchestratorD2.java"  # Orchestrator file
 
 # Data files
+MV_GRAPH_DIR = "mv_graph"  # MV graph arrays folder
 MV_NODES_INFO_FILE = "mv_nodes_info.csv"  # MV nodes info file
 DRONE_PATH_FILE = "drone_path.csv"  # Drone paths filename
 
@@ -142,26 +147,32 @@ def create_simulation_map(csv_file, output_folder):
     
     try:
         try:
-            # Use absolute path for mv_nodes_info.csv file
-            mv_nodes_file = "DroneSim/mv_nodes_info.csv"
-            mv_df = pd.read_csv(mv_nodes_file)
-            print(f"Successfully read mv_nodes_info.csv file")
-            for _, row in mv_df.iterrows():
-                node_id = int(row['id'])  # Convert to integer
-                normalized_coords = ast.literal_eval(row['normalized_coordinates'])
-                x, y = normalized_coords
-                mv_nodes[node_id] = (x, y)
-                
-                # Read connections
-                connections = ast.literal_eval(row['connections'])
-                edge_distances = ast.literal_eval(row['edge_distances'])
-                
-                for conn in connections:
-                    conn_id = int(conn)  # Convert conn to integer
-                    # Avoid duplicate connections
-                    if node_id < conn_id:
-                        distance = edge_distances.get(str(conn), "N/A")
-                        mv_connections.append((node_id, conn_id, distance))
+            # Prefer the MV graph arrays over the mv_nodes_info.csv export
+            mv_graph_dir = os.path.join("DroneSim", MV_GRAPH_DIR)
+            if os.path.isdir(mv_graph_dir):
+                mv_nodes, mv_connections = read_mv_graph(mv_graph_dir)
+                print(f"Successfully read MV graph from {mv_graph_dir}")
+            else:
+                # Use absolute path for mv_nodes_info.csv file
+                mv_nodes_file = "DroneSim/mv_nodes_info.csv"
+                mv_df = pd.read_csv(mv_nodes_file)
+                print(f"Successfully read mv_nodes_info.csv file")
+                for _, row in mv_df.iterrows():
+                    node_id = int(row['id'])  # Convert to integer
+                    normalized_coords = ast.literal_eval(row['normalized_coordinates'])
+                    x, y = normalized_coords
+                    mv_nodes[node_id] = (x, y)
+                    
+                    # Read connections
+                    connections = ast.literal_eval(row['connections'])
+                    edge_distances = ast.literal_eval(row['edge_distances'])
+                    
+                    for conn in connections:
+                        conn_id = int(conn)  # Convert conn to integer
+                        # Avoid duplicate connections
+                        if node_id < conn_id:
+                            distance = edge_distances.get(str(conn), "N/A")
+                            mv_connections.append((node_id, conn_id, distance))
         except FileNotFoundError:
             print(f"File mv_nodes_info.csv not found.")
     except Exception as e:
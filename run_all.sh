@@ -6,6 +6,28 @@
 
 # Configuration options
 RUN_CITY_NETWORK=false  # Set to false to skip the city network creation step
+PROFILE=false           # Set to true (or pass --profile) to write per-stage timing/memory JSON files to DAVE/Generated_Files
+REPLAY=false            # Set to true (or pass --replay) to run step 1 offline from the recordings in DAVE/fixtures
+
+for arg in "$@"; do
+    if [ "$arg" = "--profile" ]; then
+        PROFILE=true
+    fi
+    if [ "$arg" = "--replay" ]; then
+        REPLAY=true
+    fi
+done
+
+PROFILE_FLAG=""
+if [ "$PROFILE" = true ]; then
+    PROFILE_FLAG="--profile"
+fi
+
+FIXTURE_FLAG=""
+if [ "$REPLAY" = true ]; then
+    RUN_CITY_NETWORK=true
+    FIXTURE_FLAG="--fixtures replay"
+fi
 
 # Colors for messages
 GREEN='\033[0;32m'
@@ -35,7 +57,7 @@ run_command() {
 # 1. Execute 1_city_network.py
 echo -e "\n${YELLOW}Step 1: Creating city network${NC}"
 if [ "$RUN_CITY_NETWORK" = true ]; then
-    if run_command "python3 DAVE/1_city_network.py"; then
+    if run_command "python3 DAVE/1_city_network.py $PROFILE_FLAG $FIXTURE_FLAG"; then
         echo "City network created successfully."
     else
         echo -e "${RED}Error creating city network. Workflow aborted.${NC}"
@@ -47,7 +69,7 @@ fi
 
 # 2. Execute 2_ProcessNetworkData.py
 echo -e "\n${YELLOW}Step 2: Processing network data${NC}"
-if run_command "python3 DAVE/2_ProcessNetworkData.py"; then
+if run_command "python3 DAVE/2_ProcessNetworkData.py $PROFILE_FLAG"; then
     echo "Network data processing completed successfully."
 else
     echo -e "${RED}Error processing network data. Workflow aborted.${NC}"
@@ -56,7 +78,7 @@ fi
 
 # 3. Execute 3_gnb_to_xml.py
 echo -e "\n${YELLOW}Step 3: Converting GNB to XML${NC}"
-if run_command "python3 DAVE/3_gnb_to_xml.py"; then
+if run_command "python3 DAVE/3_gnb_to_xml.py $PROFILE_FLAG"; then
     echo "GNB to XML conversion completed successfully."
 else
     echo -e "${RED}Error converting GNB to XML. Workflow aborted.${NC}"